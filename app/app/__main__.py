@@ -0,0 +1,53 @@
+"""Production entry point, `python -m app`.
+
+Serves without the reloader or debug mode, with one worker per available CPU
+unless `WORKERS` is set, and a single worker with `DATASTORE=numpy`, which
+keeps the documents in the worker process. Workers are forked where the platform allows, so the
+modules and models loaded by the main process are shared copy-on-write
+instead of imported and built again by every worker.
+"""
+
+import multiprocessing
+import os
+
+from sanic import Sanic
+
+from app.config import settings
+
+
+def worker_count() -> int:
+    if settings.DATASTORE.lower().strip() == "numpy":
+        if settings.WORKERS > 1:
+            raise SystemExit(
+                f"WORKERS={settings.WORKERS} is not supported with DATASTORE=numpy, "
+                + "which only runs a single worker."
+            )
+        return 1
+    if settings.WORKERS > 0:
+        return settings.WORKERS
+    try:
+        # CPUs this process may run on, which containers often restrict
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main() -> None:
+    if "fork" in multiprocessing.get_all_start_methods():
+        Sanic.start_method = "fork"
+
+    from app.main import app
+
+    app.prepare(
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=worker_count(),
+        access_log=settings.ACCESS_LOG,
+        auto_reload=False,
+        debug=False,
+    )
+    Sanic.serve(primary=app)
+
+
+if __name__ == "__main__":
+    main()
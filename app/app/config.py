@@ -1,11 +1,10 @@
 import os
 import copy
 import logging
-from typing import Text
+from typing import Optional, Text
 
 from rich.console import Console
 
-
 console = Console()
 
 
@@ -22,6 +21,7 @@ class Settings:
         # Logging Config
         self.APP_LOGGER_NAME: Text = environ.get("APP_LOGGER_NAME", "sanic.root")
         self.LOG_DIR: Text = "log"
+        self.DATA_DIR: Text = environ.get("DATA_DIR", "data")
         self.LOG_ACCESS_FILENAME: Text = environ.get(
             "LOG_ACCESS_FILENAME", "access.log"
         )
@@ -30,8 +30,142 @@ class Settings:
             "LOG_SERVICE_FILENAME", "service.log"
         )
 
+        # Server Config, of the production entry point `python -m app`
+        self.HOST: Text = environ.get("HOST", "0.0.0.0")
+        self.PORT = int(environ.get("PORT", "80"))
+        # Worker processes, 0 for one per available CPU
+        self.WORKERS = int(environ.get("WORKERS", "0"))
+        self.ACCESS_LOG = environ.get("ACCESS_LOG", "false").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+
         # Service Config
         self.max_top_k: int = 20
+        self.QUERY_STREAM_CONCURRENCY = int(
+            environ.get("QUERY_STREAM_CONCURRENCY", "8")
+        )
+        self.UPSERT_STREAM_BATCH_SIZE = int(
+            environ.get("UPSERT_STREAM_BATCH_SIZE", "256")
+        )
+        self.UPSERT_STREAM_MAX_IN_FLIGHT = int(
+            environ.get("UPSERT_STREAM_MAX_IN_FLIGHT", "2")
+        )
+        # Body size limit of streamed upserts
+        self.UPSERT_STREAM_MAX_BYTES = int(
+            environ.get("UPSERT_STREAM_MAX_BYTES", str(1024 * 1024 * 1024))
+        )
+        # Longer lines are acknowledged as invalid instead of being buffered
+        self.UPSERT_STREAM_MAX_LINE_BYTES = int(
+            environ.get("UPSERT_STREAM_MAX_LINE_BYTES", str(8 * 1024 * 1024))
+        )
+
+        # Warmup Config
+        # Queries are appended to the query log when set, for warmups to replay
+        self.QUERY_LOG_PATH: Text = environ.get("QUERY_LOG_PATH", "")
+        self.WARMUP_QUERY_LOG: Text = environ.get(
+            "WARMUP_QUERY_LOG", self.QUERY_LOG_PATH
+        )
+        self.WARMUP_TOPICS = [
+            topic.strip()
+            for topic in environ.get("WARMUP_TOPICS", "").split(",")
+            if topic.strip()
+        ]
+        self.WARMUP_MAX_QUERIES = int(environ.get("WARMUP_MAX_QUERIES", "500"))
+        self.WARMUP_RATE = float(environ.get("WARMUP_RATE", "2"))
+        self.WARMUP_WIKI = environ.get("WARMUP_WIKI", "true").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+
+        # Metrics Config
+        self.METRICS_ENABLED = environ.get("METRICS_ENABLED", "true").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.METRICS_DIR: Text = environ.get(
+            "METRICS_DIR", os.path.join(self.DATA_DIR, "metrics")
+        )
+        self.METRICS_FLUSH_INTERVAL = float(environ.get("METRICS_FLUSH_INTERVAL", "5"))
+        self.SERVER_TIMING = environ.get("SERVER_TIMING", "false").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+
+        # Query Cache Config
+        self.QUERY_CACHE_TTL = float(environ.get("QUERY_CACHE_TTL", "60"))
+        self.QUERY_CACHE_MAX_ENTRIES = int(
+            environ.get("QUERY_CACHE_MAX_ENTRIES", "10000")
+        )
+        self.QUERY_CACHE_MAX_BYTES = int(
+            environ.get("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+        )
+
+        # Lexical Index Config
+        self.QUERY_MODE: Text = environ.get("QUERY_MODE", "dense").lower()
+        # Only maintained by default when the default query mode reads it
+        self.LEXICAL_INDEX = environ.get(
+            "LEXICAL_INDEX",
+            "true" if self.QUERY_MODE in ("hybrid", "lexical") else "false",
+        ).lower() in ("1", "true", "yes")
+        self.LEXICAL_INDEX_PATH: Text = environ.get(
+            "LEXICAL_INDEX_PATH", os.path.join(self.DATA_DIR, "lexical_index.sqlite3")
+        )
+        self.HYBRID_RRF_K = int(environ.get("HYBRID_RRF_K", "60"))
+
+        # Chunking Config
+        self.CHUNK_TOKEN_SIZE = int(environ.get("CHUNK_TOKEN_SIZE", "256"))
+        self.CHUNK_OVERLAP_TOKENS = int(environ.get("CHUNK_OVERLAP_TOKENS", "32"))
+        self.CHUNK_ENCODING: Text = environ.get("CHUNK_ENCODING", "cl100k_base")
+        self.QUERY_COLLAPSE_CHUNKS = environ.get(
+            "QUERY_COLLAPSE_CHUNKS", "false"
+        ).lower() in ("1", "true", "yes")
+        self.QUERY_COLLAPSE_OVERFETCH = int(
+            environ.get("QUERY_COLLAPSE_OVERFETCH", "4")
+        )
+
+        # Wiki Fetch Config
+        self.WIKI_API_URL: Text = environ.get(
+            "WIKI_API_URL", "https://{lang}.wikipedia.org/w/api.php"
+        )
+        self.WIKI_FULL_TEXT = environ.get("WIKI_FULL_TEXT", "false").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.WIKI_CONCURRENCY = int(environ.get("WIKI_CONCURRENCY", "4"))
+        self.WIKI_TIMEOUT = float(environ.get("WIKI_TIMEOUT", "15"))
+        self.WIKI_CACHE_MAX_ENTRIES = int(
+            environ.get("WIKI_CACHE_MAX_ENTRIES", "10000")
+        )
+        self.WIKI_CACHE_TTL = float(environ.get("WIKI_CACHE_TTL", str(24 * 60 * 60)))
+        self.WIKI_CACHE_NEGATIVE_TTL = float(
+            environ.get("WIKI_CACHE_NEGATIVE_TTL", str(10 * 60))
+        )
+        self.WIKI_CACHE_PATH: Text = environ.get(
+            "WIKI_CACHE_PATH", os.path.join(self.DATA_DIR, "wiki_cache.sqlite3")
+        )
+        self.SHARED_STATE_PATH: Text = environ.get(
+            "SHARED_STATE_PATH", os.path.join(self.DATA_DIR, "shared_state.sqlite3")
+        )
+        self.WIKI_FETCH_LEASE_TTL = float(environ.get("WIKI_FETCH_LEASE_TTL", "120"))
+        self.WIKI_RECENTLY_FETCHED_TTL = float(
+            environ.get("WIKI_RECENTLY_FETCHED_TTL", "600")
+        )
+        self.WIKI_RATE_LIMIT = float(environ.get("WIKI_RATE_LIMIT", "10"))
+        self.WIKI_RATE_BURST = int(environ.get("WIKI_RATE_BURST", "10"))
+        self.WIKI_MAX_RETRIES = int(environ.get("WIKI_MAX_RETRIES", "3"))
+        self.WIKI_REFRESH_CONCURRENCY = int(
+            environ.get("WIKI_REFRESH_CONCURRENCY", "4")
+        )
+        self.WIKI_REFRESH_QUEUE_SIZE = int(
+            environ.get("WIKI_REFRESH_QUEUE_SIZE", "100")
+        )
+        self.WIKI_REFRESH_MAX_AGE = float(environ.get("WIKI_REFRESH_MAX_AGE", "60"))
 
         # Language Config
         self.detect_languages = [
@@ -48,9 +182,61 @@ class Settings:
             "PORTUGUESE",
             "SWEDISH",
         ]
+        self.LANGUAGE_CACHE_MAX_ENTRIES = int(
+            environ.get("LANGUAGE_CACHE_MAX_ENTRIES", "10000")
+        )
+        self.LANGUAGE_SCRIPT_FAST_PATH = environ.get(
+            "LANGUAGE_SCRIPT_FAST_PATH", "true"
+        ).lower() in ("1", "true", "yes")
+        # Load detector models in the main process, shared by forked workers
+        self.LANGUAGE_DETECTOR_PRELOAD = environ.get(
+            "LANGUAGE_DETECTOR_PRELOAD", "true"
+        ).lower() in ("1", "true", "yes")
 
         # OpenAI Config
         self.OPENAI_API_KEY = environ.get("OPENAI_API_KEY")
+        self.OPENAI_EMBEDDING_MAX_BATCH_SIZE = int(
+            environ.get("OPENAI_EMBEDDING_MAX_BATCH_SIZE", "2048")
+        )
+        self.OPENAI_EMBEDDING_MAX_BATCH_TOKENS = int(
+            environ.get("OPENAI_EMBEDDING_MAX_BATCH_TOKENS", "100000")
+        )
+        # Longer inputs are truncated, the API would reject them
+        self.OPENAI_EMBEDDING_MAX_INPUT_TOKENS = int(
+            environ.get("OPENAI_EMBEDDING_MAX_INPUT_TOKENS", "8191")
+        )
+        # Upper bound of the adaptive number of concurrent requests
+        self.OPENAI_EMBEDDING_CONCURRENCY = int(
+            environ.get("OPENAI_EMBEDDING_CONCURRENCY", "4")
+        )
+        self.OPENAI_EMBEDDING_MAX_RETRIES = int(
+            environ.get("OPENAI_EMBEDDING_MAX_RETRIES", "6")
+        )
+
+        # Embedding Config
+        self.EMBEDDING_PROVIDER: Text = environ.get("EMBEDDING_PROVIDER", "openai")
+        self.EMBEDDING_MODEL: Optional[Text] = environ.get("EMBEDDING_MODEL")
+        self.LOCAL_EMBEDDING_WORKERS = int(environ.get("LOCAL_EMBEDDING_WORKERS", "2"))
+        self.LOCAL_EMBEDDING_BATCH_SIZE = int(
+            environ.get("LOCAL_EMBEDDING_BATCH_SIZE", "64")
+        )
+
+        # Embedding Cache Config
+        self.EMBEDDING_CACHE_MAX_BYTES = int(
+            environ.get("EMBEDDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+        )
+        self.EMBEDDING_CACHE_PATH: Text = environ.get(
+            "EMBEDDING_CACHE_PATH",
+            os.path.join(self.DATA_DIR, "embedding_cache.sqlite3"),
+        )
+
+        # Embedding Batch Config
+        self.EMBEDDING_BATCH_MAX_WAIT_MS = float(
+            environ.get("EMBEDDING_BATCH_MAX_WAIT_MS", "5")
+        )
+        self.EMBEDDING_BATCH_MAX_SIZE = int(
+            environ.get("EMBEDDING_BATCH_MAX_SIZE", "256")
+        )
 
         # Retrieval Config
         self.VECTOR_SIZE = int(environ.get("VECTOR_SIZE", "1536"))
@@ -61,6 +247,38 @@ class Settings:
         self.QDRANT_GRPC_PORT = int(environ.get("QDRANT_GRPC_PORT", "6334"))
         self.QDRANT_API_KEY = environ.get("QDRANT_API_KEY")
         self.QDRANT_COLLECTION = environ.get("QDRANT_COLLECTION", "wiki_documents")
+        self.QDRANT_TIMEOUT = float(environ.get("QDRANT_TIMEOUT", "10"))
+        self.QDRANT_READ_WORKERS = int(environ.get("QDRANT_READ_WORKERS", "8"))
+        self.QDRANT_WRITE_WORKERS = int(environ.get("QDRANT_WRITE_WORKERS", "2"))
+        self.QDRANT_PAYLOAD_INDEXES = [
+            key.strip()
+            for key in environ.get(
+                "QDRANT_PAYLOAD_INDEXES",
+                "metadata.name,metadata.lang,metadata.source,metadata.parent_id",
+            ).split(",")
+            if key.strip()
+        ]
+        self.QDRANT_QUANTIZATION = environ.get("QDRANT_QUANTIZATION", "none").lower()
+        self.QDRANT_QUANTIZATION_QUANTILE = float(
+            environ.get("QDRANT_QUANTIZATION_QUANTILE", "0.99")
+        )
+        self.QDRANT_QUANTIZATION_ALWAYS_RAM = environ.get(
+            "QDRANT_QUANTIZATION_ALWAYS_RAM", "true"
+        ).lower() in ("1", "true", "yes")
+        self.QDRANT_QUANTIZATION_RESCORE = environ.get(
+            "QDRANT_QUANTIZATION_RESCORE", "true"
+        ).lower() in ("1", "true", "yes")
+        self.NUMPY_STORE_PATH: Text = environ.get(
+            "NUMPY_STORE_PATH", os.path.join(self.DATA_DIR, "numpy_store")
+        )
+        self.NUMPY_STORE_MMAP = environ.get("NUMPY_STORE_MMAP", "false").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self.NUMPY_STORE_SNAPSHOT_INTERVAL = float(
+            environ.get("NUMPY_STORE_SNAPSHOT_INTERVAL", "30")
+        )
 
 
 settings = Settings()
@@ -1,6 +1,13 @@
 from .document_store import get_document_store
+from .ingestion import get_ingestion_service
 from .language import language_detector
+from .search import get_search_service
 from .timer import click_timer
 
-
-__all__ = ["click_timer", "get_document_store", "language_detector"]
+__all__ = [
+    "click_timer",
+    "get_document_store",
+    "get_ingestion_service",
+    "get_search_service",
+    "language_detector",
+]
@@ -1,7 +1,7 @@
 from sanic.request import Request
 
-from app.document_store import QdrantDocumentStore
+from app.document_store import DocumentStore
 
 
-def get_document_store(request: Request) -> "QdrantDocumentStore":
+def get_document_store(request: Request) -> "DocumentStore":
     return request.app.ctx.document_store
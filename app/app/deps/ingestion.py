@@ -0,0 +1,7 @@
+from sanic.request import Request
+
+from app.service import IngestionService
+
+
+def get_ingestion_service(request: Request) -> "IngestionService":
+    return request.app.ctx.ingestion_service
@@ -1,7 +1,7 @@
 from sanic.request import Request
 
-from lingua import LanguageDetector
+from app.service.language import LanguageIdentifier
 
 
-def language_detector(request: Request) -> "LanguageDetector":
-    return request.app.ctx.language_detector
+def language_detector(request: Request) -> "LanguageIdentifier":
+    return request.app.ctx.language_identifier
@@ -0,0 +1,7 @@
+from sanic.request import Request
+
+from app.service import SearchService
+
+
+def get_search_service(request: Request) -> "SearchService":
+    return request.app.ctx.search_service
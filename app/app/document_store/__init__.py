@@ -1,5 +1,24 @@
 from .abc import DocumentStore
-from .qdrant import QdrantDocumentStore
+from .cache import QueryResultCache
+from .factory import get_document_store
+from .lexical import LexicalIndex, fuse_results
+from .numpy_store import NumpyDocumentStore
 
+__all__ = [
+    "DocumentStore",
+    "LexicalIndex",
+    "NumpyDocumentStore",
+    "QdrantDocumentStore",
+    "QueryResultCache",
+    "fuse_results",
+    "get_document_store",
+]
 
-__all__ = ["DocumentStore", "QdrantDocumentStore"]
+
+def __getattr__(name):
+    # qdrant_client takes about a second to import, only load it when used
+    if name == "QdrantDocumentStore":
+        from .qdrant import QdrantDocumentStore
+
+        return QdrantDocumentStore
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
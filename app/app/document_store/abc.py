@@ -22,9 +22,7 @@ class DocumentStore(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    async def upsert(
-        self, documents: List[Document], chunk_token_size: Optional[int] = None
-    ) -> List[Text]:
+    async def upsert(self, documents: List[Document]) -> List[Text]:
         raise NotImplementedError
 
     @abstractmethod
@@ -39,3 +37,15 @@ class DocumentStore(ABC):
         delete_all: Optional[bool] = None,
     ) -> bool:
         raise NotImplementedError
+
+    async def content_hashes(self, ids: List[Text]) -> Dict[Text, Text]:
+        """Return the stored `metadata.content_hash` of the given documents.
+
+        Stores that cannot look them up return nothing, so every document is
+        treated as changed.
+        """
+
+        return {}
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,91 @@
+import json
+import multiprocessing
+from multiprocessing.sharedctypes import Synchronized
+from typing import Any, Dict, Hashable, Optional, Text, Tuple
+
+from app.schema.models import Query, QueryResult
+from app.utils.cache import LRUCache
+from app.utils.text import normalize_text
+
+
+class QueryResultCache:
+    """TTL'd LRU of query results, invalidated by a collection generation.
+
+    Every write to the collection bumps the generation. Entries stored under
+    an older generation are treated as misses. When the generation counter
+    lives in shared memory, a write on one worker invalidates the caches of
+    every worker.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        generation: Optional["Synchronized"] = None,
+    ):
+        self.memory: LRUCache[Tuple[int, QueryResult]] = LRUCache(
+            max_entries=max_entries, max_bytes=max_bytes, ttl=ttl
+        )
+        self._generation = (
+            generation if generation is not None else multiprocessing.Value("Q", 0)
+        )
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation.value
+
+    def invalidate(self) -> int:
+        with self._generation.get_lock():
+            self._generation.value += 1
+            return self._generation.value
+
+    @staticmethod
+    def key(query: Query) -> Hashable:
+        return (
+            normalize_text(query.query),
+            json.dumps(query.filter or {}, sort_keys=True, ensure_ascii=False),
+            query.top_k,
+            bool(query.collapse),
+            query.mode,
+            bool(query.include_embedding),
+        )
+
+    def get(self, query: Query) -> Optional[QueryResult]:
+        key = self.key(query)
+        item = self.memory.get(key)
+        if item is not None and item[0] != self.generation:
+            self.memory.pop(key)
+            self.stale += 1
+            item = None
+
+        if item is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return QueryResult(query=query.query, results=item[1].results)
+
+    def put(self, query: Query, result: QueryResult, generation: int) -> None:
+        """Store a result computed while the collection was at `generation`."""
+
+        size = 64 + sum(
+            len(doc.text or "") + len(json.dumps(doc.metadata or {}, default=str))
+            for doc in result.results
+        )
+        self.memory.put(self.key(query), (generation, result), size=size)
+
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            stale=self.stale,
+            hit_ratio=(self.hits / lookups) if lookups else 0.0,
+            entries=len(self.memory),
+            bytes=self.memory.bytes,
+            generation=self.generation,
+        )
@@ -1,7 +1,32 @@
-from typing import Text
+from typing import Optional, Text
 
-from .qdrant import QdrantDocumentStore
+from .abc import DocumentStore
+from app.config import settings
 
 
-def get_document_store(collection_name: Text) -> "QdrantDocumentStore":
-    return QdrantDocumentStore(collection_name=collection_name)
+def get_document_store(
+    collection_name: Text,
+    vector_size: int = 1536,
+    datastore: Optional[Text] = None,
+) -> "DocumentStore":
+    datastore = (datastore or settings.DATASTORE).lower().strip()
+
+    if datastore == "qdrant":
+        from .qdrant import QdrantDocumentStore
+
+        return QdrantDocumentStore(
+            collection_name=collection_name, vector_size=vector_size
+        )
+
+    elif datastore == "numpy":
+        from .numpy_store import NumpyDocumentStore
+
+        return NumpyDocumentStore(
+            collection_name=collection_name,
+            vector_size=vector_size,
+            path=settings.NUMPY_STORE_PATH or None,
+            mmap=settings.NUMPY_STORE_MMAP,
+            snapshot_interval=settings.NUMPY_STORE_SNAPSHOT_INTERVAL,
+        )
+
+    raise ValueError(f"Datastore {datastore} not supported.")
@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Optional, Text
+
+_MISSING = object()
+
+
+def get_payload_values(payload: Dict[Text, Any], key: Text) -> List[Any]:
+    """Resolve a dotted Qdrant payload key, flattening arrays on the way."""
+
+    values: List[Any] = [payload]
+    for part in key.split("."):
+        array_part = part.endswith("[]")
+        part = part[:-2] if array_part else part
+        next_values: List[Any] = []
+        for value in values:
+            if not isinstance(value, dict):
+                continue
+            _value = value.get(part, _MISSING)
+            if _value is _MISSING:
+                continue
+            if isinstance(_value, list):
+                next_values.extend(_value)
+            else:
+                next_values.append(_value)
+        values = next_values
+    return values
+
+
+def _match_condition(
+    payload: Dict[Text, Any], point_id: Optional[Text], condition: Dict[Text, Any]
+) -> bool:
+    if "has_id" in condition:
+        return point_id in {str(i) for i in condition["has_id"]}
+
+    if "filter" in condition:
+        return match_filter(payload, condition["filter"], point_id=point_id)
+
+    if any(k in condition for k in ("must", "should", "must_not")):
+        return match_filter(payload, condition, point_id=point_id)
+
+    if "is_empty" in condition:
+        values = get_payload_values(payload, condition["is_empty"]["key"])
+        return not [v for v in values if v is not None]
+
+    if "is_null" in condition:
+        values = get_payload_values(payload, condition["is_null"]["key"])
+        return any(v is None for v in values)
+
+    key = condition.get("key")
+    if key is None:
+        raise ValueError(f"Unsupported filter condition: {condition}")
+    values = [v for v in get_payload_values(payload, key) if v is not None]
+
+    if "match" in condition:
+        match = condition["match"]
+        if "value" in match:
+            return match["value"] in values
+        if "any" in match:
+            return any(v in match["any"] for v in values)
+        if "except" in match:
+            return bool(values) and all(v not in match["except"] for v in values)
+        if "text" in match:
+            return any(isinstance(v, str) and match["text"] in v for v in values)
+        raise ValueError(f"Unsupported match condition: {match}")
+
+    if "range" in condition:
+        _range = condition["range"]
+
+        def _in_range(value: Any) -> bool:
+            if not isinstance(value, (int, float)):
+                return False
+            if _range.get("gt") is not None and not value > _range["gt"]:
+                return False
+            if _range.get("gte") is not None and not value >= _range["gte"]:
+                return False
+            if _range.get("lt") is not None and not value < _range["lt"]:
+                return False
+            if _range.get("lte") is not None and not value <= _range["lte"]:
+                return False
+            return True
+
+        return any(_in_range(v) for v in values)
+
+    if "values_count" in condition:
+        return _match_condition(
+            {"count": len(values)},
+            point_id,
+            {"key": "count", "range": condition["values_count"]},
+        )
+
+    raise ValueError(f"Unsupported filter condition: {condition}")
+
+
+def match_filter(
+    payload: Dict[Text, Any],
+    filter: Optional[Dict[Text, Any]],
+    point_id: Optional[Text] = None,
+) -> bool:
+    """Evaluate a Qdrant style filter (must / should / must_not) on a payload."""
+
+    if not filter:
+        return True
+
+    must = filter.get("must") or []
+    should = filter.get("should") or []
+    must_not = filter.get("must_not") or []
+
+    if not all(_match_condition(payload, point_id, c) for c in must):
+        return False
+    if should and not any(_match_condition(payload, point_id, c) for c in should):
+        return False
+    if any(_match_condition(payload, point_id, c) for c in must_not):
+        return False
+    return True
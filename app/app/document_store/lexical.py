@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple
+
+from .filter import match_filter
+from app.schema.models import Document, DocumentWithScore, Query, QueryResult
+
+# Han and kana are not space delimited, index every character as a token
+_UNSPACED_PATTERN = re.compile(
+    "([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff])"
+)
+_PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def segment(text: Text) -> Text:
+    return _UNSPACED_PATTERN.sub(r" \1 ", text)
+
+
+def match_expression(query: Text, max_terms: int = 32) -> Optional[Text]:
+    """Build an FTS5 MATCH expression: quoted phrases and terms joined by OR."""
+
+    terms: List[Text] = []
+    for phrase in _PHRASE_PATTERN.findall(query):
+        tokens = _TOKEN_PATTERN.findall(segment(phrase))
+        if len(tokens) > 1:
+            terms.append('"' + " ".join(tokens) + '"')
+    for token in _TOKEN_PATTERN.findall(segment(_PHRASE_PATTERN.sub(" ", query))):
+        terms.append(f'"{token}"')
+    terms = list(dict.fromkeys(term.lower() for term in terms))[:max_terms]
+    return " OR ".join(terms) if terms else None
+
+
+def _parent_ids_of(filter: Optional[Dict]) -> Optional[List[Text]]:
+    for condition in (filter or {}).get("must") or []:
+        if condition.get("key") == "metadata.parent_id":
+            match = condition.get("match") or {}
+            if "any" in match:
+                return [str(value) for value in match["any"]]
+            if "value" in match:
+                return [str(match["value"])]
+    return None
+
+
+class LexicalIndex:
+    """BM25 index over `text` and `metadata.title` in a SQLite FTS5 table.
+
+    The index file is shared by all workers and updated incrementally on
+    every upsert and delete. Only the first chunk of a document indexes its
+    title, so long articles do not match a title term once per chunk. Filters are evaluated on the stored payloads of
+    the best ranked candidates. Methods run on one thread per process.
+    """
+
+    def __init__(
+        self,
+        path: Text,
+        collection_name: Text = "documents",
+        title_weight: float = 2.0,
+        max_candidates: int = 1000,
+    ):
+        self.path = path
+        self.collection_name = re.sub(r"\W", "_", collection_name)
+        self.title_weight = float(title_weight)
+        self.max_candidates = int(max_candidates)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="lexical-index"
+        )
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def docs_table(self) -> Text:
+        return f"{self.collection_name}_docs"
+
+    @property
+    def fts_table(self) -> Text:
+        return f"{self.collection_name}_fts"
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.docs_table} ("
+                    + "rowid INTEGER PRIMARY KEY, "
+                    + "id TEXT NOT NULL UNIQUE, "
+                    + "parent_id TEXT, "
+                    + "payload TEXT NOT NULL)"
+                )
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.docs_table}_parent_id "
+                    + f"ON {self.docs_table} (parent_id)"
+                )
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5("
+                    + "title, text, tokenize='unicode61 remove_diacritics 2')"
+                )
+            self._conn = conn
+        return self._conn
+
+    async def upsert(self, documents: Sequence[Document]) -> None:
+        if documents:
+            await self._run(self._upsert, list(documents))
+
+    async def query(self, queries: Sequence[Query]) -> List[QueryResult]:
+        return await self._run(self._query, list(queries))
+
+    async def delete(
+        self,
+        ids: Optional[List[Text]] = None,
+        filter: Optional[Dict] = None,
+        delete_all: Optional[bool] = None,
+    ) -> None:
+        await self._run(self._delete, ids, filter, delete_all)
+
+    async def count(self) -> int:
+        return await self._run(self._count)
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+    def _upsert(self, documents: List[Document]) -> None:
+        with self.conn:
+            self._delete_rows(self._rows_of_ids([doc.id for doc in documents]))
+            for doc in documents:
+                metadata = doc.metadata or {}
+                title = metadata.get("title") if not metadata.get("chunk_index") else ""
+                payload = dict(
+                    id=doc.id,
+                    text=doc.text,
+                    metadata={k: v for k, v in metadata.items() if k != "embedding"},
+                )
+                cursor = self.conn.execute(
+                    f"INSERT INTO {self.docs_table} (id, parent_id, payload) "
+                    + "VALUES (?, ?, ?)",
+                    (
+                        doc.id,
+                        metadata.get("parent_id"),
+                        json.dumps(payload, ensure_ascii=False, default=str),
+                    ),
+                )
+                self.conn.execute(
+                    f"INSERT INTO {self.fts_table} (rowid, title, text) "
+                    + "VALUES (?, ?, ?)",
+                    (
+                        cursor.lastrowid,
+                        segment(str(title or "")),
+                        segment(doc.text or ""),
+                    ),
+                )
+
+    def _query(self, queries: List[Query]) -> List[QueryResult]:
+        return [
+            QueryResult(query=query.query, results=self._search(query))
+            for query in queries
+        ]
+
+    def _search(self, query: Query) -> List[DocumentWithScore]:
+        expression = match_expression(query.query)
+        top_k = query.top_k or 0
+        if expression is None or top_k <= 0:
+            return []
+
+        # Widen the candidate window until the filter lets top_k through
+        limit = top_k if not query.filter else top_k * 4
+        while True:
+            rows = self.conn.execute(
+                f"SELECT d.id, d.payload, "
+                + f"bm25({self.fts_table}, ?, 1.0) AS rank "
+                + f"FROM {self.fts_table} f "
+                + f"JOIN {self.docs_table} d ON d.rowid = f.rowid "
+                + f"WHERE {self.fts_table} MATCH ? ORDER BY rank LIMIT ?",
+                (self.title_weight, expression, limit),
+            ).fetchall()
+            results: List[DocumentWithScore] = []
+            for _id, payload, rank in rows:
+                payload = json.loads(payload)
+                if query.filter and not match_filter(
+                    payload, query.filter, point_id=_id
+                ):
+                    continue
+                results.append(
+                    DocumentWithScore(
+                        id=_id,
+                        text=payload.get("text", ""),
+                        metadata=payload.get("metadata"),
+                        embedding=None,
+                        score=-float(rank),  # FTS5 ranks better matches lower
+                    )
+                )
+                if len(results) >= top_k:
+                    return results
+            if len(rows) < limit or limit >= self.max_candidates:
+                return results
+            limit = min(limit * 4, self.max_candidates)
+
+    def _delete(
+        self,
+        ids: Optional[List[Text]],
+        filter: Optional[Dict],
+        delete_all: Optional[bool],
+    ) -> None:
+        with self.conn:
+            if delete_all:
+                self.conn.execute(f"DELETE FROM {self.docs_table}")
+                self.conn.execute(f"DELETE FROM {self.fts_table}")
+                return
+
+            if ids:
+                self._delete_rows(self._rows_of_ids(ids))
+                return
+
+            if filter:
+                parent_ids = _parent_ids_of(filter)
+                if parent_ids is not None:
+                    candidates = self._select_in("parent_id", parent_ids)
+                else:
+                    candidates = self.conn.execute(
+                        f"SELECT rowid, id, payload FROM {self.docs_table}"
+                    ).fetchall()
+                self._delete_rows(
+                    [
+                        rowid
+                        for rowid, _id, payload in candidates
+                        if match_filter(json.loads(payload), filter, point_id=_id)
+                    ]
+                )
+
+    def _rows_of_ids(self, ids: List[Text]) -> List[int]:
+        return [rowid for rowid, _, _ in self._select_in("id", ids)]
+
+    def _select_in(
+        self, column: Text, values: List[Text]
+    ) -> List[Tuple[int, Text, Text]]:
+        rows: List[Tuple[int, Text, Text]] = []
+        for i in range(0, len(values), 500):  # Keep under SQLITE_MAX_VARIABLE_NUMBER
+            _values = values[i : i + 500]
+            rows.extend(
+                self.conn.execute(
+                    f"SELECT rowid, id, payload FROM {self.docs_table} "
+                    + f"WHERE {column} IN ({','.join('?' * len(_values))})",
+                    _values,
+                ).fetchall()
+            )
+        return rows
+
+    def _delete_rows(self, rowids: List[int]) -> None:
+        for i in range(0, len(rowids), 500):
+            _rowids = rowids[i : i + 500]
+            placeholders = ",".join("?" * len(_rowids))
+            self.conn.execute(
+                f"DELETE FROM {self.docs_table} WHERE rowid IN ({placeholders})",
+                _rowids,
+            )
+            self.conn.execute(
+                f"DELETE FROM {self.fts_table} WHERE rowid IN ({placeholders})",
+                _rowids,
+            )
+
+    def _count(self) -> int:
+        row = self.conn.execute(f"SELECT COUNT(*) FROM {self.docs_table}").fetchone()
+        return row[0]
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args: Any):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+
+def fuse_results(
+    results: Sequence[QueryResult], top_k: int, k: int = 60
+) -> List[DocumentWithScore]:
+    """Reciprocal rank fusion, the score becomes the summed `1 / (k + rank)`."""
+
+    scores: Dict[Text, float] = {}
+    docs: Dict[Text, DocumentWithScore] = {}
+    for result in results:
+        for rank, doc in enumerate(result.results, start=1):
+            scores[doc.id] = scores.get(doc.id, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(doc.id, doc)
+
+    fused: List[DocumentWithScore] = []
+    for _id in sorted(scores, key=scores.__getitem__, reverse=True)[:top_k]:
+        doc = docs[_id]
+        fused.append(
+            DocumentWithScore(
+                id=doc.id,
+                text=doc.text,
+                metadata=doc.metadata,
+                embedding=doc.embedding,
+                score=scores[_id],
+            )
+        )
+    return fused
@@ -0,0 +1,39 @@
+"""Rewrite Qdrant points stored by earlier versions.
+
+    python -m app.document_store.migrate --collection wiki_documents
+
+Removes the embedding duplicated into every payload and creates the payload
+indexes configured by `QDRANT_PAYLOAD_INDEXES`. Safe to run repeatedly.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.config import logger, settings
+
+from .qdrant import QdrantDocumentStore
+
+
+async def main(args: argparse.Namespace) -> None:
+    doc_store = QdrantDocumentStore(
+        collection_name=args.collection, timeout=args.timeout
+    )
+    try:
+        if not await doc_store.touch():
+            raise ValueError(f"Failed to touch collection '{args.collection}'.")
+        migrated = await doc_store.migrate_payloads(batch_size=args.batch_size)
+        logger.info(f"Done. Migrated {migrated} points of {args.collection}.")
+    finally:
+        await doc_store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.document_store.migrate")
+    parser.add_argument("--collection", default=settings.QDRANT_COLLECTION)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logger.setLevel(logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,348 @@
+import asyncio
+import datetime
+import fcntl
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Text
+
+import numpy as np
+
+from .abc import DocumentStore
+from .filter import match_filter
+from app.config import logger
+from app.schema.models import (
+    DocumentWithEmbedding,
+    DocumentWithScore,
+    QueryResult,
+    QueryWithEmbedding,
+)
+
+
+class NumpyDocumentStore(DocumentStore):
+    """In-process document store over a contiguous float32 matrix.
+
+    Rows are L2 normalized on write, so cosine similarity for a whole batch
+    of queries is one matrix product followed by `argpartition` top-k.
+    Snapshots are written to `path` and may be memory-mapped on load.
+
+    The matrix lives in the worker process, so it suits single-worker
+    deployments, tests and benchmarks rather than a multi-worker service.
+    The snapshot directory is locked while the store is open, so a second
+    process cannot serve or overwrite the same collection.
+    """
+
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        vector_size: int = 1536,
+        path: Optional[Text] = None,
+        mmap: bool = False,
+        snapshot_interval: float = 30.0,
+    ):
+        self.collection_name = collection_name or "documents"
+        self.vector_size = int(vector_size)
+        self.path = path
+        self.mmap = mmap
+        self.snapshot_interval = float(snapshot_interval)
+
+        self._vectors = np.zeros((0, self.vector_size), dtype=np.float32)
+        self._size = 0
+        self._ids: List[Text] = []
+        self._payloads: List[Dict[Text, Any]] = []
+        self._id_to_row: Dict[Text, int] = {}
+        self._dirty = False
+        self._snapshot_at = time.monotonic()
+        self._lock_file: Optional[Any] = None
+
+        # One thread serializes mutations with the matrix products
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="numpy-store"
+        )
+
+    @property
+    def host(self) -> Text:
+        return self.path or ":memory:"
+
+    @property
+    def port(self) -> int:
+        return 0
+
+    @property
+    def vectors_path(self) -> Optional[Text]:
+        if not self.path:
+            return None
+        return os.path.join(self.path, f"{self.collection_name}.npy")
+
+    @property
+    def payloads_path(self) -> Optional[Text]:
+        if not self.path:
+            return None
+        return os.path.join(self.path, f"{self.collection_name}.jsonl")
+
+    def __len__(self) -> int:
+        return self._size
+
+    async def touch(self) -> bool:
+        try:
+            await self._run(self.load)
+            return True
+        except Exception as e:
+            logger.exception(e)
+        return False
+
+    async def upsert(self, documents: List[DocumentWithEmbedding]) -> List[Text]:
+        created_at = datetime.datetime.utcnow().isoformat()
+        await self._run(self._upsert, documents, created_at)
+        await self._maybe_snapshot()
+        return [d.id for d in documents]
+
+    async def query(self, queries: List[QueryWithEmbedding]) -> List[QueryResult]:
+        return await self._run(self._query, queries)
+
+    async def delete(
+        self,
+        ids: Optional[List[Text]] = None,
+        filter: Optional[Dict] = None,
+        delete_all: Optional[bool] = None,
+    ) -> bool:
+        if ids is None and filter is None and delete_all is None:
+            raise ValueError(
+                "Please provide one of the parameters: ids, filter or delete_all."
+            )
+
+        await self._run(self._delete, ids, filter, delete_all)
+        await self._maybe_snapshot()
+        return True
+
+    async def content_hashes(self, ids: List[Text]) -> Dict[Text, Text]:
+        return await self._run(self._content_hashes, ids)
+
+    async def close(self) -> None:
+        if self._dirty:
+            await self._run(self.snapshot)
+        self._executor.shutdown(wait=True)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def lock(self) -> None:
+        if not self.path or self._lock_file is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        lock_file = open(os.path.join(self.path, f"{self.collection_name}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Numpy store {self.path} is used by another process, "
+                + "run a single worker per store path."
+            )
+        self._lock_file = lock_file
+
+    def load(self) -> None:
+        self.lock()
+        if not (self.vectors_path and os.path.exists(self.vectors_path)):
+            return
+
+        vectors = np.load(self.vectors_path, mmap_mode="r" if self.mmap else None)
+        if vectors.ndim != 2 or vectors.shape[1] != self.vector_size:
+            raise ValueError(
+                f"Snapshot {self.vectors_path} has shape {vectors.shape}, "
+                + f"expected (n, {self.vector_size})."
+            )
+        with open(self.payloads_path, "r", encoding="utf-8") as f:
+            payloads = [json.loads(line) for line in f if line.strip()]
+        if len(payloads) != vectors.shape[0]:
+            raise ValueError(f"Snapshot {self.vectors_path} is inconsistent.")
+
+        self._vectors = vectors
+        self._size = vectors.shape[0]
+        self._payloads = payloads
+        self._ids = [payload["id"] for payload in payloads]
+        self._id_to_row = {_id: row for row, _id in enumerate(self._ids)}
+        logger.info(f"Loaded {self._size} documents from {self.vectors_path}.")
+
+    def snapshot(self) -> None:
+        if not self.path:
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp_vectors_path = self.vectors_path + ".tmp.npy"
+        tmp_payloads_path = self.payloads_path + ".tmp"
+        np.save(tmp_vectors_path, np.ascontiguousarray(self._vectors[: self._size]))
+        with open(tmp_payloads_path, "w", encoding="utf-8") as f:
+            for payload in self._payloads:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        os.replace(tmp_vectors_path, self.vectors_path)
+        os.replace(tmp_payloads_path, self.payloads_path)
+
+        self._dirty = False
+        self._snapshot_at = time.monotonic()
+
+    def _upsert(self, documents: List[DocumentWithEmbedding], created_at: Text):
+        if not documents:
+            return
+
+        vectors = np.asarray([doc.embedding for doc in documents], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.vector_size:
+            raise ValueError(
+                f"Expected embeddings of size {self.vector_size}, "
+                + f"got {vectors.shape[-1]}."
+            )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+
+        new_docs = [doc for doc in documents if doc.id not in self._id_to_row]
+        self._reserve(self._size + len(new_docs))
+
+        for doc, vector in zip(documents, vectors):
+            payload = dict(
+                id=doc.id,
+                text=doc.text,
+                metadata=dict(doc.metadata or {}, created_at=created_at),
+            )
+            row = self._id_to_row.get(doc.id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._ids.append(doc.id)
+                self._payloads.append(payload)
+                self._id_to_row[doc.id] = row
+            else:
+                self._payloads[row] = payload
+            self._vectors[row] = vector
+        self._dirty = True
+
+    def _query(self, queries: List[QueryWithEmbedding]) -> List[QueryResult]:
+        if not queries:
+            return []
+        if not self._size:
+            return [QueryResult(query=query.query, results=[]) for query in queries]
+
+        query_vectors = np.asarray(
+            [query.embedding for query in queries], dtype=np.float32
+        )
+        norms = np.linalg.norm(query_vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        query_vectors /= norms
+
+        # (n_queries, n_documents) cosine similarities in one product
+        scores = query_vectors @ self._vectors[: self._size].T
+
+        outputs: List[QueryResult] = []
+        for query, _scores in zip(queries, scores):
+            if query.filter:
+                mask = np.fromiter(
+                    (
+                        match_filter(payload, query.filter, point_id=_id)
+                        for payload, _id in zip(self._payloads, self._ids)
+                    ),
+                    dtype=bool,
+                    count=self._size,
+                )
+                _scores = np.where(mask, _scores, -np.inf)
+                n_candidates = int(mask.sum())
+            else:
+                n_candidates = self._size
+
+            top_k = min(query.top_k, n_candidates)
+            if top_k <= 0:
+                outputs.append(QueryResult(query=query.query, results=[]))
+                continue
+            if top_k < self._size:
+                rows = np.argpartition(-_scores, top_k - 1)[:top_k]
+            else:
+                rows = np.arange(self._size)
+            rows = rows[np.argsort(-_scores[rows], kind="stable")]
+
+            outputs.append(
+                QueryResult(
+                    query=query.query,
+                    results=[
+                        DocumentWithScore(
+                            id=self._payloads[row]["id"],
+                            text=self._payloads[row].get("text", ""),
+                            metadata=self._payloads[row].get("metadata"),
+                            embedding=(
+                                self._vectors[row].tolist()
+                                if query.include_embedding
+                                else None
+                            ),
+                            score=float(_scores[row]),
+                        )
+                        for row in rows
+                    ],
+                )
+            )
+        return outputs
+
+    def _content_hashes(self, ids: List[Text]) -> Dict[Text, Text]:
+        output: Dict[Text, Text] = {}
+        for _id in ids:
+            row = self._id_to_row.get(_id)
+            if row is None:
+                continue
+            content_hash = self._payloads[row]["metadata"].get("content_hash")
+            if content_hash:
+                output[_id] = content_hash
+        return output
+
+    def _delete(
+        self,
+        ids: Optional[List[Text]],
+        filter: Optional[Dict],
+        delete_all: Optional[bool],
+    ) -> None:
+        if delete_all:
+            self._vectors = np.zeros((0, self.vector_size), dtype=np.float32)
+            self._size = 0
+            self._ids, self._payloads, self._id_to_row = [], [], {}
+            self._dirty = True
+            return
+
+        if ids:
+            rows = {self._id_to_row[_id] for _id in ids if _id in self._id_to_row}
+        else:
+            rows = {
+                row
+                for row, (payload, _id) in enumerate(zip(self._payloads, self._ids))
+                if match_filter(payload, filter, point_id=_id)
+            }
+        if not rows:
+            return
+
+        keep = np.ones(self._size, dtype=bool)
+        keep[list(rows)] = False
+        self._vectors = np.ascontiguousarray(self._vectors[: self._size][keep])
+        self._ids = [_id for _id, k in zip(self._ids, keep) if k]
+        self._payloads = [payload for payload, k in zip(self._payloads, keep) if k]
+        self._id_to_row = {_id: row for row, _id in enumerate(self._ids)}
+        self._size = len(self._ids)
+        self._dirty = True
+
+    def _reserve(self, size: int) -> None:
+        capacity = self._vectors.shape[0]
+        if size <= capacity and self._vectors.flags.writeable:
+            return
+
+        # Grow geometrically, which also copies a read-only memory map to RAM
+        new_capacity = max(size, capacity * 2 if size > capacity else capacity, 64)
+        vectors = np.zeros((new_capacity, self.vector_size), dtype=np.float32)
+        vectors[: self._size] = self._vectors[: self._size]
+        self._vectors = vectors
+
+    async def _maybe_snapshot(self) -> None:
+        if (
+            self.path
+            and self._dirty
+            and time.monotonic() - self._snapshot_at >= self.snapshot_interval
+        ):
+            await self._run(self.snapshot)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
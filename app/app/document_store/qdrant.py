@@ -1,9 +1,10 @@
+import asyncio
 import datetime
-from dataclasses import asdict
-from typing import Dict, List, Optional, Text
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Text, TypeVar
 
 import qdrant_client
-from pyassorted.asyncio import run_func
 from qdrant_client.models import models as qdrant_models
 
 from .abc import DocumentStore
@@ -15,19 +16,37 @@ from app.schema.models import (
     QueryWithEmbedding,
 )
 
+T = TypeVar("T")
+
 
 class QdrantDocumentStore(DocumentStore):
+    """Qdrant backed document store.
+
+    The synchronous client shares one gRPC channel, which multiplexes
+    concurrent calls. Calls run on bounded thread pools so they never block
+    the event loop, and writes use a separate pool from searches so a large
+    upsert cannot starve concurrent queries.
+
+    Payloads carry only id, text and metadata, the vector is stored once.
+    """
+
     def __init__(
         self,
         collection_name: Optional[str] = None,
         vector_size: int = 1536,
         distance: str = "Cosine",
+        timeout: Optional[float] = None,
+        read_workers: Optional[int] = None,
+        write_workers: Optional[int] = None,
+        payload_indexes: Optional[List[Text]] = None,
+        quantization: Optional[Text] = None,
     ):
         self._host = settings.QDRANT_URL
         self._port = int(settings.QDRANT_PORT)
         self._grpc_port = int(settings.QDRANT_GRPC_PORT)
         self.vector_size = int(vector_size)
         self.distance = distance
+        self.timeout = float(timeout or settings.QDRANT_TIMEOUT)
 
         self.client = qdrant_client.QdrantClient(
             url=self._host,
@@ -35,9 +54,26 @@ class QdrantDocumentStore(DocumentStore):
             grpc_port=self._grpc_port,
             api_key=settings.QDRANT_API_KEY,
             prefer_grpc=True,
-            timeout=10,
+            timeout=self.timeout,
         )
         self.collection_name = collection_name
+        self.payload_indexes = (
+            settings.QDRANT_PAYLOAD_INDEXES
+            if payload_indexes is None
+            else payload_indexes
+        )
+        self.quantization = (quantization or settings.QDRANT_QUANTIZATION).lower()
+        if self.quantization not in ("none", "int8"):
+            raise ValueError(f"Quantization {self.quantization} not supported.")
+
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=read_workers or settings.QDRANT_READ_WORKERS,
+            thread_name_prefix="qdrant-read",
+        )
+        self._write_executor = ThreadPoolExecutor(
+            max_workers=write_workers or settings.QDRANT_WRITE_WORKERS,
+            thread_name_prefix="qdrant-write",
+        )
 
     @property
     def host(self) -> Text:
@@ -47,22 +83,47 @@ class QdrantDocumentStore(DocumentStore):
     def port(self) -> Text:
         return self._port
 
+    @property
+    def quantization_config(self) -> Optional[qdrant_models.ScalarQuantization]:
+        if self.quantization == "int8":
+            return qdrant_models.ScalarQuantization(
+                scalar=qdrant_models.ScalarQuantizationConfig(
+                    type=qdrant_models.ScalarType.INT8,
+                    quantile=settings.QDRANT_QUANTIZATION_QUANTILE,
+                    always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM,
+                )
+            )
+        return None
+
+    @property
+    def search_params(self) -> Optional[qdrant_models.SearchParams]:
+        if self.quantization == "none":
+            return None
+        return qdrant_models.SearchParams(
+            quantization=qdrant_models.QuantizationSearchParams(
+                rescore=settings.QDRANT_QUANTIZATION_RESCORE
+            )
+        )
+
     async def touch(self) -> bool:
         try:
-            await run_func(self.client.get_collection, self.collection_name)
+            info = await self._read(self.client.get_collection, self.collection_name)
+            await self.ensure_payload_indexes(existing=info.payload_schema or {})
             return True
         except Exception as e:
             if "Not found: Collection" in str(e):
                 logger.info(f"Create collection: {self.collection_name}")
                 try:
-                    await run_func(
+                    await self._write(
                         self.client.create_collection,
                         self.collection_name,
                         vectors_config=qdrant_models.VectorParams(
                             size=self.vector_size,
                             distance=self.distance,
                         ),
+                        quantization_config=self.quantization_config,
                     )
+                    await self.ensure_payload_indexes()
                     return True
                 except Exception as e:
                     logger.exception(e)
@@ -70,6 +131,56 @@ class QdrantDocumentStore(DocumentStore):
                 logger.exception(e)
         return False
 
+    async def ensure_payload_indexes(self, existing: Optional[Dict] = None) -> None:
+        existing = existing or {}
+        for field_name in self.payload_indexes:
+            if field_name in existing:
+                continue
+            logger.info(f"Create payload index: {self.collection_name}.{field_name}")
+            try:
+                await self._write(
+                    self.client.create_payload_index,
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=qdrant_models.PayloadSchemaType.KEYWORD,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to create payload index {field_name}: {e}")
+
+    async def migrate_payloads(self, batch_size: int = 256) -> int:
+        """Drop embeddings duplicated into payloads by earlier versions.
+
+        Returns the number of rewritten points.
+        """
+
+        legacy_filter = qdrant_models.Filter(
+            must_not=[
+                qdrant_models.IsEmptyCondition(
+                    is_empty=qdrant_models.PayloadField(key="embedding")
+                )
+            ]
+        )
+        migrated = 0
+        while True:
+            records, _ = await self._read(
+                self.client.scroll,
+                collection_name=self.collection_name,
+                scroll_filter=legacy_filter,
+                limit=batch_size,
+                with_payload=False,
+                with_vectors=False,
+            )
+            if not records:
+                return migrated
+            await self._write(
+                self.client.delete_payload,
+                collection_name=self.collection_name,
+                keys=["embedding", "score"],
+                points=[record.id for record in records],
+            )
+            migrated += len(records)
+            logger.info(f"Migrated {migrated} points of {self.collection_name}.")
+
     async def upsert(self, documents: List[DocumentWithEmbedding]) -> List[Text]:
         created_at = datetime.datetime.utcnow().isoformat()
         points: List[qdrant_models.PointStruct] = []
@@ -77,12 +188,16 @@ class QdrantDocumentStore(DocumentStore):
             _point = qdrant_models.PointStruct(
                 id=doc.id,
                 vector=doc.embedding,
-                payload=asdict(doc),
+                payload=dict(
+                    id=doc.id,
+                    text=doc.text,
+                    metadata=dict(doc.metadata or {}, created_at=created_at),
+                ),
             )
-            _point.payload["metadata"]["created_at"] = created_at
             points.append(_point)
 
-        self.client.upsert(
+        await self._write(
+            self.client.upsert,
             collection_name=self.collection_name,
             points=points,
             wait=True,
@@ -95,12 +210,14 @@ class QdrantDocumentStore(DocumentStore):
                 vector=query.embedding,
                 filter=query.filter,
                 limit=query.top_k,
+                params=self.search_params,
                 with_payload=True,
-                with_vector=False,
+                with_vector=bool(query.include_embedding),
             )
             for query in queries
         ]
-        results = self.client.search_batch(
+        results = await self._read(
+            self.client.search_batch,
             collection_name=self.collection_name,
             requests=search_requests,
         )
@@ -136,11 +253,56 @@ class QdrantDocumentStore(DocumentStore):
             points_selector = qdrant_models.Filter()
         elif ids:
             points_selector = qdrant_models.PointIdsList(points=ids)
+        elif isinstance(filter, dict):
+            points_selector = qdrant_models.Filter(**filter)
         else:
             points_selector = filter
 
-        response = self.client.delete(
+        response = await self._write(
+            self.client.delete,
             collection_name=self.collection_name,
             points_selector=points_selector,
         )
         return qdrant_models.UpdateStatus.COMPLETED == response.status
+
+    async def content_hashes(self, ids: List[Text]) -> Dict[Text, Text]:
+        if not ids:
+            return {}
+        records = await self._read(
+            self.client.retrieve,
+            collection_name=self.collection_name,
+            ids=ids,
+            with_payload=["metadata"],
+            with_vectors=False,
+        )
+        output: Dict[Text, Text] = {}
+        for record in records:
+            content_hash = ((record.payload or {}).get("metadata") or {}).get(
+                "content_hash"
+            )
+            if content_hash:
+                output[str(record.id)] = content_hash
+        return output
+
+    async def close(self) -> None:
+        self._read_executor.shutdown(wait=False)
+        self._write_executor.shutdown(wait=False)
+
+    async def _read(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self._run(self._read_executor, func, *args, **kwargs)
+
+    async def _write(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self._run(self._write_executor, func, *args, **kwargs)
+
+    async def _run(
+        self,
+        executor: "ThreadPoolExecutor",
+        func: Callable[..., T],
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(executor, functools.partial(func, *args, **kwargs)),
+            timeout=self.timeout,
+        )
@@ -0,0 +1,13 @@
+from .abc import EmbeddingProvider
+from .batcher import EmbeddingBatcher
+from .cache import EmbeddingCache
+from .embedder import Embedder
+from .factory import get_embedding_provider
+
+__all__ = [
+    "EmbeddingBatcher",
+    "EmbeddingCache",
+    "Embedder",
+    "EmbeddingProvider",
+    "get_embedding_provider",
+]
@@ -0,0 +1,22 @@
+from abc import ABC, abstractmethod
+from typing import List, Text
+
+import numpy as np
+
+
+class EmbeddingProvider(ABC):
+    @property
+    @abstractmethod
+    def model(self) -> Text:
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def embed(self, texts: List[Text]) -> "np.ndarray":
+        """Return a float32 array of shape (len(texts), dimension)."""
+
+        raise NotImplementedError
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Text, Tuple
+
+from app.utils.histogram import Histogram
+
+EmbedFunc = Callable[[List[Text]], Awaitable[List[List[float]]]]
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+class EmbeddingBatcher:
+    """Coalesce embedding calls from concurrent requests into provider batches.
+
+    Texts are queued until either `max_wait` seconds have passed since the
+    first queued text or `max_batch_size` texts are waiting, then one call
+    to `embed_func` is issued and the vectors are fanned back out.
+    """
+
+    def __init__(
+        self,
+        embed_func: EmbedFunc,
+        max_wait: float = 0.005,
+        max_batch_size: int = 256,
+    ):
+        self.embed_func = embed_func
+        self.max_wait = max(float(max_wait), 0.0)
+        self.max_batch_size = max(int(max_batch_size), 1)
+
+        self._pending: List[Tuple[Text, "asyncio.Future", float]] = []
+        self._timer: Optional["asyncio.TimerHandle"] = None
+        self._tasks: Set["asyncio.Task"] = set()
+
+        self.batch_size_histogram = Histogram(buckets=BATCH_SIZE_BUCKETS)
+        self.wait_time_histogram = Histogram()
+        self.batches = 0
+        self.failures = 0
+
+    async def embed(self, texts: List[Text]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        loop = asyncio.get_running_loop()
+        now = time.perf_counter()
+        futures: List["asyncio.Future"] = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future, now))
+            futures.append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return list(await asyncio.gather(*futures))
+
+    def stats(self) -> Dict[Text, Any]:
+        return dict(
+            batches=self.batches,
+            failures=self.failures,
+            pending=len(self._pending),
+            batch_size=self.batch_size_histogram.stats(),
+            wait_time=self.wait_time_histogram.stats(),
+        )
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = time.perf_counter()
+        pending, self._pending = self._pending, []
+        for i in range(0, len(pending), self.max_batch_size):
+            batch = pending[i : i + self.max_batch_size]
+            for _, _, queued_at in batch:
+                self.wait_time_histogram.observe(now - queued_at)
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Text, "asyncio.Future", float]]):
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batches += 1
+        self.batch_size_histogram.observe(len(texts))
+        try:
+            embeddings = await self.embed_func(texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(
+                    f"Expected {len(texts)} embeddings, got {len(embeddings)}."
+                )
+        except Exception as e:
+            self.failures += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        text_to_embedding = dict(zip(texts, embeddings))
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(text_to_embedding[text])
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Text
+
+from app.config import logger
+from app.utils.cache import LRUCache
+from app.utils.text import normalize_text
+
+
+def embedding_key(model: Text, text: Text) -> Text:
+    return hashlib.sha256(
+        f"{model}\x00{normalize_text(text)}".encode("utf-8")
+    ).hexdigest()
+
+
+class SqliteEmbeddingStore:
+    """Float32 embeddings persisted in a sqlite file shared by all workers."""
+
+    def __init__(self, path: Text):
+        self.path = path
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            + "key TEXT PRIMARY KEY, "
+            + "model TEXT NOT NULL, "
+            + "vector BLOB NOT NULL, "
+            + "created_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get_many(self, keys: Sequence[Text]) -> Dict[Text, "array"]:
+        output: Dict[Text, "array"] = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):  # Keep under SQLITE_MAX_VARIABLE_NUMBER
+            _keys = keys[i : i + 500]
+            rows = self.conn.execute(
+                "SELECT key, vector FROM embeddings "
+                + f"WHERE key IN ({','.join('?' * len(_keys))})",
+                _keys,
+            ).fetchall()
+            for key, blob in rows:
+                vector = array("f")
+                vector.frombytes(blob)
+                output[key] = vector
+        return output
+
+    def put_many(self, model: Text, items: Dict[Text, "array"]) -> None:
+        created_at = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, vector, created_at) "
+            + "VALUES (?, ?, ?, ?)",
+            [
+                (key, model, vector.tobytes(), created_at)
+                for key, vector in items.items()
+            ],
+        )
+        self.conn.commit()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache.
+
+    Lookups hit an in-process LRU first and fall back to the on-disk store,
+    which survives restarts and is shared between workers.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, path: Optional[Text] = None):
+        self.memory: LRUCache[array] = LRUCache(max_bytes=max_bytes)
+        self.disk: Optional[SqliteEmbeddingStore] = (
+            SqliteEmbeddingStore(path) if path else None
+        )
+        # A single thread serializes access to the sqlite connection
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="embedding-cache"
+        )
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get_many(
+        self, model: Text, texts: Sequence[Text]
+    ) -> List[Optional[List[float]]]:
+        keys = [embedding_key(model, text) for text in texts]
+        vectors: Dict[Text, "array"] = {}
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is not None:
+                vectors[key] = vector
+
+        missed_keys = list({key for key in keys if key not in vectors})
+        if missed_keys and self.disk is not None:
+            try:
+                disk_vectors = await self._run(self.disk.get_many, missed_keys)
+            except Exception as e:
+                logger.exception(e)
+                disk_vectors = {}
+            for key, vector in disk_vectors.items():
+                self.memory.put(key, vector, size=vector.itemsize * len(vector))
+                vectors[key] = vector
+            self.disk_hits += len(disk_vectors)
+
+        output: List[Optional[List[float]]] = []
+        for key in keys:
+            vector = vectors.get(key)
+            if vector is None:
+                self.misses += 1
+                output.append(None)
+            else:
+                self.hits += 1
+                output.append(vector.tolist())
+        return output
+
+    async def put_many(
+        self, model: Text, texts: Sequence[Text], embeddings: Sequence[List[float]]
+    ) -> None:
+        items: Dict[Text, "array"] = {}
+        for text, embedding in zip(texts, embeddings):
+            key = embedding_key(model, text)
+            vector = array("f", embedding)
+            self.memory.put(key, vector, size=vector.itemsize * len(vector))
+            items[key] = vector
+
+        if items and self.disk is not None:
+            try:
+                await self._run(self.disk.put_many, model, items)
+            except Exception as e:
+                logger.exception(e)
+
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            disk_hits=self.disk_hits,
+            misses=self.misses,
+            hit_ratio=(self.hits / lookups) if lookups else 0.0,
+            memory=self.memory.stats(),
+            disk_path=self.disk.path if self.disk else None,
+        )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
@@ -0,0 +1,62 @@
+from typing import List, Optional, Text
+
+from .abc import EmbeddingProvider
+from .batcher import EmbeddingBatcher
+from .cache import EmbeddingCache
+
+
+class Embedder:
+    """Embed texts through the cache, sending misses to the provider in batches."""
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        cache: Optional[EmbeddingCache] = None,
+        batcher: Optional[EmbeddingBatcher] = None,
+    ):
+        self.provider = provider
+        self.cache = cache
+        self.batcher = batcher
+
+    @property
+    def model(self) -> Text:
+        return self.provider.model
+
+    @property
+    def dimension(self) -> int:
+        return self.provider.dimension
+
+    async def embed(self, texts: List[Text]) -> List[List[float]]:
+        texts = [text.strip() for text in texts]
+        if not texts:
+            return []
+
+        if self.cache is None:
+            embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        else:
+            embeddings = await self.cache.get_many(model=self.model, texts=texts)
+
+        missed_texts = list(
+            dict.fromkeys(text for text, emb in zip(texts, embeddings) if emb is None)
+        )
+        if missed_texts:
+            missed_embeddings = await self.embed_uncached(missed_texts)
+            if self.cache is not None:
+                await self.cache.put_many(
+                    model=self.model, texts=missed_texts, embeddings=missed_embeddings
+                )
+            text_to_embedding = dict(zip(missed_texts, missed_embeddings))
+            embeddings = [
+                text_to_embedding[text] if emb is None else emb
+                for text, emb in zip(texts, embeddings)
+            ]
+        return embeddings
+
+    async def embed_uncached(self, texts: List[Text]) -> List[List[float]]:
+        if self.batcher is not None:
+            return await self.batcher.embed(texts)
+        return await self.create(texts)
+
+    async def create(self, texts: List[Text]) -> List[List[float]]:
+        embeddings = await self.provider.embed(texts)
+        return embeddings.tolist()
@@ -0,0 +1,45 @@
+from typing import Optional, Text
+
+from .abc import EmbeddingProvider
+from app.config import settings
+
+
+def get_embedding_provider(
+    provider: Optional[Text] = None, model: Optional[Text] = None
+) -> "EmbeddingProvider":
+    provider = (provider or settings.EMBEDDING_PROVIDER).lower().strip()
+    model = model or settings.EMBEDDING_MODEL
+
+    if provider == "openai":
+        from .openai import OpenAIEmbeddingProvider
+
+        return OpenAIEmbeddingProvider(
+            model=model or "text-embedding-ada-002",
+            api_key=settings.OPENAI_API_KEY,
+            max_batch_size=settings.OPENAI_EMBEDDING_MAX_BATCH_SIZE,
+            max_batch_tokens=settings.OPENAI_EMBEDDING_MAX_BATCH_TOKENS,
+            max_input_tokens=settings.OPENAI_EMBEDDING_MAX_INPUT_TOKENS,
+            max_concurrency=settings.OPENAI_EMBEDDING_CONCURRENCY,
+            max_retries=settings.OPENAI_EMBEDDING_MAX_RETRIES,
+            encoding=settings.CHUNK_ENCODING,
+        )
+
+    elif provider == "hashing":
+        from .local import HashingEmbeddingProvider
+
+        return HashingEmbeddingProvider(
+            dimension=settings.VECTOR_SIZE,
+            max_workers=settings.LOCAL_EMBEDDING_WORKERS,
+            batch_size=settings.LOCAL_EMBEDDING_BATCH_SIZE,
+        )
+
+    elif provider == "sentence_transformers":
+        from .local import SentenceTransformerEmbeddingProvider
+
+        return SentenceTransformerEmbeddingProvider(
+            model=model or "sentence-transformers/all-MiniLM-L6-v2",
+            max_workers=settings.LOCAL_EMBEDDING_WORKERS,
+            batch_size=settings.LOCAL_EMBEDDING_BATCH_SIZE,
+        )
+
+    raise ValueError(f"Embedding provider {provider} not supported.")
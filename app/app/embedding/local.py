@@ -0,0 +1,109 @@
+import asyncio
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Text
+
+import numpy as np
+
+from .abc import EmbeddingProvider
+
+
+class _ThreadPoolEmbeddingProvider(EmbeddingProvider):
+    """Run a blocking batch encoder on a dedicated thread pool."""
+
+    def __init__(self, max_workers: int = 2, batch_size: int = 64):
+        self.max_workers = max(int(max_workers), 1)
+        self.batch_size = max(int(batch_size), 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="embedding"
+        )
+
+    async def embed(self, texts: List[Text]) -> "np.ndarray":
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    self._executor, self.encode, texts[i : i + self.batch_size]
+                )
+                for i in range(0, len(texts), self.batch_size)
+            ]
+        )
+        return np.concatenate(batches, axis=0)
+
+    def encode(self, texts: List[Text]) -> "np.ndarray":
+        raise NotImplementedError
+
+
+class HashingEmbeddingProvider(_ThreadPoolEmbeddingProvider):
+    """Deterministic feature-hashing embedder over word uni- and bi-grams.
+
+    It needs no model files or network, which makes it suitable for tests,
+    benchmarks and fully offline deployments.
+    """
+
+    token_pattern = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, dimension: int = 1536, **kwargs):
+        super().__init__(**kwargs)
+        self._dimension = int(dimension)
+
+    @property
+    def model(self) -> Text:
+        return f"hashing-{self._dimension}"
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def encode(self, texts: List[Text]) -> "np.ndarray":
+        output = np.zeros((len(texts), self._dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = self.token_pattern.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                output[row, h % self._dimension] += 1.0 if h & 0x80000000 else -1.0
+
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return output / norms
+
+
+class SentenceTransformerEmbeddingProvider(_ThreadPoolEmbeddingProvider):
+    def __init__(
+        self,
+        model: Text = "sentence-transformers/all-MiniLM-L6-v2",
+        device: Optional[Text] = None,
+        **kwargs,
+    ):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError(
+                "Package sentence-transformers is required for the "
+                + "sentence_transformers embedding provider."
+            )
+
+        super().__init__(**kwargs)
+        self._model = model
+        self.encoder = SentenceTransformer(model, device=device or "cpu")
+
+    @property
+    def model(self) -> Text:
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return int(self.encoder.get_sentence_embedding_dimension())
+
+    def encode(self, texts: List[Text]) -> "np.ndarray":
+        return self.encoder.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype(np.float32)
@@ -0,0 +1,230 @@
+import asyncio
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+import numpy as np
+import openai
+from openai import error as openai_error
+from openai.openai_object import OpenAIObject
+
+from .abc import EmbeddingProvider
+from app.config import logger
+from app.schema.openai import OpenaiEmbeddingResult
+from app.utils.metrics import metrics
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings in token-budgeted batches under an adaptive concurrency.
+
+    Inputs are split into batches of at most `max_batch_size` texts and
+    `max_batch_tokens` tokens, sent concurrently and reassembled in order.
+    A rate limited batch halves the concurrency limit, pauses every batch
+    until the reset time the API reports, and is retried with jitter; each
+    successful batch raises the limit by one again, up to `max_concurrency`.
+    """
+
+    model_dimensions: Dict[Text, int] = {
+        "text-embedding-ada-002": 1536,
+    }
+    retry_exceptions = (
+        openai_error.RateLimitError,
+        openai_error.APIError,
+        openai_error.APIConnectionError,
+        openai_error.ServiceUnavailableError,
+        openai_error.Timeout,
+        openai_error.TryAgain,
+    )
+
+    def __init__(
+        self,
+        model: Text = "text-embedding-ada-002",
+        api_key: Optional[Text] = None,
+        dimension: Optional[int] = None,
+        max_batch_size: int = 2048,
+        max_batch_tokens: int = 100000,
+        max_input_tokens: int = 8191,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        encoding: Text = "cl100k_base",
+    ):
+        if api_key:
+            openai.api_key = api_key
+
+        self._model = model
+        self._dimension = int(dimension or self.model_dimensions.get(model, 0))
+        if not self._dimension:
+            raise ValueError(f"Unknown dimension of embedding model {model}.")
+
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_input_tokens = max(int(max_input_tokens), 1)
+        self.max_batch_tokens = max(int(max_batch_tokens), self.max_input_tokens)
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.max_retries = max(int(max_retries), 0)
+        self.encoding = encoding
+
+        self.concurrency = self.max_concurrency
+        self._in_flight = 0
+        self._slots: Optional[asyncio.Condition] = None
+        self._resume_at = 0.0
+        self._tokenizer: Any = None
+
+    @property
+    def model(self) -> Text:
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    @property
+    def tokenizer(self) -> Any:
+        if self._tokenizer is None:
+            try:
+                import tiktoken
+
+                self._tokenizer = tiktoken.get_encoding(self.encoding)
+            except Exception as e:
+                # UTF-8 bytes bound BPE tokens from above, batches only get smaller
+                logger.warning(
+                    f"Failed to load tiktoken encoding '{self.encoding}', "
+                    + f"fall back to counting bytes as tokens: {e}"
+                )
+                self._tokenizer = False
+        return self._tokenizer
+
+    async def embed(self, texts: List[Text]) -> "np.ndarray":
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        # Tokenizing, and loading the encoding the first time, blocks
+        loop = asyncio.get_running_loop()
+        batches = await loop.run_in_executor(None, self.split, texts)
+        embeddings = await asyncio.gather(
+            *[self._embed_batch(batch) for batch in batches]
+        )
+        return np.concatenate(embeddings, axis=0)
+
+    def split(self, texts: List[Text]) -> List[List[Text]]:
+        """Consecutive batches under the size and token limits."""
+
+        batches: List[List[Text]] = []
+        batch: List[Text] = []
+        batch_tokens = 0
+        for text in texts:
+            text, tokens = self._fit(text)
+            if batch and (
+                len(batch) >= self.max_batch_size
+                or batch_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _fit(self, text: Text) -> Tuple[Text, int]:
+        # The API rejects inputs over the model's context instead of truncating
+        tokenizer = self.tokenizer
+        if not tokenizer:
+            data = text.encode("utf-8")
+            if len(data) > self.max_input_tokens:
+                data = data[: self.max_input_tokens]
+                text = data.decode("utf-8", errors="ignore")
+            return text, len(data) or 1
+
+        tokens = tokenizer.encode(text, disallowed_special=())
+        if len(tokens) > self.max_input_tokens:
+            tokens = tokens[: self.max_input_tokens]
+            text = tokenizer.decode(tokens)
+        return text, len(tokens) or 1
+
+    async def _embed_batch(self, texts: List[Text]) -> "np.ndarray":
+        attempt = 0
+        while True:
+            await self._acquire()
+            try:
+                emb_res_obj: "OpenAIObject" = await openai.Embedding.acreate(
+                    input=texts, model=self.model
+                )
+            except self.retry_exceptions as e:
+                rate_limited = isinstance(e, openai_error.RateLimitError)
+                await self._release(ok=False, rate_limited=rate_limited)
+                if attempt >= self.max_retries:
+                    metrics.inc("embedding_requests_total", outcome="failed")
+                    raise
+                delay = self._retry_delay(e, attempt)
+                metrics.inc("embedding_requests_total", outcome="retried")
+                logger.debug(f"Retry embedding batch in {delay:.2f}s: {e}")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                await self._release(ok=False)
+                metrics.inc("embedding_requests_total", outcome="failed")
+                raise
+            await self._release()
+            metrics.inc("embedding_requests_total", outcome="ok")
+            break
+
+        emb_res: OpenaiEmbeddingResult = emb_res_obj.to_dict_recursive()
+        return np.asarray(
+            [
+                emb["embedding"]
+                for emb in sorted(emb_res["data"], key=lambda emb: emb["index"])
+            ],
+            dtype=np.float32,
+        )
+
+    async def _acquire(self) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Condition()
+        async with self._slots:
+            await self._slots.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+        pause = self._resume_at - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+    async def _release(self, ok: bool = True, rate_limited: bool = False) -> None:
+        async with self._slots:
+            self._in_flight -= 1
+            if rate_limited:
+                self.concurrency = max(self.concurrency // 2, 1)
+            elif ok and self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+            self._slots.notify_all()
+        metrics.set_gauge("embedding_concurrency", self.concurrency)
+
+    def _retry_delay(self, e: Exception, attempt: int) -> float:
+        backoff = min(0.5 * 2**attempt, 30.0)
+        delay = random.uniform(backoff / 2, backoff)
+        headers = getattr(e, "headers", None) or {}
+        reset = _parse_duration(headers.get("retry-after")) or max(
+            _parse_duration(headers.get("x-ratelimit-reset-requests")),
+            _parse_duration(headers.get("x-ratelimit-reset-tokens")),
+        )
+        if reset:
+            # Every batch waits for the reported reset, spread by a little jitter
+            delay = reset + random.uniform(0, min(reset, 1.0) / 2)
+            self._resume_at = max(self._resume_at, time.monotonic() + reset)
+        return delay
+
+
+def _parse_duration(value: Optional[Text]) -> float:
+    """Seconds of `retry-after` values and reset headers such as `6m0s` or `20ms`."""
+
+    if not value:
+        return 0.0
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    units = dict(h=3600.0, m=60.0, s=1.0, ms=0.001)
+    return sum(
+        float(number) * units[unit]
+        for number, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    )
@@ -0,0 +1,12 @@
+from .dump import clean_wikitext, iter_jsonl_dump, iter_xml_dump, parse_page
+from .pipeline import Checkpoint, DumpIngestor, IngestStats
+
+__all__ = [
+    "Checkpoint",
+    "DumpIngestor",
+    "IngestStats",
+    "clean_wikitext",
+    "iter_jsonl_dump",
+    "iter_xml_dump",
+    "parse_page",
+]
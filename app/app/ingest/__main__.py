@@ -0,0 +1,132 @@
+"""Bulk ingest a local Wikipedia dump.
+
+    python -m app.ingest enwiki-latest-pages-articles.xml.bz2 --lang en
+    python -m app.ingest extracted.jsonl --format jsonl --lang zh
+
+Run it against a NumPy store only while the service is down, the service
+would otherwise overwrite the snapshot with its own copy.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from typing import List, Optional, Text
+
+from app.config import logger, settings
+from app.document_store import LexicalIndex, factory as doc_store_factory
+from app.embedding import Embedder, EmbeddingCache, get_embedding_provider
+from app.service.chunker import DocumentChunker
+
+from .pipeline import DumpIngestor
+
+
+def guess_format(path: Text) -> Text:
+    name = path
+    for ext in (".bz2", ".gz"):
+        if name.endswith(ext):
+            name = name[: -len(ext)]
+    return "jsonl" if name.endswith((".jsonl", ".json", ".ndjson")) else "xml"
+
+
+def parse_args(argv: Optional[List[Text]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.ingest",
+        description="Stream a Wikipedia XML dump or JSONL file into the document store.",
+    )
+    parser.add_argument("path", help="Path of .xml[.bz2] dump or .jsonl[.bz2] file.")
+    parser.add_argument("--format", choices=("xml", "jsonl"), default=None)
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--datastore", default=settings.DATASTORE)
+    parser.add_argument("--collection", default=settings.QDRANT_COLLECTION)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--full-text",
+        action="store_true",
+        help="Keep whole articles instead of the lead section.",
+    )
+    parser.add_argument(
+        "--chunk-token-size",
+        type=int,
+        default=settings.CHUNK_TOKEN_SIZE,
+        help="Split texts into token windows of this size, 0 disables chunking.",
+    )
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--no-resume", action="store_true")
+    parser.add_argument(
+        "--embedding-cache",
+        action="store_true",
+        help="Read and fill the shared on-disk embedding cache.",
+    )
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    return parser.parse_args(argv)
+
+
+async def main(args: argparse.Namespace) -> None:
+    provider = get_embedding_provider()
+    cache = (
+        EmbeddingCache(
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+            path=settings.EMBEDDING_CACHE_PATH or None,
+        )
+        if args.embedding_cache
+        else None
+    )
+    embedder = Embedder(provider=provider, cache=cache)
+
+    doc_store = doc_store_factory.get_document_store(
+        collection_name=args.collection,
+        vector_size=provider.dimension,
+        datastore=args.datastore,
+    )
+    if not await doc_store.touch():
+        raise ValueError(f"Failed to touch document store '{args.datastore}'.")
+
+    lexical_index = (
+        LexicalIndex(path=settings.LEXICAL_INDEX_PATH, collection_name=args.collection)
+        if settings.LEXICAL_INDEX
+        else None
+    )
+
+    checkpoint_path = args.checkpoint or os.path.join(
+        settings.DATA_DIR,
+        "ingest",
+        f"{os.path.basename(args.path)}.{args.collection}.checkpoint.json",
+    )
+    ingestor = DumpIngestor(
+        embedder=embedder,
+        document_store=doc_store,
+        lang=args.lang,
+        fmt=args.format or guess_format(args.path),
+        batch_size=args.batch_size,
+        parse_workers=max(args.workers, 1),
+        intro_only=not args.full_text,
+        chunker=(
+            DocumentChunker(
+                chunk_token_size=args.chunk_token_size,
+                overlap=settings.CHUNK_OVERLAP_TOKENS,
+                encoding=settings.CHUNK_ENCODING,
+            )
+            if args.chunk_token_size > 0
+            else None
+        ),
+        checkpoint_path=checkpoint_path,
+        report_interval=args.report_interval,
+        lexical_index=lexical_index,
+    )
+    try:
+        await ingestor.run(
+            args.path, max_pages=args.max_pages, resume=not args.no_resume
+        )
+    finally:
+        await doc_store.close()
+        if lexical_index is not None:
+            await lexical_index.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logger.setLevel(logging.INFO)
+    asyncio.run(main(parse_args()))
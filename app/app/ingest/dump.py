@@ -0,0 +1,133 @@
+import bz2
+import gzip
+import json
+import re
+import xml.etree.ElementTree as ET
+from typing import IO, Any, Dict, Iterator, Optional, Text
+
+RawPage = Dict[Text, Any]
+
+
+def open_dump(path: Text, mode: Text = "rb") -> IO:
+    if path.endswith(".bz2"):
+        return bz2.open(path, mode)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _local_name(tag: Text) -> Text:
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_xml_dump(path: Text) -> Iterator[RawPage]:
+    """Stream main-namespace, non-redirect pages of a MediaWiki XML dump.
+
+    Parsed elements are cleared as soon as a page is emitted, so memory
+    stays flat regardless of the dump size.
+    """
+
+    with open_dump(path, "rb") as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        page: RawPage = {}
+        for event, elem in context:
+            tag = _local_name(elem.tag)
+            if event == "start":
+                if tag == "page":
+                    page = {}
+                continue
+
+            if tag == "title":
+                page["title"] = elem.text or ""
+            elif tag == "ns":
+                page["ns"] = int(elem.text or 0)
+            elif tag == "id" and "id" not in page:
+                page["id"] = elem.text
+            elif tag == "redirect":
+                page["redirect"] = True
+            elif tag == "text":
+                page["text"] = elem.text or ""
+            elif tag == "page":
+                if page.get("ns", 0) == 0 and not page.get("redirect"):
+                    yield page
+                root.clear()
+
+
+def iter_jsonl_dump(path: Text) -> Iterator[RawPage]:
+    """Stream pre-extracted pages, one `{"title": ..., "text": ...}` per line."""
+
+    with open_dump(path, "rt") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            page = json.loads(line)
+            if page.get("title") and page.get("text"):
+                yield page
+
+
+_COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+_REF_PATTERN = re.compile(
+    r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE
+)
+_TEMPLATE_PATTERN = re.compile(r"\{\{[^{}]*\}\}")
+_TABLE_PATTERN = re.compile(r"\{\|.*?\|\}", re.DOTALL)
+_FILE_LINK_PATTERN = re.compile(
+    r"\[\[(?:File|Image|Category|Media):[^\[\]]*(?:\[\[[^\[\]]*\]\][^\[\]]*)*\]\]",
+    re.IGNORECASE,
+)
+_LINK_PATTERN = re.compile(r"\[\[(?:[^\[\]|]*\|)?([^\[\]]*)\]\]")
+_EXTERNAL_LINK_PATTERN = re.compile(r"\[https?://[^\s\]]+\s*([^\]]*)\]")
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+_EMPHASIS_PATTERN = re.compile(r"'{2,}")
+_HEADING_PATTERN = re.compile(r"^(={2,})\s*(.*?)\s*\1\s*$", re.MULTILINE)
+_LIST_PATTERN = re.compile(r"^[*#:;]+\s*", re.MULTILINE)
+_BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+
+
+def clean_wikitext(text: Text, intro_only: bool = True) -> Text:
+    """Reduce wikitext to plain text, optionally keeping only the lead section."""
+
+    text = _COMMENT_PATTERN.sub("", text)
+    text = _REF_PATTERN.sub("", text)
+    # Templates nest, strip the innermost ones until nothing changes
+    while True:
+        stripped = _TEMPLATE_PATTERN.sub("", text)
+        if stripped == text:
+            break
+        text = stripped
+    text = _TABLE_PATTERN.sub("", text)
+    text = _FILE_LINK_PATTERN.sub("", text)
+    text = _LINK_PATTERN.sub(r"\1", text)
+    text = _EXTERNAL_LINK_PATTERN.sub(r"\1", text)
+    text = _TAG_PATTERN.sub("", text)
+    text = _EMPHASIS_PATTERN.sub("", text)
+
+    if intro_only:
+        heading = _HEADING_PATTERN.search(text)
+        if heading:
+            text = text[: heading.start()]
+    else:
+        text = _HEADING_PATTERN.sub(r"\n\2\n", text)
+
+    text = _LIST_PATTERN.sub("", text)
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    text = "\n".join(lines)
+    return _BLANK_LINES_PATTERN.sub("\n\n", text).strip()
+
+
+def parse_page(
+    page: RawPage, fmt: Text = "xml", intro_only: bool = True
+) -> Optional[RawPage]:
+    """Clean one raw page. Runs in the parse worker processes."""
+
+    text = page.get("text") or ""
+    if fmt == "xml":
+        text = clean_wikitext(text, intro_only=intro_only)
+    elif intro_only:
+        text = text.strip().split("\n\n", 1)[0]
+    text = text.strip()
+    if not text:
+        return None
+    return dict(title=page["title"], text=text)
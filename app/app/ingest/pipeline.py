@@ -0,0 +1,316 @@
+import asyncio
+import collections
+import functools
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Text,
+    Tuple,
+)
+
+from app.config import logger
+from app.document_store import DocumentStore, LexicalIndex
+from app.embedding import Embedder
+from app.schema.models import Document, document_id
+from app.service.chunker import DocumentChunker
+from app.service.ingestion import IngestionService
+
+from .dump import RawPage, iter_jsonl_dump, iter_xml_dump, parse_page
+
+
+def bounded_map(
+    executor: "Executor",
+    func: Callable,
+    iterable: Iterable,
+    max_in_flight: int,
+) -> Iterator[Any]:
+    """Ordered `executor.map` that never reads more than `max_in_flight` items ahead."""
+
+    pending: Deque = collections.deque()
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    chunk: List = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@dataclass
+class Checkpoint:
+    """Number of source pages whose documents have been fully written."""
+
+    source: Text
+    offset: int = 0
+    vectors: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def load(cls, path: Text, source: Text) -> "Checkpoint":
+        if not path or not os.path.exists(path):
+            return cls(source=source)
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("source") != source:
+            logger.warning(
+                f"Ignore checkpoint '{path}' written for source '{data.get('source')}'."
+            )
+            return cls(source=source)
+        return cls(**data)
+
+    def save(self, path: Text) -> None:
+        if not path:
+            return
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.updated_at = time.time()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_path, path)
+
+
+@dataclass
+class IngestStats:
+    pages: int = 0
+    vectors: int = 0
+    skipped: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return max(time.monotonic() - self.started_at, 1e-9)
+
+    def summary(self) -> Dict[Text, Any]:
+        return dict(
+            pages=self.pages,
+            vectors=self.vectors,
+            skipped=self.skipped,
+            elapsed=round(self.elapsed, 2),
+            pages_per_sec=round(self.pages / self.elapsed, 2),
+            vectors_per_sec=round(self.vectors / self.elapsed, 2),
+        )
+
+
+Batch = Tuple[List[Document], int, int]
+
+
+class DumpIngestor:
+    """Stream a local Wikipedia dump into a document store.
+
+    Pages are read lazily, cleaned by a pool of parse processes, embedded in
+    large batches and upserted, with at most a few batches in memory at any
+    time. Reading and parsing the next batch, embedding the current one and
+    writing the previous one overlap. After every write a checkpoint records
+    how many source pages are stored, so an interrupted run resumes where it
+    stopped. Document ids derive from (source, lang, title) like those of the
+    live wiki fetches, and documents whose content hash is already stored are
+    skipped, so replaying a batch or re-ingesting a dump is cheap.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        document_store: DocumentStore,
+        lang: Text = "en",
+        fmt: Text = "xml",
+        batch_size: int = 512,
+        parse_workers: int = 4,
+        parse_chunk_size: int = 64,
+        intro_only: bool = True,
+        chunker: Optional[DocumentChunker] = None,
+        checkpoint_path: Optional[Text] = None,
+        report_interval: float = 10.0,
+        lexical_index: Optional[LexicalIndex] = None,
+    ):
+        if fmt not in ("xml", "jsonl"):
+            raise ValueError(f"Dump format {fmt} not supported.")
+        self.ingestion = IngestionService(
+            embedder=embedder,
+            document_store=document_store,
+            lexical_index=lexical_index,
+        )
+        self.lang = lang
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.parse_workers = parse_workers
+        self.parse_chunk_size = parse_chunk_size
+        self.intro_only = intro_only
+        self.chunker = chunker
+        self.checkpoint_path = checkpoint_path
+        self.report_interval = report_interval
+        self.stats = IngestStats()
+
+    def iter_raw_pages(self, path: Text) -> Iterator[RawPage]:
+        return iter_xml_dump(path) if self.fmt == "xml" else iter_jsonl_dump(path)
+
+    def iter_batches(
+        self, path: Text, offset: int = 0, max_pages: Optional[int] = None
+    ) -> Iterator[Batch]:
+        """Yield `(documents, pages, end_offset)` with `end_offset` in source pages."""
+
+        def _source() -> Iterator[Tuple[int, RawPage]]:
+            for i, page in enumerate(self.iter_raw_pages(path)):
+                if i < offset:
+                    continue
+                if max_pages is not None and i >= offset + max_pages:
+                    break
+                yield i, page
+
+        parse = functools.partial(
+            _parse_indexed_pages,
+            fmt=self.fmt,
+            lang=self.lang,
+            intro_only=self.intro_only,
+            chunker=self.chunker,
+        )
+        docs: List[Document] = []
+        pages = 0
+        end_offset = offset
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+            for parsed in bounded_map(
+                executor,
+                parse,
+                chunked(_source(), self.parse_chunk_size),
+                max_in_flight=self.parse_workers * 2,
+            ):
+                for i, page_docs in parsed:
+                    pages += 1
+                    end_offset = i + 1
+                    docs.extend(page_docs)
+                    # Batches end on page boundaries so checkpoints are exact
+                    if len(docs) >= self.batch_size:
+                        yield docs, pages, end_offset
+                        docs, pages = [], 0
+        if docs or pages:
+            yield docs, pages, end_offset
+
+    async def run(
+        self, path: Text, max_pages: Optional[int] = None, resume: bool = True
+    ) -> IngestStats:
+        source = os.path.abspath(path)
+        checkpoint = (
+            Checkpoint.load(self.checkpoint_path, source)
+            if resume and self.checkpoint_path
+            else Checkpoint(source=source)
+        )
+        if checkpoint.offset:
+            logger.info(f"Resume '{path}' from page {checkpoint.offset}.")
+
+        self.stats = IngestStats()
+        loop = asyncio.get_running_loop()
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dump-reader")
+        batches = self.iter_batches(path, offset=checkpoint.offset, max_pages=max_pages)
+        next_batch = functools.partial(next, batches, None)
+        last_report = time.monotonic()
+        writing: Optional[asyncio.Task] = None
+        try:
+            reading = loop.run_in_executor(reader, next_batch)
+            while True:
+                batch = await reading
+                if batch is None:
+                    break
+                reading = loop.run_in_executor(reader, next_batch)
+
+                docs, pages, end_offset = batch
+                emb_docs = await self.ingestion.embed_changed(docs)
+                self.stats.skipped += len(docs) - len(emb_docs)
+
+                if writing is not None:
+                    await writing
+                writing = asyncio.create_task(
+                    self._write(docs, emb_docs, pages, end_offset, checkpoint)
+                )
+
+                if time.monotonic() - last_report >= self.report_interval:
+                    last_report = time.monotonic()
+                    self.report()
+
+            if writing is not None:
+                await writing
+        finally:
+            if writing is not None and not writing.done():
+                writing.cancel()
+            # The generator is owned by the reader thread, close it there too
+            reader.submit(batches.close)
+            reader.shutdown(wait=True)
+
+        self.report()
+        return self.stats
+
+    async def _write(
+        self,
+        docs: List[Document],
+        emb_docs: List,
+        pages: int,
+        end_offset: int,
+        checkpoint: Checkpoint,
+    ) -> None:
+        if emb_docs:
+            await self.ingestion.write(emb_docs)
+        if self.chunker is not None and docs:
+            # Pages that got shorter since the last run leave chunks behind
+            await self.ingestion.prune_chunks(docs)
+        self.stats.pages += pages
+        self.stats.vectors += len(emb_docs)
+        checkpoint.offset = end_offset
+        checkpoint.vectors += len(emb_docs)
+        checkpoint.save(self.checkpoint_path)
+
+    def report(self) -> None:
+        summary = self.stats.summary()
+        logger.info(
+            f"Ingested {summary['pages']} pages, {summary['vectors']} vectors, "
+            + f"skipped {summary['skipped']} unchanged "
+            + f"in {summary['elapsed']}s "
+            + f"({summary['pages_per_sec']} pages/s, "
+            + f"{summary['vectors_per_sec']} vectors/s)."
+        )
+
+
+def page_document(page: RawPage, lang: Text) -> Document:
+    title = page["title"]
+    return Document(
+        id=document_id(source="wiki", lang=lang, title=title),
+        text=page["text"],
+        metadata=dict(name=title, title=title, source="wiki", lang=lang),
+    )
+
+
+def _parse_indexed_pages(
+    items: List[Tuple[int, RawPage]],
+    fmt: Text,
+    lang: Text,
+    intro_only: bool,
+    chunker: Optional[DocumentChunker],
+) -> List[Tuple[int, List[Document]]]:
+    output: List[Tuple[int, List[Document]]] = []
+    for i, raw_page in items:
+        page = parse_page(raw_page, fmt=fmt, intro_only=intro_only)
+        docs = [page_document(page, lang=lang)] if page is not None else []
+        if chunker is not None:
+            docs = chunker.chunk(docs)
+        output.append((i, docs))
+    return output
@@ -1,13 +1,13 @@
 import asyncio
+import importlib
+import multiprocessing
+import os
+import time
 from dataclasses import asdict
 from typing import List, Optional, Text
 
-import aiohttp
-import openai
 import sanic
 from dacite import from_dict
-from lingua import Language, LanguageDetector, LanguageDetectorBuilder
-from openai.openai_object import OpenAIObject
 from pyassorted.datetime import Timer
 from sanic_ext import openapi
 from sanic.exceptions import BadRequest, ServerError
@@ -15,11 +15,44 @@ from sanic.request import Request
 from sanic.response import text as PlainTextResponse, json as JsonResponse
 
 from app.config import logger, settings
-from app.deps import click_timer, get_document_store, language_detector
-from app.document_store import QdrantDocumentStore
-from app.resource.wiki import WikiClient
+from app.deps import (
+    click_timer,
+    get_document_store,
+    get_ingestion_service,
+    get_search_service,
+    language_detector,
+)
+from app.document_store import (
+    DocumentStore,
+    LexicalIndex,
+    QueryResultCache,
+    factory as doc_store_factory,
+)
+from app.embedding import (
+    Embedder,
+    EmbeddingBatcher,
+    EmbeddingCache,
+    get_embedding_provider,
+)
+from app.resource.wiki import WikiCache, WikiClient
 from app.schema import api as api_model
-from app.schema.openai import OpenaiEmbeddingResult
+from app.schema.models import Query, QueryResult
+from app.service import (
+    BulkUpsert,
+    DocumentChunker,
+    IngestionService,
+    LanguageIdentifier,
+    QueryLog,
+    RefreshScheduler,
+    SearchService,
+    Warmup,
+    read_warmup_queries,
+)
+from app.utils.lease import LeaseStore
+from app.utils.metrics import MetricsRegistry, metrics, request_timings
+from app.utils.serialize import dumps
+from app.utils.singleflight import SingleFlight
+from app.utils.text import normalize_text
 
 
 def create_app():
@@ -27,14 +60,86 @@ def create_app():
         name=settings.APP_NAME,
     )
 
+    # Language detection, models load lazily unless preloaded before forking
+    app.ctx.language_identifier = LanguageIdentifier(
+        languages=settings.detect_languages,
+        cache_max_entries=settings.LANGUAGE_CACHE_MAX_ENTRIES,
+        script_fast_path=settings.LANGUAGE_SCRIPT_FAST_PATH,
+    )
+
+    @app.main_process_start
+    async def main_process_start(*_):
+        # Every worker would hold its own copy of the in-process matrix
+        if settings.DATASTORE.lower().strip() == "numpy" and app.state.workers > 1:
+            raise RuntimeError(
+                "DATASTORE=numpy keeps documents in the worker process, "
+                + "run it with a single worker."
+            )
+
+        # Shared between workers so writes on any worker invalidate all caches
+        app.shared_ctx.collection_generation = multiprocessing.Value("Q", 0)
+        # Set while a worker runs the warmup of this boot
+        app.shared_ctx.warmup_claimed = multiprocessing.Value("b", 0)
+
+        # Forked workers share the preloaded models and modules copy-on-write,
+        # spawned workers import the app again and would not see them
+        if sanic.Sanic.start_method == "fork":
+            if settings.LANGUAGE_DETECTOR_PRELOAD:
+                app.ctx.language_identifier.preload()
+            preload_modules()
+
+        # Drop metric snapshots of the workers of a previous run
+        if settings.METRICS_ENABLED and os.path.isdir(settings.METRICS_DIR):
+            for filename in os.listdir(settings.METRICS_DIR):
+                os.remove(os.path.join(settings.METRICS_DIR, filename))
+
+    def preload_modules() -> None:
+        # Heavy modules the workers would otherwise import lazily one by one
+        if settings.DATASTORE.lower().strip() == "qdrant":
+            importlib.import_module("app.document_store.qdrant")
+        openai_provider = settings.EMBEDDING_PROVIDER.lower().strip() == "openai"
+        if openai_provider:
+            importlib.import_module("app.embedding.openai")
+        if openai_provider or settings.CHUNK_TOKEN_SIZE > 0:
+            try:
+                import tiktoken
+
+                tiktoken.get_encoding(settings.CHUNK_ENCODING)
+            except Exception as e:
+                logger.warning(f"Failed to preload tiktoken encoding: {e}")
+
     @app.before_server_start
     async def before_server_start(*_):
-        # Set OpenAI credential
-        openai.api_key = settings.OPENAI_API_KEY
-        logger.debug("Have set OpenAI credential.")
+        # Embedding provider
+        embedding_provider = get_embedding_provider()
+        app.ctx.embedding_provider = embedding_provider
+        logger.debug(
+            f"Have set embedding provider '{embedding_provider.model}' "
+            + f"with dimension {embedding_provider.dimension}."
+        )
+
+        # Embedding cache
+        app.ctx.embedding_cache = EmbeddingCache(
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+            path=settings.EMBEDDING_CACHE_PATH or None,
+        )
+        logger.debug("Embedding cache has been initialized.")
+
+        # Embedding batcher
+        embedder = Embedder(provider=embedding_provider, cache=app.ctx.embedding_cache)
+        app.ctx.embedding_batcher = embedder.batcher = EmbeddingBatcher(
+            embed_func=embedder.create,
+            max_wait=settings.EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        )
+        app.ctx.embedder = embedder
+        logger.debug("Embedding batcher has been initialized.")
 
         # Create document store client
-        doc_store = QdrantDocumentStore(collection_name=settings.QDRANT_COLLECTION)
+        doc_store = doc_store_factory.get_document_store(
+            collection_name=settings.QDRANT_COLLECTION,
+            vector_size=embedding_provider.dimension,
+        )
         app.ctx.document_store = doc_store
         touch_doc_store = await doc_store.touch()
         if touch_doc_store:
@@ -44,72 +149,381 @@ def create_app():
                 f'Failed to touch document store: "{doc_store.host}:{doc_store.port}"'
             )
 
-        # Language detection
-        detect_languages: List["Language"] = []
-        for _lang in settings.detect_languages:
-            try:
-                detect_languages.append(Language[_lang.upper()])
-            except KeyError:
-                logger.warning(f"Language {_lang} not supported.")
-        detect_languages = detect_languages or [Language.ENGLISH]
-        app.ctx.language_detector = LanguageDetectorBuilder.from_languages(
-            *detect_languages
-        ).build()
-        logger.debug(
-            "Have set language detector with languages: "
-            + f"{', '.join([l.name for l in detect_languages])}."
+        # Query result cache
+        app.ctx.query_cache = QueryResultCache(
+            ttl=settings.QUERY_CACHE_TTL,
+            max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+            max_bytes=settings.QUERY_CACHE_MAX_BYTES,
+            generation=getattr(app.shared_ctx, "collection_generation", None),
+        )
+        logger.debug("Query result cache has been initialized.")
+
+        # Lexical index
+        app.ctx.lexical_index = (
+            LexicalIndex(
+                path=settings.LEXICAL_INDEX_PATH,
+                collection_name=settings.QDRANT_COLLECTION,
+            )
+            if settings.LEXICAL_INDEX
+            else None
+        )
+
+        # Search service
+        app.ctx.search_service = SearchService(
+            document_store=doc_store,
+            lexical_index=app.ctx.lexical_index,
+            rrf_k=settings.HYBRID_RRF_K,
+            collapse_overfetch=settings.QUERY_COLLAPSE_OVERFETCH,
+        )
+
+        # Ingestion service
+        app.ctx.ingestion_service = IngestionService(
+            embedder=app.ctx.embedder,
+            document_store=doc_store,
+            query_cache=app.ctx.query_cache,
+            chunker=(
+                DocumentChunker(
+                    chunk_token_size=settings.CHUNK_TOKEN_SIZE,
+                    overlap=settings.CHUNK_OVERLAP_TOKENS,
+                    encoding=settings.CHUNK_ENCODING,
+                )
+                if settings.CHUNK_TOKEN_SIZE > 0
+                else None
+            ),
+            lexical_index=app.ctx.lexical_index,
         )
 
         # Wiki client
-        app.ctx.wiki_client = WikiClient()
+        app.ctx.wiki_client = WikiClient(
+            timeout=settings.WIKI_TIMEOUT,
+            concurrent=settings.WIKI_CONCURRENCY,
+            full_text=settings.WIKI_FULL_TEXT,
+            cache=WikiCache(
+                max_entries=settings.WIKI_CACHE_MAX_ENTRIES,
+                positive_ttl=settings.WIKI_CACHE_TTL,
+                negative_ttl=settings.WIKI_CACHE_NEGATIVE_TTL,
+                path=settings.WIKI_CACHE_PATH or None,
+            ),
+            rate_limit=settings.WIKI_RATE_LIMIT,
+            rate_burst=settings.WIKI_RATE_BURST,
+            max_retries=settings.WIKI_MAX_RETRIES,
+        )
+        app.ctx.wiki_single_flight = SingleFlight()
+        app.ctx.wiki_leases = LeaseStore(path=settings.SHARED_STATE_PATH or None)
+        app.ctx.wiki_scheduler = RefreshScheduler(
+            handler=refresh_wiki_docs,
+            concurrency=settings.WIKI_REFRESH_CONCURRENCY,
+            max_queue=settings.WIKI_REFRESH_QUEUE_SIZE,
+            max_age=settings.WIKI_REFRESH_MAX_AGE,
+            confident_score=app.ctx.search_service.confident_score,
+        )
+        app.ctx.wiki_scheduler.start()
+
+        # Warmup replays past queries in the background, after startup
+        app.ctx.query_log = (
+            QueryLog(settings.QUERY_LOG_PATH) if settings.QUERY_LOG_PATH else None
+        )
+        if app.ctx.query_log is not None:
+            app.add_task(app.ctx.query_log.run(), name="Task-query_log.flush")
+        app.ctx.warmup = Warmup(warm_func=warm_query, rate=settings.WARMUP_RATE)
+        if settings.WARMUP_QUERY_LOG or settings.WARMUP_TOPICS:
+            app.add_task(run_warmup(), name="Task-warmup")
         logger.debug("Wiki client has been initialized.")
 
+        # Metrics, snapshots of every worker are merged by /metrics
+        if settings.METRICS_ENABLED:
+            metrics.path = settings.METRICS_DIR
+            metrics.add_collector(collect_metrics)
+            app.add_task(flush_metrics(), name="Task-metrics.flush")
+
+    @app.after_server_stop
+    async def after_server_stop(*_):
+        metrics.remove()
+        await app.ctx.wiki_scheduler.close()
+        if app.ctx.query_log is not None:
+            app.ctx.query_log.close()
+        await app.ctx.document_store.close()
+        if app.ctx.lexical_index is not None:
+            await app.ctx.lexical_index.close()
+        await app.ctx.wiki_client.close()
+
     @app.signal("openai.embedding.text")
     async def openai_embedding_text(texts: List[Text], **context) -> List[List[float]]:
         texts = [texts] if isinstance(texts, Text) else texts
-        texts = [text.strip() for text in texts]
-        emb_res_obj: "OpenAIObject" = await openai.Embedding.acreate(
-            input=texts, model="text-embedding-ada-002"
-        )
-        emb_res: OpenaiEmbeddingResult = emb_res_obj.to_dict_recursive()
-        return [emb["embedding"] for emb in emb_res["data"]]
+        embedder: "Embedder" = app.ctx.embedder
+        return await embedder.embed(texts)
 
     @app.signal("wiki.documents.fetch_and_upsert")
     async def wiki_documents_fetch_and_upsert(
-        query: Text, top_k: int, exclude_names: Optional[List[Text]] = None, **kwargs
+        query: Text,
+        top_k: int,
+        exclude_names: Optional[List[Text]] = None,
+        lang: Optional[Text] = None,
+        **kwargs,
     ) -> None:
         wiki_client: "WikiClient" = app.ctx.wiki_client
-        lang_detector: "LanguageDetector" = app.ctx.language_detector
+        language_identifier: "LanguageIdentifier" = app.ctx.language_identifier
+        wiki_single_flight: "SingleFlight" = app.ctx.wiki_single_flight
 
         query = query.strip()
-        exclude_names = exclude_names or []
-        language = lang_detector.detect_language_of(query)
-
-        docs = await wiki_client.async_query(
+        if not lang:
+            with metrics.time("language_detection"):
+                lang = language_identifier.detect(query)
+        lang = lang or wiki_client.default_lang
+
+        # Identical queries share one fetch within this worker
+        await wiki_single_flight.do(
+            ("query", lang, normalize_text(query).lower()),
+            fetch_and_upsert_wiki_docs,
             query=query,
-            lang=language.iso_code_639_1.name.lower(),
+            lang=lang,
             top_k=top_k,
-            exclude_titles=exclude_names,
+            exclude_names=exclude_names or [],
         )
-        docs = [doc for doc in docs if doc.metadata["name"] not in exclude_names]
-        if not docs:
+
+    async def refresh_wiki_docs(**context) -> None:
+        # Wait for the handler, so the scheduler bounds concurrent fetches
+        task = await app.dispatch("wiki.documents.fetch_and_upsert", context=context)
+        await task
+
+    async def fetch_and_upsert_wiki_docs(
+        query: Text, lang: Text, top_k: int, exclude_names: List[Text]
+    ) -> None:
+        wiki_client: "WikiClient" = app.ctx.wiki_client
+        wiki_leases: "LeaseStore" = app.ctx.wiki_leases
+        ingestion_service: "IngestionService" = app.ctx.ingestion_service
+
+        # Leases coordinate workers and remember recently fetched queries and titles
+        query_key = f"wiki:query:{lang}:{normalize_text(query).lower()}"
+        if not await wiki_leases.acquire(query_key, ttl=settings.WIKI_FETCH_LEASE_TTL):
+            logger.debug(f"Skip wiki fetch. Query '{query}' is fetched elsewhere.")
             return
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "http://localhost/upsert",
-                json=asdict(api_model.UpsertCall(documents=docs)),
-            ) as resp:
-                resp.raise_for_status()
-        logger.info(
-            f"Upserted {len(docs)} documents from Wiki: "
-            + f"{', '.join([doc.metadata['name'] for doc in docs])}."
+        title_keys: List[Text] = []
+        try:
+            with metrics.time("wiki_search"):
+                titles = await wiki_client.async_search(
+                    query=query, lang=lang, top_k=top_k
+                )
+            titles = list(
+                dict.fromkeys(title for title in titles if title not in exclude_names)
+            )
+            title_keys = [f"wiki:title:{lang}:{title}" for title in titles]
+            claims = await wiki_leases.acquire_many(
+                title_keys, ttl=settings.WIKI_FETCH_LEASE_TTL
+            )
+            titles = [title for title, claim in zip(titles, claims) if claim]
+            title_keys = [key for key, claim in zip(title_keys, claims) if claim]
+
+            with metrics.time("wiki_fetch"):
+                docs, failed = await wiki_client.async_fetch_pages(
+                    titles=titles, lang=lang
+                )
+            if docs:
+                with metrics.time("wiki_upsert"):
+                    await ingestion_service.upsert(documents=docs)
+                logger.info(
+                    f"Upserted {len(docs)} documents from Wiki: "
+                    + f"{', '.join([doc.metadata['name'] for doc in docs])}."
+                )
+
+        except Exception:
+            await wiki_leases.release_many([query_key] + title_keys)
+            raise
+
+        # Pages that failed to load are left for the next refresh, with the query
+        failed_keys = {f"wiki:title:{lang}:{title}" for title in failed}
+        done_keys = [key for key in title_keys if key not in failed_keys]
+        if failed_keys:
+            await wiki_leases.release_many([query_key] + sorted(failed_keys))
+        else:
+            done_keys.append(query_key)
+        await wiki_leases.extend_many(done_keys, ttl=settings.WIKI_RECENTLY_FETCHED_TTL)
+
+    async def run_warmup() -> None:
+        # One worker replays the queries, the others pick up its results from
+        # the document store and the on-disk embedding and wiki caches. The
+        # claim lives in memory, so a restarted server warms up again.
+        claimed = getattr(app.shared_ctx, "warmup_claimed", None)
+        if claimed is not None:
+            with claimed.get_lock():
+                if claimed.value:
+                    logger.info("Skip warmup, another worker runs it.")
+                    app.ctx.warmup.skip()
+                    return
+                claimed.value = 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            queries = await loop.run_in_executor(
+                None,
+                lambda: read_warmup_queries(
+                    query_log_path=settings.WARMUP_QUERY_LOG,
+                    topics=settings.WARMUP_TOPICS,
+                    max_queries=settings.WARMUP_MAX_QUERIES,
+                ),
+            )
+            await app.ctx.warmup.run(queries)
+        finally:
+            if claimed is not None:
+                with claimed.get_lock():
+                    claimed.value = 0
+
+    async def warm_query(query: "Query") -> None:
+        search_service: "SearchService" = app.ctx.search_service
+        query_cache: "QueryResultCache" = app.ctx.query_cache
+        embedder: "Embedder" = app.ctx.embedder
+
+        # Search, fetch the wiki inline if the hits are poor, then search again
+        # so the cached result includes the fetched pages
+        for fetched in (False, True):
+            generation = query_cache.generation
+            results, confident = await search_service.search(
+                queries=[query], embed_func=embedder.embed
+            )
+            query_cache.put(query, results[0], generation)
+            if confident[0] or fetched or not settings.WARMUP_WIKI:
+                return
+            await refresh_wiki_docs(
+                query=query.query,
+                top_k=query.top_k,
+                lang=query.lang,
+                exclude_names=[
+                    doc.metadata["name"]
+                    for doc in results[0].results
+                    if doc.metadata.get("name")
+                ],
+            )
+
+    async def flush_metrics() -> None:
+        while True:
+            await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+            app.purge_tasks()  # Finished named tasks stay registered otherwise
+            try:
+                metrics.flush()
+            except Exception as e:
+                logger.exception(e)
+
+    def collect_metrics(registry: "MetricsRegistry") -> None:
+        caches = dict(
+            query=app.ctx.query_cache.stats(),
+            embedding=app.ctx.embedding_cache.stats(),
+            wiki=app.ctx.wiki_client.cache.stats() if app.ctx.wiki_client.cache else {},
+            language=app.ctx.language_identifier.cache.stats(),
         )
+        for cache, stats in caches.items():
+            registry.set_counter("cache_hits_total", stats.get("hits", 0), cache=cache)
+            registry.set_counter(
+                "cache_misses_total", stats.get("misses", 0), cache=cache
+            )
+
+        ingestion = app.ctx.ingestion_service.stats()
+        registry.set_counter("ingested_documents_total", ingestion["written"])
+        registry.set_counter("ingestion_skipped_documents_total", ingestion["skipped"])
+        batcher = app.ctx.embedding_batcher.stats()
+        registry.set_counter("embedding_batches_total", batcher["batches"])
+        registry.set_gauge("embedding_batcher_pending", batcher["pending"])
+        registry.set_gauge("background_tasks", pending_wiki_tasks(), kind="wiki")
+        scheduler = app.ctx.wiki_scheduler.stats()
+        registry.set_gauge("wiki_refresh_queue_depth", scheduler["depth"])
+        registry.set_gauge("wiki_refresh_running", scheduler["running"])
+        warmup = app.ctx.warmup.stats()
+        registry.set_gauge("warmup_queries", warmup["total"], state="total")
+        registry.set_gauge("warmup_queries", warmup["done"], state="done")
+        registry.set_gauge("warmup_queries", warmup["failed"], state="failed")
+        for outcome in ("merged", "dropped", "expired", "completed", "failed"):
+            registry.set_counter(
+                "wiki_refresh_total", scheduler[outcome], outcome=outcome
+            )
+
+    def pending_wiki_tasks() -> int:
+        scheduler: "RefreshScheduler" = app.ctx.wiki_scheduler
+        return scheduler.depth + scheduler.running
+
+    metrics.describe("stage_duration_seconds", "Duration of request stages.")
+    metrics.describe("http_request_duration_seconds", "Time to response headers.")
+    metrics.describe("http_requests_total", "Requests by route and status.")
+    metrics.describe("http_requests_in_flight", "Requests being handled.")
+    metrics.describe("wiki_tasks_total", "Background wiki fetches by outcome.")
+    metrics.describe("background_tasks", "Pending background tasks.")
+    metrics.describe("wiki_refresh_queue_depth", "Queued background wiki fetches.")
+    metrics.describe("wiki_refresh_running", "Running background wiki fetches.")
+    metrics.describe("wiki_refresh_total", "Scheduled wiki fetches by outcome.")
+    metrics.describe("wiki_refresh_wait_seconds", "Queue wait of wiki fetches.")
+    metrics.describe("warmup_queries", "Warmup queries by state.")
+
+    @app.on_request
+    async def start_request_metrics(request: "Request"):
+        if not settings.METRICS_ENABLED:
+            return
+        request.ctx.started_at = time.perf_counter()
+        request.ctx.route_path = (
+            f"/{request.route.path}" if request.route else "unmatched"
+        )
+        metrics.add_gauge("http_requests_in_flight", 1, route=request.ctx.route_path)
+        if settings.SERVER_TIMING:
+            request_timings.set([])
+
+    @app.on_response
+    async def finish_request_metrics(request: "Request", response):
+        started_at = getattr(request.ctx, "started_at", None)
+        if started_at is None:
+            return
+        elapsed = time.perf_counter() - started_at
+        route = request.ctx.route_path
+        metrics.add_gauge("http_requests_in_flight", -1, route=route)
+        metrics.observe("http_request_duration_seconds", elapsed, route=route)
+        metrics.inc("http_requests_total", route=route, status=response.status)
+
+        timings = request_timings.get() if settings.SERVER_TIMING else None
+        if timings is not None:
+            response.headers["Server-Timing"] = ", ".join(
+                [f"{stage};dur={duration * 1000:.2f}" for stage, duration in timings]
+                + [f"total;dur={elapsed * 1000:.2f}"]
+            )
+            request_timings.set(None)
 
     @app.get("/")
     async def root(request: "Request"):
         return PlainTextResponse("OK")
 
+    @app.get("/metrics")
+    async def metrics_endpoint(request: "Request"):
+        loop = asyncio.get_running_loop()
+        # Snapshot on the loop, handlers keep updating the registry meanwhile
+        snapshot = metrics.snapshot()
+        body = await loop.run_in_executor(
+            None, lambda: metrics.render(metrics.collect(snapshot))
+        )
+        return PlainTextResponse(
+            body, content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    @app.get("/stats")
+    async def stats(request: "Request"):
+        embedding_cache: "EmbeddingCache" = request.app.ctx.embedding_cache
+        embedding_batcher: "EmbeddingBatcher" = request.app.ctx.embedding_batcher
+        query_cache: "QueryResultCache" = request.app.ctx.query_cache
+        wiki_single_flight: "SingleFlight" = request.app.ctx.wiki_single_flight
+        wiki_leases: "LeaseStore" = request.app.ctx.wiki_leases
+        wiki_client: "WikiClient" = request.app.ctx.wiki_client
+        return JsonResponse(
+            dict(
+                embedding_cache=embedding_cache.stats(),
+                embedding_batcher=embedding_batcher.stats(),
+                query_cache=query_cache.stats(),
+                ingestion=request.app.ctx.ingestion_service.stats(),
+                language=request.app.ctx.language_identifier.stats(),
+                background_tasks=dict(wiki=pending_wiki_tasks()),
+                wiki_scheduler=request.app.ctx.wiki_scheduler.stats(),
+                warmup=request.app.ctx.warmup.stats(),
+                wiki_single_flight=wiki_single_flight.stats(),
+                wiki_leases=wiki_leases.stats(),
+                wiki_cache=wiki_client.cache.stats() if wiki_client.cache else None,
+            ),
+            dumps=dumps,
+        )
+
     @app.post("/upsert")
     @openapi.definition(
         summary="Upsert documents",
@@ -117,7 +531,7 @@ def create_app():
         body=api_model.UpsertCall,
         response=api_model.UpsertResponse,
     )
-    async def upsert(request: "Request", doc_store: "QdrantDocumentStore"):
+    async def upsert(request: "Request", ingestion_service: "IngestionService"):
         try:
             upsert_call = from_dict(data_class=api_model.UpsertCall, data=request.json)
         except Exception:
@@ -127,23 +541,61 @@ def create_app():
             raise BadRequest("Empty documents")
 
         try:
-            # Embedding
-            _embeddings = await dispatch_embeddings(
-                request=request, texts=[doc.text for doc in upsert_call.documents]
+            ids = await ingestion_service.upsert(
+                documents=upsert_call.documents,
+                chunk_token_size=upsert_call.chunk_token_size,
             )
-            emb_docs = [
-                doc.with_embedding(embedding=emb)
-                for doc, emb in zip(upsert_call.documents, _embeddings)
-            ]
-
-            # Upsert
-            ids = await doc_store.upsert(documents=emb_docs)
-            return JsonResponse(asdict(api_model.UpsertResponse(ids=ids)))
+            return JsonResponse(asdict(api_model.UpsertResponse(ids=ids)), dumps=dumps)
 
         except Exception as e:
             logger.exception(e)
             raise ServerError("Internal Service Error")
 
+    @app.post("/upsert/stream", stream=True)
+    @openapi.definition(
+        summary="Stream upsert documents",
+        description="Upsert NDJSON documents, one per line, in pipelined batches. "
+        + "Responds with one NDJSON acknowledgement per batch and a summary line.",
+    )
+    async def upsert_stream(request: "Request", ingestion_service: "IngestionService"):
+        try:
+            batch_size = int(
+                request.args.get("batch_size", settings.UPSERT_STREAM_BATCH_SIZE)
+            )
+            chunk_token_size = request.args.get("chunk_token_size")
+            chunk_token_size = int(chunk_token_size) if chunk_token_size else None
+        except ValueError:
+            raise BadRequest("Invalid batch_size or chunk_token_size")
+
+        request.stream.request_max_size = settings.UPSERT_STREAM_MAX_BYTES
+
+        async def _chunks():
+            while True:
+                chunk = await request.stream.read()
+                if chunk is None:
+                    break
+                yield chunk
+
+        response = await request.respond(content_type="application/x-ndjson")
+
+        async def _send(ack):
+            await response.send(dumps(ack) + b"\n")
+
+        bulk_upsert = BulkUpsert(
+            ingestion_service=ingestion_service,
+            batch_size=batch_size,
+            max_in_flight=settings.UPSERT_STREAM_MAX_IN_FLIGHT,
+            chunk_token_size=chunk_token_size,
+            max_line_bytes=settings.UPSERT_STREAM_MAX_LINE_BYTES,
+        )
+        try:
+            summary = await bulk_upsert.run(_chunks(), send=_send)
+            await _send(dict(summary, done=True))
+        except Exception as e:
+            logger.exception(e)
+            await _send(dict(done=False, error="Internal Service Error"))
+        await response.eof()
+
     @app.post("/query")
     @app.post("/sub/query", name="sub_query")
     @openapi.definition(
@@ -154,56 +606,158 @@ def create_app():
     )
     async def query(
         request: "Request",
-        doc_store: "QdrantDocumentStore",
+        search_service: "SearchService",
     ):
         try:
             query_call = from_dict(data_class=api_model.QueryCall, data=request.json)
         except Exception:
             raise BadRequest("Invalid request body")
 
+        if request.app.ctx.query_log is not None:
+            request.app.ctx.query_log.record(query_call.queries)
+
+        if query_call.stream or "application/x-ndjson" in request.headers.get(
+            "accept", ""
+        ):
+            return await stream_query(request, query_call, search_service)
+
         try:
-            # Embedding
-            _embeddings = await dispatch_embeddings(
-                request=request, texts=[query.query for query in query_call.queries]
-            )
-            emb_queries = [
-                doc.with_embedding(embedding=emb)
-                for doc, emb in zip(query_call.queries, _embeddings)
+            # Cached results
+            query_cache: "QueryResultCache" = request.app.ctx.query_cache
+            generation = query_cache.generation
+            query_results: List[Optional[QueryResult]] = [
+                query_cache.get(query) for query in query_call.queries
+            ]
+            missed_queries = [
+                query
+                for query, result in zip(query_call.queries, query_results)
+                if result is None
             ]
 
-            query_results = await doc_store.query(queries=emb_queries)
-
-            for _query_call, query_result in zip(query_call.queries, query_results):
-                if any(map(lambda doc: doc.score >= 0.9, query_result.results)):
-                    logger.debug(
-                        "Skip wiki fetch. We have enough score with query "
-                        + f"'{query_result.query}'."
-                    )
-                    continue  # Skip if we have enough score
-
-                fetch_and_upsert_wiki_docs_task = request.app.dispatch(
-                    "wiki.documents.fetch_and_upsert",
-                    context=dict(
-                        query=query_result.query,
-                        top_k=_query_call.top_k,
-                        exclude_names=[
-                            doc.metadata["name"]
-                            for doc in query_result.results
-                            if doc.metadata.get("name")
-                        ],
+            missed_results: List[QueryResult] = []
+            confident: List[bool] = []
+            if missed_queries:
+                # Dense, lexical or hybrid retrieval, embedding only when needed
+                missed_results, confident = await search_service.search(
+                    queries=missed_queries,
+                    embed_func=lambda texts: dispatch_embeddings(
+                        request=request, texts=texts
                     ),
                 )
-                app.add_task(
-                    fetch_and_upsert_wiki_docs_task,
-                    name=f"Task-wiki.documents.fetch_and_upsert-({query_result.query},)",
-                )
-
-            return JsonResponse(asdict(api_model.QueryResponse(results=query_results)))
+                _missed_results = iter(missed_results)
+                for i, result in enumerate(query_results):
+                    if result is None:
+                        query_results[i] = next(_missed_results)
+                        query_cache.put(
+                            query_call.queries[i], query_results[i], generation
+                        )
+
+            # Cached results have already triggered their wiki fetch
+            for _query_call, query_result, _confident in zip(
+                missed_queries, missed_results, confident
+            ):
+                trigger_wiki_fetch(request, _query_call, query_result, _confident)
+
+            # Projected plain dicts, encoded without deep copying every result
+            return JsonResponse(
+                {"results": [query_call.project(result) for result in query_results]},
+                dumps=dumps,
+            )
 
         except Exception as e:
             logger.exception(e)
             raise ServerError("Internal Service Error")
 
+    async def stream_query(
+        request: "Request",
+        query_call: "api_model.QueryCall",
+        search_service: "SearchService",
+    ):
+        """Write one `QueryResult` per line, tagged with its query index, as soon as
+        it is ready. Cached results come first, the rest in completion order.
+        """
+
+        query_cache: "QueryResultCache" = request.app.ctx.query_cache
+        generation = query_cache.generation
+        semaphore = asyncio.Semaphore(max(settings.QUERY_STREAM_CONCURRENCY, 1))
+
+        async def _search(index: int, query: "Query"):
+            async with semaphore:
+                try:
+                    results, confident = await search_service.search(
+                        queries=[query],
+                        embed_func=lambda texts: dispatch_embeddings(
+                            request=request, texts=texts
+                        ),
+                    )
+                except Exception as e:
+                    logger.exception(e)
+                    return index, query, None, False
+            query_cache.put(query, results[0], generation)
+            return index, query, results[0], confident[0]
+
+        response = await request.respond(content_type="application/x-ndjson")
+        tasks: List["asyncio.Task"] = []
+        try:
+            for index, query in enumerate(query_call.queries):
+                result = query_cache.get(query)
+                if result is None:
+                    tasks.append(asyncio.create_task(_search(index, query)))
+                else:
+                    await response.send(ndjson_line(query_call, index, result))
+
+            for task in asyncio.as_completed(tasks):
+                index, query, result, confident = await task
+                if result is None:
+                    await response.send(
+                        dumps(dict(index=index, error="Internal Service Error")) + b"\n"
+                    )
+                    continue
+                trigger_wiki_fetch(request, query, result, confident)
+                await response.send(ndjson_line(query_call, index, result))
+        finally:
+            # The client went away, stop searching for it
+            for task in tasks:
+                task.cancel()
+
+        await response.eof()
+
+    def ndjson_line(
+        query_call: "api_model.QueryCall", index: int, result: "QueryResult"
+    ) -> bytes:
+        return dumps(dict(index=index, **query_call.project(result))) + b"\n"
+
+    def trigger_wiki_fetch(
+        request: "Request", query: "Query", query_result: "QueryResult", confident: bool
+    ) -> None:
+        if confident:
+            logger.debug(
+                "Skip wiki fetch. We have enough score with query "
+                + f"'{query_result.query}'."
+            )
+            metrics.inc("wiki_tasks_total", outcome="skipped")
+            return  # Skip if we have enough score
+
+        # Fused and lexical scores are not comparable to the confident score
+        best_score = (
+            max((doc.score for doc in query_result.results), default=0.0)
+            if query.mode == "dense"
+            else 0.0
+        )
+        wiki_scheduler: "RefreshScheduler" = request.app.ctx.wiki_scheduler
+        queued = wiki_scheduler.submit(
+            query=query_result.query,
+            top_k=query.top_k,
+            lang=query.lang,
+            exclude_names=[
+                doc.metadata["name"]
+                for doc in query_result.results
+                if doc.metadata.get("name")
+            ],
+            best_score=best_score,
+        )
+        metrics.inc("wiki_tasks_total", outcome="queued" if queued else "dropped")
+
     @app.delete("/delete")
     @openapi.definition(
         summary="Delete documents",
@@ -211,7 +765,7 @@ def create_app():
         body=api_model.DeleteCall,
         response=api_model.DeleteResponse,
     )
-    async def delete(request: "Request", doc_store: "QdrantDocumentStore"):
+    async def delete(request: "Request", ingestion_service: "IngestionService"):
         try:
             delete_call = from_dict(data_class=api_model.DeleteCall, data=request.json)
         except Exception:
@@ -221,12 +775,14 @@ def create_app():
             raise BadRequest("One of ids, filter, or delete_all is required")
 
         try:
-            success = await doc_store.delete(
+            success = await ingestion_service.delete(
                 ids=delete_call.ids,
                 filter=delete_call.filter,
                 delete_all=delete_call.delete_all,
             )
-            return JsonResponse(asdict(api_model.DeleteResponse(success=success)))
+            return JsonResponse(
+                asdict(api_model.DeleteResponse(success=success)), dumps=dumps
+            )
 
         except Exception as e:
             logger.exception(e)
@@ -235,19 +791,22 @@ def create_app():
     async def dispatch_embeddings(
         request: "Request", texts: List[Text]
     ) -> List[List[float]]:
-        emb_task: "asyncio.Task" = await request.app.dispatch(
-            "openai.embedding.text",
-            context=dict(texts=texts),
-        )
-        await emb_task
+        with metrics.time("embedding"):
+            emb_task: "asyncio.Task" = await request.app.dispatch(
+                "openai.embedding.text",
+                context=dict(texts=texts),
+            )
+            await emb_task
         embeddings = emb_task.result()
         if isinstance(embeddings, Exception):
             raise ServerError("Internal Service Error")
         return embeddings
 
     # Dependencies injection
-    app.ext.add_dependency(LanguageDetector, language_detector)
-    app.ext.add_dependency(QdrantDocumentStore, get_document_store)
+    app.ext.add_dependency(LanguageIdentifier, language_detector)
+    app.ext.add_dependency(DocumentStore, get_document_store)
+    app.ext.add_dependency(IngestionService, get_ingestion_service)
+    app.ext.add_dependency(SearchService, get_search_service)
     app.ext.add_dependency(Timer, click_timer)
 
     # Blueprint
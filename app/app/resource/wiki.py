@@ -1,21 +1,142 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Optional, Set, Text, Union
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Set, Text, Tuple
 
-from mediawiki import MediaWiki
-from mediawiki.exceptions import PageError
-from pyassorted.asyncio import run_func
+import aiohttp
 
 from app.config import logger, settings
-from app.exceptions import NotFound
-from app.schema.models import Document
+from app.schema.models import Document, document_id
+from app.utils.cache import LRUCache
+from app.utils.ratelimit import TokenBucket
+from app.utils.sqlite import SqliteKVStore
+from app.utils.text import normalize_text
+
+
+class WikiCache:
+    """Two-level TTL cache of wiki search results and page summaries.
+
+    Negative results (no search hits, missing pages) are cached too, with
+    their own shorter TTL. The optional on-disk tier survives restarts and
+    is shared between workers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        positive_ttl: float = 24 * 60 * 60,
+        negative_ttl: float = 10 * 60,
+        path: Optional[Text] = None,
+    ):
+        self.positive_ttl = float(positive_ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.memory: LRUCache[Tuple[Any, bool]] = LRUCache(max_entries=max_entries)
+        self.disk: Optional[SqliteKVStore] = (
+            SqliteKVStore(path, table="wiki_cache") if path else None
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="wiki-cache"
+        )
+        self.hits = 0
+        self.negative_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def search_key(lang: Text, query: Text, top_k: int) -> Text:
+        return json.dumps(["search", lang, normalize_text(query), top_k])
+
+    @staticmethod
+    def page_key(
+        lang: Text, title: Text, sentences: int, chars: int, full_text: bool = False
+    ) -> Text:
+        if full_text:
+            return json.dumps(["page", lang, title, "full"])
+        return json.dumps(["page", lang, title, sentences, chars])
+
+    async def get_many(self, keys: Sequence[Text]) -> Dict[Text, Tuple[Any, bool]]:
+        """Return `(value, negative)` for every cached key."""
+
+        output: Dict[Text, Tuple[Any, bool]] = {}
+        for key in keys:
+            item = self.memory.get(key)
+            if item is not None:
+                output[key] = item
+
+        missed_keys = [key for key in dict.fromkeys(keys) if key not in output]
+        if missed_keys and self.disk is not None:
+            try:
+                disk_items = await self._run(self.disk.get_many, missed_keys)
+            except Exception as e:
+                logger.exception(e)
+                disk_items = {}
+            now = time.time()
+            for key, (value, expires_at) in disk_items.items():
+                item = tuple(json.loads(value))
+                self.memory.put(key, item, ttl=max(expires_at - now, 0.0))
+                output[key] = item
+            self.disk_hits += len(disk_items)
+
+        for key in keys:
+            item = output.get(key)
+            if item is None:
+                self.misses += 1
+            elif item[1]:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+        return output
+
+    async def put_many(self, items: Dict[Text, Tuple[Any, bool]]) -> None:
+        now = time.time()
+        disk_items: Dict[Text, Tuple[Text, float]] = {}
+        for key, (value, negative) in items.items():
+            ttl = self.negative_ttl if negative else self.positive_ttl
+            self.memory.put(key, (value, negative), ttl=ttl)
+            disk_items[key] = (json.dumps([value, negative]), now + ttl)
+
+        if disk_items and self.disk is not None:
+            try:
+                await self._run(self.disk.put_many, disk_items)
+            except Exception as e:
+                logger.exception(e)
+
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return dict(
+            hits=self.hits,
+            negative_hits=self.negative_hits,
+            disk_hits=self.disk_hits,
+            misses=self.misses,
+            hit_ratio=((self.hits + self.negative_hits) / lookups) if lookups else 0.0,
+            entries=len(self.memory),
+            disk_path=self.disk.path if self.disk else None,
+        )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
 
 
 class WikiClient:
+    """Asynchronous MediaWiki client.
+
+    One pooled `aiohttp` session is shared by every language host, with a
+    per-host concurrency limit. Intro extracts of many titles are fetched
+    in a single `prop=extracts` request. Throttled requests (429, 503) are
+    retried after the `Retry-After` delay or an exponential backoff.
+    """
+
     max_timeout: int = 120
     default_timeout: int = 15
     max_top_k: int = settings.max_top_k
     max_sentences: int = 8
     max_chars: int = 4000
+    max_titles_per_request: int = 20  # MediaWiki `exlimit` maximum
+    retry_statuses = (429, 503)
+    max_retry_delay: float = 60.0
 
     def __init__(
         self,
@@ -25,36 +146,81 @@ class WikiClient:
         chars: int = 0,
         timeout: float = default_timeout,
         concurrent: int = 2,
+        api_url: Optional[Text] = None,
+        cache: Optional[WikiCache] = None,
+        full_text: bool = False,
+        rate_limit: float = 0.0,
+        rate_burst: int = 1,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
     ):
         self.default_lang = default_lang
-        self.default_client = MediaWiki(lang=self.default_lang, timeout=timeout)
-        self.lang_client_map: Dict[Text, MediaWiki] = {
-            self.default_lang: self.default_client
-        }
         self.top_k = min(top_k, self.max_top_k)
         self.sentences = min(sentences, self.max_sentences)
         self.chars = min(chars, self.max_chars)
         self.timeout = (
             self.default_timeout if timeout < 0 else min(timeout, self.max_timeout)
         )
-        self.concurrent = int(concurrent) or None
+        self.concurrent = max(int(concurrent), 1)
+        self.api_url = api_url or settings.WIKI_API_URL
+        self.cache = cache
+        # Whole articles instead of lead sections, for chunked ingestion
+        self.full_text = full_text
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_semaphores: Dict[Text, asyncio.Semaphore] = {}
+        # Requests per second to each wiki host, 0 is unlimited
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self._host_buckets: Dict[Text, TokenBucket] = {}
+        self.max_retries = max(int(max_retries), 0)
+        self.retry_backoff = float(retry_backoff)
+        self.retries = 0
+        self._supported_languages: Optional[Set[Text]] = None
 
     @property
-    def supported_languages(self) -> Set[Text]:
-        return set(self.default_client.supported_languages.keys())
+    def session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=self.concurrent, ttl_dns_cache=300
+                ),
+                headers={"User-Agent": f"{settings.APP_NAME}/{settings.APP_VERSION}"},
+                raise_for_status=True,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def supported_languages(self) -> Set[Text]:
+        if self._supported_languages is None:
+            # Cached on disk too, so restarted workers skip the request
+            key = json.dumps(["languages", self.api_url, self.default_lang])
+            cached = await self.cache.get_many([key]) if self.cache else {}
+            if key in cached:
+                languages = cached[key][0]
+            else:
+                res = await self._request(
+                    lang=self.default_lang,
+                    params=dict(action="query", meta="siteinfo", siprop="languages"),
+                )
+                languages = [item["code"] for item in res["query"]["languages"]]
+                if self.cache:
+                    await self.cache.put_many({key: (languages, False)})
+            self._supported_languages = set(languages)
+        return self._supported_languages
 
-    def get_client(self, lang: Optional[Text] = None) -> "MediaWiki":
+    async def get_lang(self, lang: Optional[Text] = None) -> Text:
         lang = lang.lower().strip() if lang else self.default_lang
 
-        if lang not in self.supported_languages:
+        if lang != self.default_lang and lang not in await self.supported_languages():
             raise ValueError(f"Language {lang} not supported.")
 
-        if lang not in self.lang_client_map:
-            self.lang_client_map[lang] = MediaWiki(lang=lang, timeout=self.timeout)
+        return lang
 
-        return self.lang_client_map[lang]
-
-    def query(
+    async def async_query(
         self,
         query: Text,
         lang: Optional[Text] = None,
@@ -64,96 +230,257 @@ class WikiClient:
         timeout: Optional[float] = None,
         exclude_titles: Optional[List[Text]] = None,
     ) -> List[Document]:
+        exclude_titles = exclude_titles or []
+        titles = await self.async_search(
+            query=query, lang=lang, top_k=top_k, timeout=timeout
+        )
+        titles = [title for title in titles if title not in exclude_titles]
+        return await self.async_fetch(
+            titles=titles, lang=lang, sentences=sentences, chars=chars, timeout=timeout
+        )
+
+    async def async_search(
+        self,
+        query: Text,
+        lang: Optional[Text] = None,
+        top_k: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> List[Text]:
         query = query.strip()
-        lang = lang.lower().strip() if lang else self.default_lang
+        lang = await self.get_lang(lang)
         top_k = min(top_k, self.max_top_k) if top_k else self.top_k
-        sentences = min(sentences, self.max_sentences) if sentences else self.sentences
-        chars = min(chars, self.max_chars) if chars else self.chars
-        timeout = timeout or self.timeout
 
-        wiki_client = self.get_client(lang=lang)
+        cache_key = WikiCache.search_key(lang=lang, query=query, top_k=top_k)
+        if self.cache is not None:
+            cached = (await self.cache.get_many([cache_key])).get(cache_key)
+            if cached is not None:
+                return list(cached[0])
 
-        (titles, suggestion) = wiki_client.search(
-            query=query, results=top_k, suggestion=True
+        res = await self._request(
+            lang=lang,
+            params=dict(
+                action="query",
+                list="search",
+                srsearch=query,
+                srlimit=top_k,
+                srinfo="suggestion",
+                srprop="",
+            ),
+            timeout=timeout,
         )
+        titles: List[Text] = [item["title"] for item in res["query"]["search"]]
+        suggestion = res["query"].get("searchinfo", {}).get("suggestion")
         if suggestion:
             titles.append(suggestion)
         logger.debug(f"Query '{query}' to wiki({lang}) returned titles: {titles}")
 
-        titles = [title for title in titles if title not in exclude_titles]
+        if self.cache is not None:
+            await self.cache.put_many({cache_key: (titles, not titles)})
+        return titles
+
+    async def async_fetch(
+        self,
+        titles: List[Text],
+        lang: Optional[Text] = None,
+        sentences: Optional[int] = None,
+        chars: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> List[Document]:
+        docs, _ = await self.async_fetch_pages(
+            titles=titles, lang=lang, sentences=sentences, chars=chars, timeout=timeout
+        )
+        return docs
 
-        title_to_content: Dict[Text, Optional[Union[Text, Exception]]] = {
-            title: None for title in titles
+    async def async_fetch_pages(
+        self,
+        titles: List[Text],
+        lang: Optional[Text] = None,
+        sentences: Optional[int] = None,
+        chars: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[List[Document], List[Text]]:
+        """Documents of the found pages, and the titles whose request failed.
+
+        Missing pages are in neither list.
+        """
+
+        lang = await self.get_lang(lang)
+        sentences = min(sentences, self.max_sentences) if sentences else self.sentences
+        chars = min(chars, self.max_chars) if chars else self.chars
+        titles = list(dict.fromkeys(titles))
+
+        title_to_content: Dict[Text, Text] = {}
+        uncached_titles = titles
+        cache_keys = {
+            title: WikiCache.page_key(
+                lang=lang,
+                title=title,
+                sentences=sentences,
+                chars=chars,
+                full_text=self.full_text,
+            )
+            for title in titles
         }
-        with ThreadPoolExecutor(max_workers=self.concurrent) as executor:
-            future_to_title = {
-                executor.submit(
-                    self._request_by_title,
-                    wiki_client=wiki_client,
-                    title=title,
+        if self.cache is not None:
+            cached = await self.cache.get_many(list(cache_keys.values()))
+            uncached_titles = []
+            for title in titles:
+                item = cached.get(cache_keys[title])
+                if item is None:
+                    uncached_titles.append(title)
+                elif not item[1]:
+                    title_to_content[title] = item[0]
+
+        # MediaWiki returns the full text of only one page per request
+        batch_size = 1 if self.full_text else self.max_titles_per_request
+        batches = [
+            uncached_titles[i : i + batch_size]
+            for i in range(0, len(uncached_titles), batch_size)
+        ]
+        results = await asyncio.gather(
+            *[
+                self._request_extracts(
+                    lang=lang,
+                    titles=batch,
                     sentences=sentences,
                     chars=chars,
-                ): title
-                for title in titles
-            }
-            for future in as_completed(future_to_title):
-                title = future_to_title[future]
-                try:
-                    page_content = future.result()
-                    title_to_content[title] = page_content
-                except Exception as e:
-                    title_to_content[title] = e
+                    timeout=timeout,
+                )
+                for batch in batches
+            ],
+            return_exceptions=True,
+        )
 
-        docs: List[Document] = []
-        for title, _content in title_to_content.items():
-            if isinstance(_content, Exception):
-                logger.exception(_content)
+        cache_items: Dict[Text, Tuple[Any, bool]] = {}
+        failed: List[Text] = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                logger.exception(result)
+                failed.extend(batch)
                 continue
+            title_to_content.update(result)
+            for title in batch:
+                content = result.get(title)
+                cache_items[cache_keys[title]] = (content, not content)
+        if self.cache is not None and cache_items:
+            await self.cache.put_many(cache_items)
 
-            if not _content:
-                logger.error(f"Wiki page {title} not found.")
+        failed_titles = set(failed)
+        docs: List[Document] = []
+        for title in titles:
+            content = title_to_content.get(title)
+            if not content:
+                if title not in failed_titles:
+                    logger.error(f"Wiki page {title} not found.")
                 continue
 
-            content = _content or ""
             doc = Document(
+                id=document_id(source="wiki", lang=lang, title=title),
                 text=content,
                 metadata=dict(name=title, title=title, source="wiki", lang=lang),
             )
             docs.append(doc)
-        return docs
+        return docs, failed
 
-    async def async_query(
+    async def _request_extracts(
         self,
-        query: Text,
-        lang: Optional[Text] = None,
-        top_k: Optional[int] = None,
-        sentences: Optional[int] = None,
-        chars: Optional[int] = None,
+        lang: Text,
+        titles: List[Text],
+        sentences: int,
+        chars: int,
         timeout: Optional[float] = None,
-        exclude_titles: Optional[List[Text]] = None,
-    ) -> List[Document]:
-        docs = await run_func(
-            self.query,
-            query=query,
-            lang=lang,
-            top_k=top_k,
-            sentences=sentences,
-            chars=chars,
-            timeout=timeout,
-            exclude_titles=exclude_titles,
+    ) -> Dict[Text, Text]:
+        params: Dict[Text, Any] = dict(
+            action="query",
+            prop="extracts",
+            explaintext=1,
+            redirects=1,
+            titles="|".join(titles),
         )
-        return docs
+        if self.full_text:
+            params["exlimit"] = 1
+        else:
+            params["exintro"] = 1  # Required to get extracts of more than one page
+            params["exlimit"] = self.max_titles_per_request
+            if sentences:
+                params["exsentences"] = sentences
+            elif chars:
+                params["exchars"] = chars
 
-    def _request_by_title(
-        self, wiki_client: "MediaWiki", title: Text, sentences: int, chars: int
-    ) -> Text:
-        try:
-            wiki_page = wiki_client.page(title)
-            page_text = wiki_page.summarize(sentences=sentences, chars=chars)
-            return page_text
+        res = await self._request(lang=lang, params=params, timeout=timeout)
+        query = res.get("query", {})
+
+        # Map every requested title through normalization and redirects
+        resolved = {title: title for title in titles}
+        for mapping_key in ("normalized", "redirects"):
+            mapping = {item["from"]: item["to"] for item in query.get(mapping_key, [])}
+            resolved = {
+                title: mapping.get(target, target) for title, target in resolved.items()
+            }
 
-        except PageError as e:
-            raise NotFound(f"Wiki page {title} not found: {e}")
+        page_to_content: Dict[Text, Text] = {}
+        for page in query.get("pages", []):
+            if page.get("missing") or page.get("invalid"):
+                logger.debug(f"Wiki page {page.get('title')} not found.")
+                continue
+            page_to_content[page["title"]] = (page.get("extract") or "").strip()
+
+        return {
+            title: page_to_content[target]
+            for title, target in resolved.items()
+            if target in page_to_content
+        }
+
+    async def _request(
+        self,
+        lang: Text,
+        params: Dict[Text, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[Text, Any]:
+        timeout = min(timeout, self.max_timeout) if timeout else self.timeout
+        url = self.api_url.format(lang=lang)
+        params = dict(params, format="json", formatversion=2)
 
-        except Exception as e:
-            raise e
+        semaphore = self._host_semaphores.get(lang)
+        if semaphore is None:
+            semaphore = self._host_semaphores[lang] = asyncio.Semaphore(self.concurrent)
+
+        bucket = self._host_buckets.get(lang)
+        if bucket is None:
+            bucket = self._host_buckets[lang] = TokenBucket(
+                self.rate_limit, self.rate_burst
+            )
+
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                async with semaphore:
+                    async with self.session.get(
+                        url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)
+                    ) as resp:
+                        res = await resp.json(content_type=None)
+                break
+            except aiohttp.ClientResponseError as e:
+                if e.status not in self.retry_statuses or attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                logger.debug(f"Wiki({lang}) returned {e.status}, retry in {delay:.2f}s")
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+        if "error" in res:
+            raise ValueError(f"Wiki API error: {res['error']}")
+        return res
+
+    def _retry_delay(self, e: "aiohttp.ClientResponseError", attempt: int) -> float:
+        retry_after = (e.headers or {}).get("Retry-After")
+        try:
+            delay = float(retry_after) if retry_after else 0.0
+        except ValueError:
+            delay = 0.0  # HTTP dates are not worth parsing here
+        if delay <= 0:
+            backoff = self.retry_backoff * 2**attempt
+            delay = random.uniform(backoff / 2, backoff)
+        return min(delay, self.max_retry_delay)
@@ -11,6 +11,7 @@ from .models import (
 @dataclass
 class UpsertCall:
     documents: List[Document]
+    chunk_token_size: Optional[int] = None
 
 
 @dataclass
@@ -21,6 +22,37 @@ class UpsertResponse:
 @dataclass
 class QueryCall:
     queries: List[Query]
+    stream: Optional[bool] = False
+    include_text: Optional[bool] = True
+    include_embedding: Optional[bool] = False
+    metadata_fields: Optional[List[Text]] = None  # None returns all metadata
+
+    def __post_init__(self):
+        if self.include_embedding:
+            for query in self.queries:
+                query.include_embedding = True
+
+    def project(self, result: QueryResult) -> Dict[Text, Any]:
+        """Plain dict of the requested fields, sharing values instead of copying."""
+
+        results: List[Dict[Text, Any]] = []
+        for doc in result.results:
+            item: Dict[Text, Any] = {"id": doc.id, "score": doc.score}
+            if self.include_text:
+                item["text"] = doc.text
+            if self.include_embedding:
+                item["embedding"] = doc.embedding
+            metadata = doc.metadata or {}
+            if self.metadata_fields is None:
+                item["metadata"] = metadata
+            else:
+                item["metadata"] = {
+                    key: metadata[key]
+                    for key in self.metadata_fields
+                    if key in metadata
+                }
+            results.append(item)
+        return {"query": result.query, "results": results}
 
 
 @dataclass
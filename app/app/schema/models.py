@@ -5,9 +5,10 @@ from typing import Any, Dict, List, Optional, Text
 from app.config import settings
 
 
-@dataclass
-class _WithScore:
-    score: float
+def document_id(source: Text, lang: Text, title: Text) -> Text:
+    """Stable id of a sourced page, so refetching it overwrites the same point."""
+
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{lang}:{title}"))
 
 
 @dataclass
@@ -45,8 +46,16 @@ class DocumentWithEmbedding(Document, _WithEmbedding):
 
 
 @dataclass
-class DocumentWithScore(DocumentWithEmbedding, _WithScore):
-    pass
+class DocumentWithScore:
+    """Search hit, flat and slotted since results are built in bulk."""
+
+    __slots__ = ("score", "embedding", "text", "id", "metadata")
+
+    score: float
+    embedding: Optional[List[float]]
+    text: Text
+    id: Text
+    metadata: Dict[Text, Any]
 
 
 @dataclass
@@ -54,17 +63,36 @@ class Query:
     query: Text
     filter: Optional[Dict[Text, Any]] = None
     top_k: Optional[int] = 5
+    collapse: Optional[bool] = None  # One hit per parent document
+    mode: Optional[Text] = None  # "dense", "lexical" or "hybrid"
+    lang: Optional[Text] = None  # ISO 639-1 code, skips language detection
+    include_embedding: Optional[bool] = False  # Return stored vectors of hits
 
     def __post_init__(self):
         self.query = self.query.strip()
         self.filter = self.filter or {}
         self.top_k = min(self.top_k, settings.max_top_k)
+        if self.collapse is None:
+            self.collapse = settings.QUERY_COLLAPSE_CHUNKS
+        self.mode = (self.mode or settings.QUERY_MODE).lower()
+        if self.mode not in ("dense", "lexical", "hybrid"):
+            raise ValueError(f"Query mode {self.mode} not supported.")
+        if self.lang:
+            self.lang = self.lang.strip().lower()
+            if not self.lang.isalpha() or len(self.lang) not in (2, 3):
+                raise ValueError(f"Query language {self.lang} not supported.")
+        else:
+            self.lang = None
 
     def with_embedding(self, embedding: List[float]) -> "QueryWithEmbedding":
         return QueryWithEmbedding(
             query=self.query,
             filter=self.filter,
             top_k=self.top_k,
+            collapse=self.collapse,
+            mode=self.mode,
+            lang=self.lang,
+            include_embedding=self.include_embedding,
             embedding=embedding,
         )
 
@@ -76,5 +104,7 @@ class QueryWithEmbedding(Query, _WithEmbedding):
 
 @dataclass
 class QueryResult:
+    __slots__ = ("query", "results")
+
     query: Text
     results: List[DocumentWithScore]
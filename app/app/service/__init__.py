@@ -0,0 +1,20 @@
+from .bulk import BulkUpsert
+from .chunker import DocumentChunker, collapse_results
+from .ingestion import IngestionService
+from .language import LanguageIdentifier
+from .scheduler import RefreshScheduler
+from .search import SearchService
+from .warmup import QueryLog, Warmup, read_warmup_queries
+
+__all__ = [
+    "BulkUpsert",
+    "DocumentChunker",
+    "IngestionService",
+    "LanguageIdentifier",
+    "QueryLog",
+    "RefreshScheduler",
+    "SearchService",
+    "Warmup",
+    "collapse_results",
+    "read_warmup_queries",
+]
@@ -0,0 +1,170 @@
+import asyncio
+import collections
+import json
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Text,
+    Tuple,
+)
+
+from dacite import from_dict
+
+from app.config import logger
+from app.schema.models import Document
+
+from .ingestion import IngestionService
+
+Ack = Dict[Text, Any]
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: Optional[int] = None
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Yield `(line_number, line)` of a chunked body, numbered from 1.
+
+    Lines longer than `max_line_bytes` are yielded as None, and are not
+    buffered beyond the limit, the rest of such a line is skipped up to the
+    next newline.
+    """
+
+    buffer = bytearray()
+    line_no = 0
+    overflow = False  # Skipping the rest of an oversized line
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line_no += 1
+            if overflow or (max_line_bytes and end - start > max_line_bytes):
+                yield line_no, None
+            else:
+                yield line_no, bytes(buffer[start:end])
+            overflow = False
+            start = end + 1
+        del buffer[:start]
+        if max_line_bytes and len(buffer) > max_line_bytes:
+            overflow = True
+            buffer.clear()
+    if overflow:
+        yield line_no + 1, None
+    elif buffer:
+        yield line_no + 1, bytes(buffer)
+
+
+class BulkUpsert:
+    """Upsert an NDJSON stream of documents in pipelined batches.
+
+    At most `max_in_flight` batches are embedded and written at a time, and
+    the body is not read further until the oldest one finishes, so memory
+    stays flat whatever the body size. Every batch is acknowledged in order
+    with its ids, or with an error, and with the lines that failed to parse
+    or exceeded `max_line_bytes`; a batch holds at most `batch_size` lines,
+    valid or not.
+    """
+
+    def __init__(
+        self,
+        ingestion_service: IngestionService,
+        batch_size: int = 256,
+        max_in_flight: int = 2,
+        chunk_token_size: Optional[int] = None,
+        max_line_bytes: Optional[int] = None,
+    ):
+        self.ingestion_service = ingestion_service
+        self.batch_size = max(int(batch_size), 1)
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.chunk_token_size = chunk_token_size
+        self.max_line_bytes = max_line_bytes
+
+    async def run(
+        self, chunks: AsyncIterator[bytes], send: Callable[[Ack], Awaitable[None]]
+    ) -> Ack:
+        summary = dict(batches=0, documents=0, written=0, failed=0, invalid=0)
+        pending: Deque["asyncio.Task[Ack]"] = collections.deque()
+
+        async def _ack(task: "asyncio.Task[Ack]") -> None:
+            ack = await task
+            if "error" in ack:
+                summary["failed"] += ack["documents"]
+            else:
+                summary["written"] += ack["documents"]
+            await send(ack)
+
+        docs: List[Document] = []
+        errors: List[Dict[Text, Any]] = []
+        first_line: Optional[int] = None
+        last_line = 0
+        try:
+            async for line_no, line in iter_lines(chunks, self.max_line_bytes):
+                last_line = line_no
+                if line is not None and not line.strip():
+                    continue
+                first_line = first_line or line_no
+                try:
+                    if line is None:
+                        raise ValueError(f"line exceeds {self.max_line_bytes} bytes")
+                    docs.append(from_dict(data_class=Document, data=json.loads(line)))
+                except Exception as e:
+                    errors.append(dict(line=line_no, error=f"Invalid document: {e}"))
+                    summary["invalid"] += 1
+
+                # Invalid lines fill batches too, so their errors are acked as we go
+                if len(docs) + len(errors) >= self.batch_size:
+                    if len(pending) >= self.max_in_flight:
+                        await _ack(pending.popleft())
+                    pending.append(
+                        self._submit(summary, docs, errors, first_line, line_no)
+                    )
+                    docs, errors, first_line = [], [], None
+
+            if docs or errors:
+                pending.append(
+                    self._submit(summary, docs, errors, first_line or 1, last_line)
+                )
+            while pending:
+                await _ack(pending.popleft())
+        finally:
+            # The client went away, stop the batches still in flight
+            for task in pending:
+                task.cancel()
+        return summary
+
+    def _submit(
+        self,
+        summary: Ack,
+        docs: List[Document],
+        errors: List[Dict[Text, Any]],
+        first_line: int,
+        last_line: int,
+    ) -> "asyncio.Task[Ack]":
+        summary["batches"] += 1
+        summary["documents"] += len(docs)
+        ack: Ack = dict(
+            batch=summary["batches"],
+            lines=[first_line, last_line],
+            documents=len(docs),
+            invalid=errors,
+        )
+        return asyncio.create_task(self._upsert(ack, docs))
+
+    async def _upsert(self, ack: Ack, docs: List[Document]) -> Ack:
+        if not docs:
+            return dict(ack, ids=[])
+        try:
+            ids = await self.ingestion_service.upsert(
+                documents=docs, chunk_token_size=self.chunk_token_size
+            )
+            return dict(ack, ids=ids)
+        except Exception as e:
+            logger.exception(e)
+            return dict(ack, error="Upsert failed")
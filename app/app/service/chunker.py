@@ -0,0 +1,135 @@
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple
+
+from app.config import logger
+from app.schema.models import Document, DocumentWithScore, QueryResult
+
+
+class RegexTokenizer:
+    """Approximate tokenizer used when the tiktoken encoding cannot be loaded.
+
+    Words, single CJK characters and punctuation marks count as one token,
+    which slightly undercounts BPE tokens for long words.
+    """
+
+    _cjk = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+    pattern = re.compile(f"[{_cjk}]|[^\\W{_cjk}]+|[^\\w\\s]")
+
+    def spans(self, text: Text) -> List[Tuple[int, int]]:
+        return [m.span() for m in self.pattern.finditer(text)]
+
+
+class DocumentChunker:
+    """Split documents into overlapping token windows.
+
+    The first chunk keeps the id of its document and the following chunks get
+    ids derived from it, so re-upserting a document overwrites its chunks.
+    Every chunk carries `parent_id` and `chunk_index` in its metadata.
+    """
+
+    def __init__(
+        self,
+        chunk_token_size: int = 256,
+        overlap: int = 32,
+        encoding: Text = "cl100k_base",
+    ):
+        self.chunk_token_size = int(chunk_token_size)
+        self.overlap = max(0, min(int(overlap), self.chunk_token_size // 2))
+        self.encoding = encoding
+        self._tokenizer: Any = None
+
+    def __getstate__(self) -> Dict[Text, Any]:
+        # Workers load their own tokenizer
+        return dict(self.__dict__, _tokenizer=None)
+
+    @property
+    def tokenizer(self) -> Any:
+        if self._tokenizer is None:
+            try:
+                import tiktoken
+
+                self._tokenizer = tiktoken.get_encoding(self.encoding)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to load tiktoken encoding '{self.encoding}', "
+                    + f"fall back to approximate token counts: {e}"
+                )
+                self._tokenizer = RegexTokenizer()
+        return self._tokenizer
+
+    def split(self, text: Text, chunk_token_size: Optional[int] = None) -> List[Text]:
+        # 0 turns chunking off for one call, None keeps the default
+        size = int(
+            self.chunk_token_size if chunk_token_size is None else chunk_token_size
+        )
+        if size <= 0 or not text:
+            return [text]
+        overlap = min(self.overlap, size // 2)
+        stride = size - overlap
+
+        tokenizer = self.tokenizer
+        if isinstance(tokenizer, RegexTokenizer):
+            spans = tokenizer.spans(text)
+            if len(spans) <= size:
+                return [text]
+            return [
+                text[spans[i][0] : spans[min(i + size, len(spans)) - 1][1]]
+                for i in range(0, len(spans) - overlap, stride)
+            ]
+
+        tokens = tokenizer.encode(text, disallowed_special=())
+        if len(tokens) <= size:
+            return [text]
+        chunks: List[Text] = []
+        for i in range(0, len(tokens) - overlap, stride):
+            # Windows may cut multi-byte characters, drop the partial bytes
+            chunk = tokenizer.decode_bytes(tokens[i : i + size]).decode(
+                "utf-8", errors="ignore"
+            )
+            chunks.append(chunk.strip())
+        return [chunk for chunk in chunks if chunk]
+
+    def chunk(
+        self, documents: Sequence[Document], chunk_token_size: Optional[int] = None
+    ) -> List[Document]:
+        output: List[Document] = []
+        for doc in documents:
+            texts = self.split(doc.text, chunk_token_size=chunk_token_size)
+            for i, text in enumerate(texts):
+                output.append(
+                    Document(
+                        id=doc.id if i == 0 else chunk_id(doc.id, i),
+                        text=text,
+                        metadata=dict(
+                            doc.metadata or {},
+                            parent_id=doc.id,
+                            chunk_index=i,
+                        ),
+                    )
+                )
+        return output
+
+
+def chunk_id(parent_id: Text, index: int) -> Text:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{parent_id}#{index}"))
+
+
+def parent_id(doc: Document) -> Text:
+    return (doc.metadata or {}).get("parent_id") or doc.id
+
+
+def collapse_results(result: QueryResult, top_k: int) -> QueryResult:
+    """Keep the best scored chunk of every parent document."""
+
+    seen = set()
+    results: List[DocumentWithScore] = []
+    for doc in sorted(result.results, key=lambda doc: doc.score, reverse=True):
+        key = parent_id(doc)
+        if key in seen:
+            continue
+        seen.add(key)
+        results.append(doc)
+        if len(results) >= top_k:
+            break
+    return QueryResult(query=result.query, results=results)
@@ -0,0 +1,211 @@
+import asyncio
+import functools
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Text
+
+from app.document_store import DocumentStore, LexicalIndex, QueryResultCache
+from app.embedding.embedder import Embedder
+from app.schema.models import Document, DocumentWithEmbedding
+from app.utils.metrics import metrics
+
+from .chunker import DocumentChunker, chunk_id, parent_id
+
+
+def content_hash(doc: Document, model: Text) -> Text:
+    metadata = {
+        key: value
+        for key, value in (doc.metadata or {}).items()
+        if key not in ("created_at", "content_hash")
+    }
+    return hashlib.sha256(
+        json.dumps(
+            [model, doc.text, metadata],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+class IngestionService:
+    """Chunk, embed and store documents in-process.
+
+    It is shared by the `/upsert` handler and the background wiki ingestion,
+    and invalidates cached query results after every write. Every document
+    carries a hash of its content, documents whose stored hash is unchanged
+    are neither embedded nor written again. Writes and deletes are mirrored
+    to the lexical index when one is configured.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        document_store: DocumentStore,
+        query_cache: Optional[QueryResultCache] = None,
+        chunker: Optional[DocumentChunker] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+    ):
+        self.embedder = embedder
+        self.document_store = document_store
+        self.query_cache = query_cache
+        self.chunker = chunker
+        self.lexical_index = lexical_index
+        self.written = 0
+        self.skipped = 0
+
+    async def upsert(
+        self, documents: List[Document], chunk_token_size: Optional[int] = None
+    ) -> List[Text]:
+        if not documents:
+            return []
+
+        # Chunking
+        parent_ids = [doc.id for doc in documents]
+        chunker = self.chunker
+        if chunker is None and chunk_token_size:
+            chunker = DocumentChunker(chunk_token_size=chunk_token_size)
+        if chunker is not None:
+            # Tokenizing is CPU bound, keep it off the event loop
+            loop = asyncio.get_running_loop()
+            documents = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    chunker.chunk, documents, chunk_token_size=chunk_token_size
+                ),
+            )
+
+        # Embedding
+        with metrics.time("ingest_embedding"):
+            emb_docs = await self.embed_changed(documents)
+        if not emb_docs and chunker is None:
+            return parent_ids
+
+        # Upsert
+        changed = False
+        try:
+            if emb_docs:
+                changed = True
+                with metrics.time("ingest_write"):
+                    await self.write(emb_docs)
+            if chunker is not None and await self.prune_chunks(documents):
+                changed = True
+            return parent_ids
+        finally:
+            # Unchanged documents leave cached results valid
+            if changed:
+                self.invalidate()
+
+    async def embed_changed(
+        self, documents: List[Document]
+    ) -> List[DocumentWithEmbedding]:
+        """Hash documents and embed those whose stored hash differs."""
+
+        for doc in documents:
+            doc.metadata["content_hash"] = content_hash(doc, self.embedder.model)
+        stored = await self.document_store.content_hashes(
+            list(dict.fromkeys(doc.id for doc in documents))
+        )
+        changed = [
+            doc
+            for doc in documents
+            if stored.get(doc.id) != doc.metadata["content_hash"]
+        ]
+        self.skipped += len(documents) - len(changed)
+        if not changed:
+            return []
+
+        embeddings = await self.embedder.embed([doc.text for doc in changed])
+        return [
+            doc.with_embedding(embedding=emb) for doc, emb in zip(changed, embeddings)
+        ]
+
+    async def write(self, documents: List[DocumentWithEmbedding]) -> List[Text]:
+        ids = await self.document_store.upsert(documents=documents)
+        if self.lexical_index is not None:
+            await self.lexical_index.upsert(documents)
+        self.written += len(documents)
+        return ids
+
+    async def prune_chunks(self, chunks: List[Document]) -> bool:
+        """Delete chunks left over from longer versions, return if there were any.
+
+        Chunk ids are consecutive, a parent has stale chunks exactly when the
+        chunk following its last new one is stored.
+        """
+
+        counts: Dict[Text, int] = {}
+        for doc in chunks:
+            key = parent_id(doc)
+            counts[key] = counts.get(key, 0) + 1
+        next_ids = {chunk_id(key, count): key for key, count in counts.items()}
+        stored = await self.document_store.content_hashes(list(next_ids))
+        stale_parents = {next_ids[_id] for _id in stored}
+        if not stale_parents:
+            return False
+
+        await self.delete_stale_chunks(
+            parent_ids=sorted(stale_parents),
+            keep_ids=[doc.id for doc in chunks if parent_id(doc) in stale_parents],
+        )
+        return True
+
+    async def delete_stale_chunks(
+        self, parent_ids: List[Text], keep_ids: List[Text]
+    ) -> None:
+        """Drop chunks left over from longer previous versions."""
+
+        await self._delete(
+            filter=dict(
+                must=[dict(key="metadata.parent_id", match=dict(any=parent_ids))],
+                must_not=[dict(has_id=keep_ids)],
+            )
+        )
+
+    async def delete(
+        self,
+        ids: Optional[List[Text]] = None,
+        filter: Optional[Dict] = None,
+        delete_all: Optional[bool] = None,
+    ) -> bool:
+        try:
+            success = await self._delete(ids=ids, filter=filter, delete_all=delete_all)
+            if ids and not delete_all:
+                success = (
+                    await self._delete(
+                        filter=dict(
+                            must=[dict(key="metadata.parent_id", match=dict(any=ids))]
+                        )
+                    )
+                    and success
+                )
+            return success
+        finally:
+            self.invalidate()
+
+    async def _delete(
+        self,
+        ids: Optional[List[Text]] = None,
+        filter: Optional[Dict] = None,
+        delete_all: Optional[bool] = None,
+    ) -> bool:
+        success = await self.document_store.delete(
+            ids=ids, filter=filter, delete_all=delete_all
+        )
+        if self.lexical_index is not None:
+            await self.lexical_index.delete(
+                ids=ids, filter=filter, delete_all=delete_all
+            )
+        return success
+
+    def invalidate(self) -> None:
+        if self.query_cache is not None:
+            self.query_cache.invalidate()
+
+    def stats(self) -> Dict[Text, Any]:
+        total = self.written + self.skipped
+        return dict(
+            written=self.written,
+            skipped=self.skipped,
+            skip_ratio=(self.skipped / total) if total else 0.0,
+        )
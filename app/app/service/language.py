@@ -0,0 +1,139 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple
+
+from lingua import Language, LanguageDetector, LanguageDetectorBuilder
+
+from app.config import logger
+from app.utils.cache import LRUCache
+from app.utils.text import normalize_text
+
+_KANA_PATTERN = re.compile("[\u3040-\u30ff\u31f0-\u31ff]")
+_LETTER_PATTERN = re.compile(r"[^\W\d_]")
+
+# Scripts written by few languages, the first configured candidate wins when
+# the script dominates the text
+_SCRIPTS: Tuple[Tuple["re.Pattern", Tuple[Text, ...]], ...] = (
+    (re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"), ("zh", "ja")),
+    (re.compile("[\u1100-\u11ff\u3130-\u318f\uac00-\ud7af]"), ("ko",)),
+    (re.compile("[\u0370-\u03ff\u1f00-\u1fff]"), ("el",)),
+    (re.compile("[\u0590-\u05ff]"), ("he",)),
+    (re.compile("[\u0e00-\u0e7f]"), ("th",)),
+    (re.compile("[\u0530-\u058f]"), ("hy",)),
+    (re.compile("[\u10a0-\u10ff]"), ("ka",)),
+)
+# Scripts shared by several languages, only used when exactly one of them is
+# configured
+_SHARED_SCRIPTS: Tuple[Tuple["re.Pattern", Tuple[Text, ...]], ...] = (
+    (
+        re.compile("[\u0400-\u04ff]"),
+        ("ru", "uk", "be", "bg", "kk", "mk", "mn", "sr"),
+    ),
+    (re.compile("[\u0600-\u06ff]"), ("ar", "fa", "ur")),
+    (re.compile("[\u0900-\u097f]"), ("hi", "mr", "ne")),
+)
+
+_NOT_DETECTED = ""
+
+
+class LanguageIdentifier:
+    """ISO 639-1 language of short queries.
+
+    Texts dominated by a script that only one configured language uses are
+    resolved from their Unicode ranges, the rest go to a lingua detector.
+    Results, including failed detections, are kept in an LRU cache.
+    """
+
+    def __init__(
+        self,
+        languages: Sequence[Text],
+        cache_max_entries: int = 10000,
+        script_fast_path: bool = True,
+    ):
+        self.languages: List["Language"] = []
+        for _lang in languages:
+            try:
+                self.languages.append(Language[_lang.upper()])
+            except KeyError:
+                logger.warning(f"Language {_lang} not supported.")
+        self.languages = self.languages or [Language.ENGLISH]
+        self.iso_codes = [
+            language.iso_code_639_1.name.lower() for language in self.languages
+        ]
+        self.script_fast_path = script_fast_path
+        self.cache: LRUCache[Text] = LRUCache(max_entries=cache_max_entries)
+        self.script_hits = 0
+        self.detector_calls = 0
+        self._detector: Optional["LanguageDetector"] = None
+        self._lock = threading.Lock()
+
+    @property
+    def detector(self) -> "LanguageDetector":
+        if self._detector is None:
+            with self._lock:
+                if self._detector is None:
+                    self._detector = self._build(preload=False)
+        return self._detector
+
+    def preload(self) -> None:
+        """Load every language model now, e.g. once before forking workers."""
+
+        with self._lock:
+            self._detector = self._build(preload=True)
+
+    def detect(self, text: Text) -> Optional[Text]:
+        text = normalize_text(text)
+        if not text:
+            return None
+        key = text.lower()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached or None
+
+        lang = self.detect_script(text) if self.script_fast_path else None
+        if lang is not None:
+            self.script_hits += 1
+        else:
+            self.detector_calls += 1
+            language = self.detector.detect_language_of(text)
+            lang = language.iso_code_639_1.name.lower() if language else None
+        self.cache.put(key, lang or _NOT_DETECTED)
+        return lang
+
+    def detect_script(self, text: Text) -> Optional[Text]:
+        letters = len(_LETTER_PATTERN.findall(text))
+        if not letters:
+            return None
+
+        kana = len(_KANA_PATTERN.findall(text))
+        for pattern, candidates in _SCRIPTS:
+            count = len(pattern.findall(text))
+            if candidates[0] == "zh" and kana:
+                count, candidates = count + kana, ("ja",)
+            if count * 2 > letters:
+                return next((c for c in candidates if c in self.iso_codes), None)
+
+        for pattern, candidates in _SHARED_SCRIPTS:
+            if len(pattern.findall(text)) * 2 > letters:
+                configured = [c for c in candidates if c in self.iso_codes]
+                return configured[0] if len(configured) == 1 else None
+        return None
+
+    def stats(self) -> Dict[Text, Any]:
+        return dict(
+            cache=self.cache.stats(),
+            script_hits=self.script_hits,
+            detector_calls=self.detector_calls,
+            detector_loaded=self._detector is not None,
+        )
+
+    def _build(self, preload: bool) -> "LanguageDetector":
+        builder = LanguageDetectorBuilder.from_languages(*self.languages)
+        if preload:
+            builder = builder.with_preloaded_language_models()
+        detector = builder.build()
+        logger.debug(
+            "Have set language detector with languages: "
+            + f"{', '.join([l.name for l in self.languages])}."
+        )
+        return detector
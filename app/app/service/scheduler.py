@@ -0,0 +1,215 @@
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Text, Tuple
+
+from app.config import logger
+from app.utils.histogram import Histogram
+from app.utils.metrics import metrics
+from app.utils.text import normalize_text
+
+
+@dataclass
+class RefreshTask:
+    query: Text
+    top_k: int
+    lang: Optional[Text] = None
+    exclude_names: Set[Text] = field(default_factory=set)
+    hits: int = 1
+    gap: float = 0.0
+    created_at: float = field(default_factory=time.monotonic)
+    version: int = 0
+
+    @property
+    def priority(self) -> float:
+        # Frequently asked queries first, weighted by how poor their best hit is
+        return self.hits * (1.0 + self.gap)
+
+
+class RefreshScheduler:
+    """Bounded priority queue of background wiki refreshes for one worker.
+
+    Submitting a query that is already queued merges into its entry, which
+    raises the entry's priority, and a query that is already running merges
+    into the running refresh. When the queue is full, the lowest priority
+    entry is dropped, which may be the submitted one. Entries that waited
+    longer than `max_age` are dropped instead of run. At most `concurrency`
+    refreshes run at a time, so keep `max_queue` near what they get through
+    in `max_age` or the backlog outlives its entries.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Awaitable[Any]],
+        concurrency: int = 4,
+        max_queue: int = 100,
+        max_age: float = 60.0,
+        confident_score: float = 0.9,
+    ):
+        self.handler = handler
+        self.concurrency = max(int(concurrency), 1)
+        self.max_queue = max(int(max_queue), 1)
+        self.max_age = float(max_age)
+        self.confident_score = confident_score
+
+        self._queue: Dict[Tuple[Optional[Text], Text], RefreshTask] = {}
+        self._heap: List[Tuple[float, int, Tuple[Optional[Text], Text], int]] = []
+        self._counter = itertools.count()
+        self._running: Set[Tuple[Optional[Text], Text]] = set()
+        self._ready: Optional[asyncio.Event] = None
+        self._workers: List["asyncio.Task"] = []
+
+        self.submitted = 0
+        self.merged = 0
+        self.dropped = 0
+        self.expired = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.wait_time_histogram = Histogram(
+            buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+        )
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def start(self) -> None:
+        self._ready = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"wiki-refresh-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(
+        self,
+        query: Text,
+        top_k: int,
+        lang: Optional[Text] = None,
+        exclude_names: Optional[List[Text]] = None,
+        best_score: float = 0.0,
+    ) -> bool:
+        """Queue a refresh, return False if it was dropped."""
+
+        self.submitted += 1
+        key = (lang, normalize_text(query).lower())
+        gap = max(self.confident_score - best_score, 0.0)
+        if key in self._running:
+            # The running refresh fetches the same query
+            self.merged += 1
+            return True
+
+        task = self._queue.get(key)
+        if task is not None:
+            self.merged += 1
+            task.hits += 1
+            task.gap = max(task.gap, gap)
+            task.top_k = max(task.top_k, top_k)
+            # Only names excluded by every submission stay excluded
+            task.exclude_names &= set(exclude_names or [])
+            self._push(key, task)
+            return True
+
+        task = RefreshTask(
+            query=query,
+            top_k=top_k,
+            lang=lang,
+            exclude_names=set(exclude_names or []),
+            gap=gap,
+        )
+        if len(self._queue) >= self.max_queue:
+            lowest_key = min(self._queue, key=lambda k: self._queue[k].priority)
+            self.dropped += 1
+            if self._queue[lowest_key].priority >= task.priority:
+                return False
+            del self._queue[lowest_key]
+
+        self._queue[key] = task
+        self._push(key, task)
+        self.max_depth = max(self.max_depth, len(self._queue))
+        return True
+
+    def stats(self) -> Dict[Text, Any]:
+        return dict(
+            depth=self.depth,
+            max_depth=self.max_depth,
+            running=self.running,
+            submitted=self.submitted,
+            merged=self.merged,
+            dropped=self.dropped,
+            expired=self.expired,
+            completed=self.completed,
+            failed=self.failed,
+            wait_time=self.wait_time_histogram.stats(),
+        )
+
+    def _push(self, key: Tuple[Optional[Text], Text], task: RefreshTask) -> None:
+        # Older heap items of the entry are skipped by their version
+        task.version += 1
+        heapq.heappush(
+            self._heap, (-task.priority, next(self._counter), key, task.version)
+        )
+        # Merges leave stale items behind, drop them once they dominate the heap
+        if len(self._heap) > 4 * len(self._queue) + 16:
+            self._heap = [
+                item
+                for item in self._heap
+                if item[2] in self._queue and self._queue[item[2]].version == item[3]
+            ]
+            heapq.heapify(self._heap)
+        if self._ready is not None:
+            self._ready.set()
+
+    def _pop(self) -> Optional[RefreshTask]:
+        while self._heap:
+            _, _, key, version = heapq.heappop(self._heap)
+            task = self._queue.get(key)
+            if task is None or task.version != version:
+                continue
+            del self._queue[key]
+            self._running.add(key)
+            return task
+        return None
+
+    async def _work(self) -> None:
+        while True:
+            task = self._pop()
+            if task is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            key = (task.lang, normalize_text(task.query).lower())
+            try:
+                wait_time = time.monotonic() - task.created_at
+                if wait_time > self.max_age:
+                    self.expired += 1
+                    continue
+                self.wait_time_histogram.observe(wait_time)
+                metrics.observe("wiki_refresh_wait_seconds", wait_time)
+                await self.handler(
+                    query=task.query,
+                    top_k=task.top_k,
+                    lang=task.lang,
+                    exclude_names=sorted(task.exclude_names),
+                )
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.exception(e)
+            finally:
+                self._running.discard(key)
@@ -0,0 +1,131 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Text, Tuple
+
+from app.document_store import DocumentStore, LexicalIndex, fuse_results
+from app.schema.models import Query, QueryResult
+from app.utils.metrics import metrics
+
+from .chunker import collapse_results
+
+EmbedFunc = Callable[[List[Text]], Awaitable[List[List[float]]]]
+
+
+class SearchService:
+    """Dense, lexical or hybrid retrieval for a batch of queries.
+
+    Dense queries go through one embedding call and one batched store search,
+    lexical queries never touch the embedding provider, and hybrid queries
+    run both legs and merge them with reciprocal rank fusion.
+    """
+
+    def __init__(
+        self,
+        document_store: DocumentStore,
+        lexical_index: Optional[LexicalIndex] = None,
+        rrf_k: int = 60,
+        collapse_overfetch: int = 4,
+        confident_score: float = 0.9,
+    ):
+        self.document_store = document_store
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        self.collapse_overfetch = collapse_overfetch
+        self.confident_score = confident_score
+
+    async def search(
+        self, queries: List[Query], embed_func: EmbedFunc
+    ) -> Tuple[List[QueryResult], List[bool]]:
+        """Return results and whether each query already has a confident match.
+
+        A dense match is confident above `confident_score`; lexical-only
+        queries are confident as soon as anything matches.
+        """
+
+        if not queries:
+            return [], []
+
+        dense_queries = [
+            query
+            for query in queries
+            if query.mode != "lexical" or self.lexical_index is None
+        ]
+        lexical_queries = (
+            [query for query in queries if query.mode != "dense"]
+            if self.lexical_index is not None
+            else []
+        )
+
+        dense_results: Dict[int, QueryResult] = {}
+        if dense_queries:
+            embeddings = await embed_func([query.query for query in dense_queries])
+            emb_queries = [
+                query.with_embedding(embedding=emb)
+                for query, emb in zip(dense_queries, embeddings)
+            ]
+            for emb_query in emb_queries:
+                emb_query.top_k = self.candidates(emb_query)
+            with metrics.time("search_dense"):
+                results = await self.document_store.query(queries=emb_queries)
+            dense_results = {
+                id(query): result for query, result in zip(dense_queries, results)
+            }
+
+        lexical_results: Dict[int, QueryResult] = {}
+        if lexical_queries:
+            candidate_queries = [
+                Query(
+                    query=query.query,
+                    filter=query.filter,
+                    top_k=query.top_k,
+                    collapse=query.collapse,
+                    mode=query.mode,
+                    lang=query.lang,
+                )
+                for query in lexical_queries
+            ]
+            for candidate_query, query in zip(candidate_queries, lexical_queries):
+                candidate_query.top_k = self.candidates(query)
+            with metrics.time("search_lexical"):
+                results = await self.lexical_index.query(candidate_queries)
+            lexical_results = {
+                id(query): result for query, result in zip(lexical_queries, results)
+            }
+
+        outputs: List[QueryResult] = []
+        confident: List[bool] = []
+        for query in queries:
+            dense = dense_results.get(id(query))
+            lexical = lexical_results.get(id(query))
+            if dense is not None and lexical is not None:
+                result = QueryResult(
+                    query=query.query,
+                    results=fuse_results(
+                        [dense, lexical],
+                        top_k=self.candidates(query),
+                        k=self.rrf_k,
+                    ),
+                )
+            else:
+                result = dense or lexical or QueryResult(query=query.query, results=[])
+
+            if query.collapse:
+                result = collapse_results(result, top_k=query.top_k)
+            else:
+                result.results = result.results[: query.top_k]
+            outputs.append(result)
+
+            if dense is not None:
+                confident.append(
+                    any(doc.score >= self.confident_score for doc in dense.results)
+                )
+            else:
+                confident.append(bool(result.results))
+        return outputs, confident
+
+    def candidates(self, query: Query) -> int:
+        top_k = query.top_k or 0
+        if query.collapse:
+            # Over-fetch so collapsing chunks still fills top_k
+            top_k *= self.collapse_overfetch
+        if query.mode == "hybrid":
+            top_k *= 2
+        return top_k
@@ -0,0 +1,182 @@
+import asyncio
+import collections
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Text
+
+from app.config import logger
+from app.schema.models import Query
+from app.utils.ratelimit import TokenBucket
+from app.utils.text import normalize_text
+
+
+class QueryLog:
+    """Append queries to an NDJSON file, which warmup can replay later.
+
+    `record` only buffers the lines, `run` appends them every
+    `flush_interval` seconds from the default executor and `close` appends
+    what is left, so the event loop never waits on the file.
+    """
+
+    def __init__(self, path: Text, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = float(flush_interval)
+        self._lines: List[Text] = []
+        self._file = None
+
+    def record(self, queries: Iterable[Query]) -> None:
+        for query in queries:
+            line = dict(query=query.query, top_k=query.top_k, mode=query.mode)
+            if query.lang:
+                line["lang"] = query.lang
+            self._lines.append(json.dumps(line, ensure_ascii=False) + "\n")
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Swap the buffer on the loop, the executor only sees its own list
+            lines, self._lines = self._lines, []
+            if lines:
+                try:
+                    await loop.run_in_executor(None, self._write, lines)
+                except Exception as e:
+                    logger.exception(e)
+
+    def close(self) -> None:
+        lines, self._lines = self._lines, []
+        if lines:
+            self._write(lines)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, lines: List[Text]) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        # One append of whole lines does not interleave between workers
+        self._file.write("".join(lines))
+        self._file.flush()
+
+
+def read_warmup_queries(
+    query_log_path: Optional[Text] = None,
+    topics: Iterable[Text] = (),
+    max_queries: int = 1000,
+) -> List[Query]:
+    """Distinct queries to warm up, topics first, then the most frequent ones.
+
+    Query log lines are plain text, a JSON query, or a JSON `/query` body.
+    """
+
+    counts: Dict[Any, int] = collections.Counter()
+    queries: Dict[Any, Query] = {}
+
+    def _add(query: Query, count: int = 1) -> None:
+        if not query.query:
+            return
+        key = (normalize_text(query.query).lower(), query.lang, query.mode)
+        queries.setdefault(key, query)
+        counts[key] += count
+
+    for topic in topics:
+        # Listed topics go first whatever the log says
+        _add(Query(query=topic), count=1 << 30)
+
+    if query_log_path and os.path.exists(query_log_path):
+        with open(query_log_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line) if line[0] in "{[" else line
+                    items = [data]
+                    if isinstance(data, dict) and "queries" in data:
+                        items = data["queries"]
+                    for item in items:
+                        if isinstance(item, Text):
+                            item = dict(query=item)
+                        _add(
+                            Query(
+                                query=item["query"],
+                                top_k=item.get("top_k") or 5,
+                                mode=item.get("mode"),
+                                lang=item.get("lang"),
+                            )
+                        )
+                except Exception as e:
+                    logger.debug(f"Skip query log line {line[:80]!r}: {e}")
+
+    return [queries[key] for key, _ in counts.most_common(max_queries)]
+
+
+class Warmup:
+    """Replay queries through `warm_func` in the background at `rate` per second.
+
+    Failures are counted and skipped, so a bad query does not stop the rest.
+    """
+
+    def __init__(
+        self,
+        warm_func: Callable[[Query], Awaitable[Any]],
+        rate: float = 2.0,
+        log_every: int = 50,
+    ):
+        self.warm_func = warm_func
+        self.bucket = TokenBucket(rate, burst=1)
+        self.log_every = max(int(log_every), 1)
+
+        self.state = "idle"
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    async def run(self, queries: List[Query]) -> None:
+        self.state = "running"
+        self.total = len(queries)
+        self.started_at = time.monotonic()
+        logger.info(f"Warmup started with {self.total} queries.")
+        try:
+            for query in queries:
+                await self.bucket.acquire()
+                try:
+                    await self.warm_func(query)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning(f"Warmup query '{query.query}' failed: {e}")
+                self.done += 1
+                if self.done % self.log_every == 0:
+                    logger.info(f"Warmup progress: {self.done}/{self.total} queries.")
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        finally:
+            self.finished_at = time.monotonic()
+        self.state = "done"
+        logger.info(
+            f"Warmup done: {self.done} queries, {self.failed} failed, "
+            + f"in {self.finished_at - self.started_at:.1f}s."
+        )
+
+    def skip(self) -> None:
+        self.state = "skipped"
+
+    def stats(self) -> Dict[Text, Any]:
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return dict(
+            state=self.state,
+            total=self.total,
+            done=self.done,
+            failed=self.failed,
+            progress=(self.done / self.total) if self.total else 0.0,
+            elapsed=elapsed,
+        )
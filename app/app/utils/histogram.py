@@ -0,0 +1,61 @@
+import bisect
+from typing import Any, Dict, List, Sequence, Text
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """A fixed-bucket histogram, cheap enough to observe on the hot path."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets: List[float] = sorted(float(b) for b in buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for upper, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return upper
+        return float("inf")
+
+    def stats(self) -> Dict[Text, Any]:
+        cumulative = 0
+        buckets: Dict[Text, int] = {}
+        for upper, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[f"{upper:g}"] = cumulative
+        buckets["+Inf"] = self.count
+        return dict(
+            count=self.count,
+            sum=self.sum,
+            mean=(self.sum / self.count) if self.count else 0.0,
+            p50=self.quantile(0.5),
+            p95=self.quantile(0.95),
+            p99=self.quantile(0.99),
+            buckets=buckets,
+        )
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Text
+
+from app.utils.cache import LRUCache
+
+
+class LeaseStore:
+    """Expiring keyed leases, shared between processes through sqlite.
+
+    A lease is granted to at most one holder until it expires, which makes
+    it usable both as a cross-worker lock for in-flight work and as a
+    short-lived "recently done" marker once the holder extends it. Without a
+    path the leases are only visible inside the current process.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Text] = None,
+        max_local_entries: int = 100000,
+        max_local_ttl: float = 5.0,
+        purge_interval: float = 60.0,
+    ):
+        self.path = path
+        self.max_local_ttl = float(max_local_ttl)
+        self.purge_interval = float(purge_interval)
+        self._purged_at = 0.0
+        self.conn: Optional[sqlite3.Connection] = None
+        if self.path:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                + "key TEXT PRIMARY KEY, "
+                + "expires_at REAL NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS leases_expires_at ON leases (expires_at)"
+            )
+            self.conn.commit()
+
+        # Keys known to be held, by this or another process, until they expire
+        self.local: LRUCache[float] = LRUCache(max_entries=max_local_entries)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lease")
+        self.granted = 0
+        self.rejected = 0
+
+    async def acquire(self, key: Text, ttl: float) -> bool:
+        return (await self.acquire_many([key], ttl=ttl))[0]
+
+    async def acquire_many(self, keys: Sequence[Text], ttl: float) -> List[bool]:
+        keys = list(keys)
+        now = time.time()
+        unknown = [key for key in dict.fromkeys(keys) if self.local.get(key) is None]
+
+        granted: Dict[Text, float] = {}
+        held: Dict[Text, float] = {}
+        if unknown:
+            if self.conn is None:
+                granted = {key: now + ttl for key in unknown}
+            else:
+                granted, held = await self._run(self._acquire_many, unknown, ttl)
+
+        # Leases held elsewhere are only remembered briefly, they may be released
+        for key, expires_at in held.items():
+            self.local.put(
+                key, expires_at, ttl=min(max(expires_at - now, 0.0), self.max_local_ttl)
+            )
+        for key, expires_at in granted.items():
+            self.local.put(key, expires_at, ttl=max(expires_at - now, 0.0))
+
+        output: List[bool] = []
+        for key in keys:
+            # A key repeated in one call is only granted once
+            acquired = granted.pop(key, None) is not None
+            output.append(acquired)
+            if acquired:
+                self.granted += 1
+            else:
+                self.rejected += 1
+        return output
+
+    async def extend_many(self, keys: Sequence[Text], ttl: float) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        expires_at = time.time() + ttl
+        for key in keys:
+            self.local.put(key, expires_at, ttl=ttl)
+        if self.conn is not None:
+            await self._run(self._set_many, keys, expires_at)
+
+    async def release_many(self, keys: Sequence[Text]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        for key in keys:
+            self.local.pop(key)
+        if self.conn is not None:
+            await self._run(self._delete_many, keys)
+
+    def stats(self) -> Dict[Text, Any]:
+        return dict(
+            granted=self.granted,
+            rejected=self.rejected,
+            local_entries=len(self.local),
+            path=self.path,
+        )
+
+    def _acquire_many(self, keys: List[Text], ttl: float):
+        now = time.time()
+        granted: Dict[Text, float] = {}
+        held: Dict[Text, float] = {}
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            # Expired rows are dead weight, drop them every now and then
+            if now - self._purged_at >= self.purge_interval:
+                self.conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+                self._purged_at = now
+            for key in keys:
+                row = self.conn.execute(
+                    "SELECT expires_at FROM leases WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[0] > now:
+                    held[key] = row[0]
+                    continue
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO leases (key, expires_at) VALUES (?, ?)",
+                    (key, now + ttl),
+                )
+                granted[key] = now + ttl
+        return granted, held
+
+    def _set_many(self, keys: List[Text], expires_at: float) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO leases (key, expires_at) VALUES (?, ?)",
+                [(key, expires_at) for key in keys],
+            )
+
+    def _delete_many(self, keys: List[Text]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM leases WHERE key = ?", [(key,) for key in keys]
+            )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
@@ -0,0 +1,296 @@
+import contextvars
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Text,
+    Tuple,
+)
+
+from .histogram import DEFAULT_LATENCY_BUCKETS, Histogram
+
+Labels = Tuple[Tuple[Text, Text], ...]
+
+# Stage timings of the current request, for the Server-Timing header
+request_timings: "contextvars.ContextVar[Optional[List[Tuple[Text, float]]]]" = (
+    contextvars.ContextVar("request_timings", default=None)
+)
+
+
+def _labels(labels: Dict[Text, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms of one worker process.
+
+    Every worker writes snapshots to `<path>/<pid>.json`, and `collect`
+    merges the snapshots of all live workers, so any worker can serve the
+    metrics of the whole server. Collectors are called right before a
+    snapshot to copy values that are already tracked elsewhere, such as
+    cache statistics, instead of counting them twice on the hot path.
+
+    The registry is not thread safe, take snapshots on the event loop and
+    only hand them to other threads.
+    """
+
+    def __init__(self, namespace: Text = "wiki_retrieval", path: Optional[Text] = None):
+        self.namespace = namespace
+        self.path = path
+        self.help: Dict[Text, Text] = {}
+        self.counters: Dict[Text, Dict[Labels, float]] = {}
+        self.gauges: Dict[Text, Dict[Labels, float]] = {}
+        self.histograms: Dict[Text, Dict[Labels, Histogram]] = {}
+        self.collectors: List[Callable[["MetricsRegistry"], None]] = []
+
+    def describe(self, name: Text, description: Text) -> None:
+        self.help[name] = description
+
+    def inc(self, name: Text, value: float = 1.0, **labels: Any) -> None:
+        series = self.counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0.0) + value
+
+    def set_counter(self, name: Text, value: float, **labels: Any) -> None:
+        self.counters.setdefault(name, {})[_labels(labels)] = float(value)
+
+    def set_gauge(self, name: Text, value: float, **labels: Any) -> None:
+        self.gauges.setdefault(name, {})[_labels(labels)] = float(value)
+
+    def add_gauge(self, name: Text, value: float, **labels: Any) -> None:
+        series = self.gauges.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0.0) + value
+
+    def observe(
+        self,
+        name: Text,
+        value: float,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        **labels: Any,
+    ) -> None:
+        series = self.histograms.setdefault(name, {})
+        key = _labels(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets=buckets)
+        histogram.observe(value)
+
+    @contextmanager
+    def time(self, stage: Text) -> Iterator[None]:
+        """Observe the duration of a stage, and add it to the request timings."""
+
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.observe("stage_duration_seconds", elapsed, stage=stage)
+            timings = request_timings.get()
+            if timings is not None:
+                timings.append((stage, elapsed))
+
+    def add_collector(self, collector: Callable[["MetricsRegistry"], None]) -> None:
+        self.collectors.append(collector)
+
+    def snapshot(self) -> Dict[Text, Any]:
+        for collector in self.collectors:
+            collector(self)
+        return dict(
+            help=dict(self.help),
+            counters={
+                name: [[list(map(list, k)), v] for k, v in series.items()]
+                for name, series in self.counters.items()
+            },
+            gauges={
+                name: [[list(map(list, k)), v] for k, v in series.items()]
+                for name, series in self.gauges.items()
+            },
+            histograms={
+                name: [
+                    [
+                        list(map(list, k)),
+                        dict(buckets=list(h.buckets), counts=list(h.counts), sum=h.sum),
+                    ]
+                    for k, h in series.items()
+                ]
+                for name, series in self.histograms.items()
+            },
+        )
+
+    def flush(self, snapshot: Optional[Dict[Text, Any]] = None) -> None:
+        if not self.path:
+            return
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, f"{os.getpid()}.json")
+        # Concurrent flushes of one worker must not share a temporary file
+        f = tempfile.NamedTemporaryFile(
+            "w", dir=self.path, prefix=f"{os.getpid()}.", suffix=".tmp", delete=False
+        )
+        try:
+            with f:
+                json.dump(snapshot, f)
+            os.replace(f.name, filename)
+        except BaseException:
+            os.remove(f.name)
+            raise
+
+    def remove(self) -> None:
+        if self.path:
+            try:
+                os.remove(os.path.join(self.path, f"{os.getpid()}.json"))
+            except FileNotFoundError:
+                pass
+
+    def collect(self, snapshot: Optional[Dict[Text, Any]] = None) -> Dict[Text, Any]:
+        """Merge the snapshots of all live workers, this one included.
+
+        Pass a `snapshot` of this worker taken on the event loop when
+        collecting from another thread.
+        """
+
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        if not self.path:
+            return snapshot
+        self.flush(snapshot)
+
+        snapshots: List[Dict[Text, Any]] = [snapshot]
+        for filename in os.listdir(self.path):
+            if not filename.endswith(".json"):
+                continue
+            pid = filename[: -len(".json")]
+            if not pid.isdigit():
+                continue
+            if int(pid) == os.getpid() or not _pid_alive(int(pid)):
+                continue
+            try:
+                with open(os.path.join(self.path, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return merge_snapshots(snapshots)
+
+    def render(self, snapshot: Optional[Dict[Text, Any]] = None) -> Text:
+        """Prometheus text exposition format."""
+
+        snapshot = snapshot if snapshot is not None else self.collect()
+        lines: List[Text] = []
+
+        def _header(name: Text, kind: Text) -> Text:
+            full_name = f"{self.namespace}_{name}"
+            if name in snapshot["help"]:
+                lines.append(f"# HELP {full_name} {snapshot['help'][name]}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            return full_name
+
+        for kind, key in (("counter", "counters"), ("gauge", "gauges")):
+            for name, series in sorted(snapshot[key].items()):
+                full_name = _header(name, kind)
+                for labels, value in series:
+                    lines.append(
+                        f"{full_name}{_render_labels(labels)} {_render_value(value)}"
+                    )
+
+        for name, series in sorted(snapshot["histograms"].items()):
+            full_name = _header(name, "histogram")
+            for labels, histogram in series:
+                cumulative = 0
+                for upper, count in zip(
+                    histogram["buckets"] + [float("inf")], histogram["counts"]
+                ):
+                    cumulative += count
+                    le = "+Inf" if upper == float("inf") else f"{upper:g}"
+                    bucket_labels = _render_labels(list(labels) + [["le", le]])
+                    lines.append(f"{full_name}_bucket{bucket_labels} {cumulative}")
+                lines.append(
+                    f"{full_name}_sum{_render_labels(labels)} "
+                    + _render_value(histogram["sum"])
+                )
+                lines.append(f"{full_name}_count{_render_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def merge_snapshots(snapshots: Sequence[Dict[Text, Any]]) -> Dict[Text, Any]:
+    helps: Dict[Text, Text] = {}
+    merged: Dict[Text, Dict[Text, Dict[Labels, Any]]] = dict(
+        counters={}, gauges={}, histograms={}
+    )
+    for snapshot in snapshots:
+        helps.update(snapshot.get("help", {}))
+        for key in ("counters", "gauges"):
+            for name, series in snapshot.get(key, {}).items():
+                _series = merged[key].setdefault(name, {})
+                for labels, value in series:
+                    _labels = tuple(map(tuple, labels))
+                    _series[_labels] = _series.get(_labels, 0.0) + value
+        for name, series in snapshot.get("histograms", {}).items():
+            _series = merged["histograms"].setdefault(name, {})
+            for labels, histogram in series:
+                _labels = tuple(map(tuple, labels))
+                current = _series.get(_labels)
+                if current is None or current["buckets"] != histogram["buckets"]:
+                    _series[_labels] = dict(
+                        buckets=list(histogram["buckets"]),
+                        counts=list(histogram["counts"]),
+                        sum=histogram["sum"],
+                    )
+                else:
+                    current["counts"] = [
+                        a + b for a, b in zip(current["counts"], histogram["counts"])
+                    ]
+                    current["sum"] += histogram["sum"]
+
+    return dict(
+        help=helps,
+        **{
+            key: {
+                name: [
+                    [[list(label) for label in labels], value]
+                    for labels, value in sorted(series.items())
+                ]
+                for name, series in merged[key].items()
+            }
+            for key in ("counters", "gauges", "histograms")
+        },
+    )
+
+
+def _render_labels(labels: Sequence[Sequence[Text]]) -> Text:
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+            for k, v in labels
+        )
+        + "}"
+    )
+
+
+def _render_value(value: float) -> Text:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,26 @@
+"""JSON encoding with the fastest encoder available: orjson when installed,
+then ujson, then the standard library. `dumps` always returns UTF-8 bytes.
+"""
+
+from typing import Any
+
+try:
+    import orjson
+
+    def dumps(obj: Any, **kwargs) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+except ImportError:
+    try:
+        import ujson
+
+        def dumps(obj: Any, **kwargs) -> bytes:
+            return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    except ImportError:
+        import json
+
+        def dumps(obj: Any, **kwargs) -> bytes:
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode(
+                "utf-8"
+            )
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import time
+from typing import Dict, Sequence, Text, Tuple
+
+
+class SqliteKVStore:
+    """A tiny expiring key-value table in a sqlite file shared by processes.
+
+    Methods are blocking; callers run them on an executor.
+    """
+
+    def __init__(self, path: Text, table: Text = "kv"):
+        self.path = path
+        self.table = table
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            + "key TEXT PRIMARY KEY, "
+            + "value TEXT NOT NULL, "
+            + "expires_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get_many(self, keys: Sequence[Text]) -> Dict[Text, Tuple[Text, float]]:
+        now = time.time()
+        output: Dict[Text, Tuple[Text, float]] = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):  # Keep under SQLITE_MAX_VARIABLE_NUMBER
+            _keys = keys[i : i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, value, expires_at FROM {self.table} "
+                + f"WHERE key IN ({','.join('?' * len(_keys))}) AND expires_at > ?",
+                [*_keys, now],
+            ).fetchall()
+            for key, value, expires_at in rows:
+                output[key] = (value, expires_at)
+        return output
+
+    def put_many(self, items: Dict[Text, Tuple[Text, float]]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                + "VALUES (?, ?, ?)",
+                [
+                    (key, value, expires_at)
+                    for key, (value, expires_at) in items.items()
+                ],
+            )
+
+    def purge_expired(self) -> int:
+        with self.conn:
+            cursor = self.conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,6 @@
+import unicodedata
+from typing import Text
+
+
+def normalize_text(text: Text) -> Text:
+    return " ".join(unicodedata.normalize("NFC", text).split())
@@ -1,9 +1,20 @@
 set -e
 
-sanic app.main:app \
-    --host=0.0.0.0 \
-    --port=80 \
-    --workers=4 \
-    --reload \
-    --reload-dir=./app \
-    --dev
+# Reloading single-app server for development, mount the code and set APP_ENV
+if [ "${APP_ENV:-production}" = "development" ]; then
+    # The numpy datastore lives in the worker process, it only runs one
+    workers=4
+    if [ "$(echo "${DATASTORE:-qdrant}" | tr '[:upper:]' '[:lower:]')" = "numpy" ]; then
+        workers=1
+    fi
+    exec sanic app.main:app \
+        --host=0.0.0.0 \
+        --port=80 \
+        --workers=$workers \
+        --reload \
+        --reload-dir=./app \
+        --dev
+fi
+
+# Production: one forked worker per CPU, or one for DATASTORE=numpy, see `app/__main__.py`
+exec python -m app
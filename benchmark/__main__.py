@@ -0,0 +1,535 @@
+"""Benchmark the service against local fakes.
+
+    python -m benchmark run --workloads query,upsert,mixed --concurrency 16
+    python -m benchmark compare benchmark/results/a.json benchmark/results/b.json
+    python -m benchmark startup --entry app --workers 4 --repeat 3
+
+`run` starts a fake OpenAI embedding API and a fake MediaWiki API in this
+process, the app itself with `sanic` in a subprocess (numpy store by default,
+or a local Qdrant), seeds a synthetic corpus and drives every workload at a
+fixed concurrency. Latency percentiles, throughput, the background wiki-task
+backlog and the service `/stats` are written to one JSON file per run.
+`startup` measures the cold start of the `sanic` CLI or of `python -m app`,
+from launch to the first answered health check and the first served query,
+and the memory of the main process and every worker once the query is served
+(RSS, and on Linux PSS, which splits pages shared copy-on-write between the
+processes sharing them).
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+sys.path.insert(0, APP_DIR)
+
+import aiohttp  # noqa: E402
+
+from benchmark.fakes import FakeMediaWiki, FakeOpenAI  # noqa: E402
+from benchmark.load import (  # noqa: E402
+    LoadGenerator,
+    Workload,
+    make_documents,
+    make_queries,
+    summarize,
+)
+
+WORKLOADS = dict(
+    query=dict(query_ratio=1.0),
+    upsert=dict(query_ratio=0.0),
+    mixed=dict(query_ratio=0.9),
+    hybrid=dict(query_ratio=1.0, mode="hybrid"),
+    batch=dict(query_ratio=1.0, queries_per_call=20),
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Run workloads and write a result file.")
+    run.add_argument("--name", default="bench", help="Prefix of the result file.")
+    run.add_argument(
+        "--workloads",
+        default="query,upsert,mixed",
+        help=f"Comma separated, of {', '.join(WORKLOADS)}.",
+    )
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--duration", type=float, default=10.0, help="Seconds.")
+    run.add_argument("--warmup", type=float, default=2.0, help="Seconds.")
+    run.add_argument("--corpus-size", type=int, default=2000)
+    run.add_argument("--query-pool", type=int, default=500)
+    run.add_argument("--top-k", type=int, default=5)
+    run.add_argument("--upsert-batch-size", type=int, default=16)
+    run.add_argument("--workers", type=int, default=1, help="Sanic workers.")
+    run.add_argument("--datastore", default="numpy", choices=["numpy", "qdrant"])
+    run.add_argument("--qdrant-host", default="127.0.0.1")
+    run.add_argument("--qdrant-port", type=int, default=6333)
+    run.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    run.add_argument("--embedding-jitter-ms", type=float, default=10.0)
+    run.add_argument(
+        "--embedding-rate-limit",
+        type=int,
+        default=0,
+        help="Embedding requests per second before the fake answers 429.",
+    )
+    run.add_argument("--wiki-latency-ms", type=float, default=80.0)
+    run.add_argument("--wiki-jitter-ms", type=float, default=20.0)
+    run.add_argument("--drain-timeout", type=float, default=30.0)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra environment of the app, repeatable.",
+    )
+    run.add_argument("--output-dir", default=os.path.join(ROOT, "benchmark", "results"))
+
+    compare = subparsers.add_parser("compare", help="Compare two result files.")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+
+    startup = subparsers.add_parser("startup", help="Measure cold starts.")
+    startup.add_argument("--name", default="startup", help="Prefix of the result file.")
+    startup.add_argument(
+        "--entry",
+        default="app",
+        choices=["cli", "app"],
+        help="`sanic app.main:app` or the production `python -m app`.",
+    )
+    startup.add_argument("--workers", type=int, default=1, help="Sanic workers.")
+    startup.add_argument("--repeat", type=int, default=3)
+    startup.add_argument(
+        "--settle",
+        type=float,
+        default=2.0,
+        help="Seconds after the first query before memory is sampled.",
+    )
+    startup.add_argument("--datastore", default="numpy", choices=["numpy", "qdrant"])
+    startup.add_argument("--qdrant-host", default="127.0.0.1")
+    startup.add_argument("--qdrant-port", type=int, default=6333)
+    startup.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra environment of the app, repeatable.",
+    )
+    startup.add_argument(
+        "--output-dir", default=os.path.join(ROOT, "benchmark", "results")
+    )
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision() -> Optional[Text]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def app_env(
+    args: argparse.Namespace, openai_port: int, wiki_port: int
+) -> Dict[Text, Text]:
+    env = dict(
+        DATA_DIR=tempfile.mkdtemp(prefix="wiki-retrieval-bench-"),
+        DATASTORE=args.datastore,
+        QDRANT_URL=args.qdrant_host,
+        QDRANT_PORT=str(args.qdrant_port),
+        QDRANT_COLLECTION=f"bench_{int(time.time())}",
+        EMBEDDING_PROVIDER="openai",
+        OPENAI_API_KEY="sk-benchmark",
+        OPENAI_API_BASE=f"http://127.0.0.1:{openai_port}/v1",
+        WIKI_API_URL=f"http://127.0.0.1:{wiki_port}/{{lang}}/w/api.php",
+    )
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def process_memory(pid: int) -> Dict[Text, float]:
+    """RSS and PSS of a process in MiB, read from `/proc` (Linux only)."""
+
+    memory: Dict[Text, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    memory[key.lower() + "_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+
+class Server:
+    """The app under test, run in a subprocess by the `sanic` CLI or by the
+    production entry point `python -m app`."""
+
+    def __init__(self, env: Dict[Text, Text], workers: int = 1, entry: Text = "cli"):
+        self.port = free_port()
+        self.env = env
+        self.workers = workers
+        self.entry = entry
+        self.process: Optional[subprocess.Popen] = None
+        self.log_path = os.path.join(env["DATA_DIR"], "server.log")
+        self.launched_at = 0.0
+        self.ready_seconds: Optional[float] = None
+
+    @property
+    def url(self) -> Text:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self, timeout: float = 60.0) -> None:
+        env = dict(os.environ, **self.env)
+        if self.entry == "app":
+            command = [sys.executable, "-m", "app"]
+            env.update(HOST="127.0.0.1", PORT=str(self.port), WORKERS=str(self.workers))
+        else:
+            command = [
+                sys.executable,
+                "-m",
+                "sanic",
+                "app.main:app",
+                "--host=127.0.0.1",
+                f"--port={self.port}",
+                f"--workers={self.workers}",
+                "--no-access-logs",
+            ]
+        self.launched_at = time.monotonic()
+        with open(self.log_path, "w") as log:
+            self.process = subprocess.Popen(
+                command, cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+
+        deadline = time.monotonic() + timeout
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    break
+                try:
+                    async with session.get(self.url + "/") as res:
+                        if res.status == 200:
+                            self.ready_seconds = time.monotonic() - self.launched_at
+                            return
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.05)
+        raise RuntimeError(f"Server did not start, see {self.log_path}.")
+
+    def memory(self) -> Dict[Text, Any]:
+        """Memory of the main process and of each of its workers."""
+
+        if self.process is None:
+            return {}
+        # Sanic forks helpers besides the workers, its log names the workers
+        with open(self.log_path) as f:
+            pids = re.findall(r"Starting worker \[(\d+)\]", f.read())
+        workers = [process_memory(int(pid)) for pid in dict.fromkeys(pids)]
+        return dict(main=process_memory(self.process.pid), workers=workers)
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class StatsPoller:
+    """Sample `/stats` to follow the backlog of background wiki tasks.
+
+    With several workers each sample only sees the worker that answered it.
+    """
+
+    def __init__(self, url: Text, interval: float = 0.5):
+        self.url = url
+        self.interval = interval
+        self.samples: List[Dict[Text, Any]] = []
+        self.last: Dict[Text, Any] = {}
+
+    async def fetch(self, session: aiohttp.ClientSession) -> Dict[Text, Any]:
+        async with session.get(self.url + "/stats") as res:
+            self.last = await res.json()
+        return self.last
+
+    def backlog(self, stats: Dict[Text, Any]) -> int:
+        return int((stats.get("background_tasks") or {}).get("wiki", 0))
+
+    async def poll(self, started_at: float) -> None:
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    stats = await self.fetch(session)
+                    self.samples.append(
+                        dict(
+                            t=round(time.monotonic() - started_at, 2),
+                            wiki_backlog=self.backlog(stats),
+                        )
+                    )
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(self.interval)
+
+    async def drain(self, timeout: float) -> Optional[float]:
+        """Seconds until the wiki backlog is empty, None on timeout."""
+
+        started_at = time.monotonic()
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() - started_at < timeout:
+                if self.backlog(await self.fetch(session)) == 0:
+                    return round(time.monotonic() - started_at, 2)
+                await asyncio.sleep(self.interval)
+        return None
+
+
+async def seed_corpus(url: Text, size: int, seed: int) -> Dict[Text, Any]:
+    documents = make_documents(size, seed=seed)
+    started_at = time.monotonic()
+    async with aiohttp.ClientSession() as session:
+        for i in range(0, len(documents), 256):
+            async with session.post(
+                url + "/upsert", json=dict(documents=documents[i : i + 256])
+            ) as res:
+                res.raise_for_status()
+    elapsed = time.monotonic() - started_at
+    return dict(
+        documents=size,
+        elapsed=round(elapsed, 3),
+        documents_per_sec=round(size / elapsed, 2) if elapsed else 0.0,
+    )
+
+
+async def run(args: argparse.Namespace) -> Dict[Text, Any]:
+    names = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        raise ValueError(f"Unknown workloads: {', '.join(unknown)}.")
+
+    fake_openai = FakeOpenAI(
+        latency_ms=args.embedding_latency_ms,
+        jitter_ms=args.embedding_jitter_ms,
+        rate_limit=args.embedding_rate_limit,
+        seed=args.seed,
+    )
+    fake_wiki = FakeMediaWiki(
+        latency_ms=args.wiki_latency_ms, jitter_ms=args.wiki_jitter_ms, seed=args.seed
+    )
+    openai_port = await fake_openai.start()
+    wiki_port = await fake_wiki.start()
+
+    env = app_env(args, openai_port, wiki_port)
+    server = Server(env=env, workers=args.workers)
+    poller = StatsPoller(server.url)
+    started_at = time.monotonic()
+    result: Dict[Text, Any] = dict(
+        meta=dict(
+            name=args.name,
+            created_at=datetime.datetime.utcnow().isoformat(),
+            git_revision=git_revision(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            cpu_count=os.cpu_count(),
+            args=vars(args),
+            env={k: v for k, v in env.items() if k != "OPENAI_API_KEY"},
+        ),
+        workloads={},
+    )
+    polling: Optional["asyncio.Task"] = None
+    try:
+        await server.start()
+        result["seed"] = await seed_corpus(server.url, args.corpus_size, args.seed)
+        polling = asyncio.create_task(poller.poll(started_at))
+
+        queries = make_queries(args.query_pool, seed=args.seed)
+        generator = LoadGenerator(server.url, seed=args.seed)
+        for i, name in enumerate(names):
+            workload = Workload(
+                name=name,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                warmup=args.warmup,
+                top_k=args.top_k,
+                upsert_batch_size=args.upsert_batch_size,
+                **WORKLOADS[name],
+            )
+            print(f"Running workload '{name}' for {args.duration}s ...", flush=True)
+            samples, duration = await generator.run(
+                workload, queries, documents_seed=args.seed + i + 1
+            )
+            result["workloads"][name] = summarize(samples, duration)
+
+        polling.cancel()
+        result["wiki_backlog"] = dict(
+            max=max((s["wiki_backlog"] for s in poller.samples), default=0),
+            drain_seconds=await poller.drain(args.drain_timeout),
+            samples=poller.samples,
+        )
+        result["server_stats"] = poller.last
+    finally:
+        if polling is not None:
+            polling.cancel()
+        server.stop()
+        await fake_openai.stop()
+        await fake_wiki.stop()
+
+    result["fakes"] = dict(openai=fake_openai.stats(), wiki=fake_wiki.stats())
+    result["server_log"] = server.log_path
+    return result
+
+
+async def startup(args: argparse.Namespace) -> Dict[Text, Any]:
+    fake_openai = FakeOpenAI()
+    fake_wiki = FakeMediaWiki()
+    openai_port = await fake_openai.start()
+    wiki_port = await fake_wiki.start()
+
+    runs: List[Dict[Text, Any]] = []
+    env: Dict[Text, Text] = {}
+    try:
+        for i in range(args.repeat):
+            env = app_env(args, openai_port, wiki_port)
+            server = Server(env=env, workers=args.workers, entry=args.entry)
+            try:
+                await server.start()
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(
+                        server.url + "/query",
+                        json=dict(queries=[dict(query="cold start", top_k=3)]),
+                    ) as res:
+                        res.raise_for_status()
+                first_query_seconds = time.monotonic() - server.launched_at
+                # Let the background wiki refresh of the query detect its language
+                await asyncio.sleep(args.settle)
+                memory = server.memory()
+            finally:
+                server.stop()
+            runs.append(
+                dict(
+                    ready_seconds=round(server.ready_seconds, 3),
+                    first_query_seconds=round(first_query_seconds, 3),
+                    memory=memory,
+                )
+            )
+            print(f"Run {i + 1}: {runs[-1]}", flush=True)
+    finally:
+        await fake_openai.stop()
+        await fake_wiki.stop()
+
+    median = dict(
+        ready_seconds=statistics.median(r["ready_seconds"] for r in runs),
+        first_query_seconds=statistics.median(r["first_query_seconds"] for r in runs),
+    )
+    workers = [worker for r in runs for worker in r["memory"].get("workers", [])]
+    for key in ("rss_mb", "pss_mb"):
+        if workers and all(key in worker for worker in workers):
+            median[f"worker_{key}"] = statistics.median(w[key] for w in workers)
+
+    return dict(
+        meta=dict(
+            name=args.name,
+            created_at=datetime.datetime.utcnow().isoformat(),
+            git_revision=git_revision(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            cpu_count=os.cpu_count(),
+            args=vars(args),
+            env={k: v for k, v in env.items() if k != "OPENAI_API_KEY"},
+        ),
+        runs=runs,
+        median=median,
+    )
+
+
+def print_summary(result: Dict[Text, Any]) -> None:
+    print(f"{'workload':<10}{'op':<8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, ops in result["workloads"].items():
+        for op, stats in ops.items():
+            latency = stats["latency_ms"]
+            print(
+                f"{name:<10}{op:<8}{stats['throughput_rps']:>10}"
+                + f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}"
+            )
+    backlog = result.get("wiki_backlog", {})
+    print(
+        f"wiki backlog max {backlog.get('max')}, "
+        + f"drained in {backlog.get('drain_seconds')}s"
+    )
+
+
+def compare(baseline_path: Text, candidate_path: Text) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    print(
+        f"{'workload/op':<20}{'metric':<16}"
+        + f"{'baseline':>12}{'candidate':>12}{'change':>10}"
+    )
+    for name, ops in candidate["workloads"].items():
+        for op, stats in ops.items():
+            base = baseline.get("workloads", {}).get(name, {}).get(op)
+            if base is None:
+                continue
+            metrics = [
+                ("throughput_rps", base["throughput_rps"], stats["throughput_rps"])
+            ]
+            metrics += [
+                (f"{q} ms", base["latency_ms"][q], stats["latency_ms"][q])
+                for q in ("p50", "p95", "p99")
+            ]
+            for metric, before, after in metrics:
+                change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+                print(
+                    f"{name + '/' + op:<20}{metric:<16}"
+                    + f"{before:>12}{after:>12}{change:>10}"
+                )
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "compare":
+        compare(args.baseline, args.candidate)
+        return
+
+    if args.command == "startup":
+        result = asyncio.run(startup(args))
+        print(f"Median: {result['median']}")
+    else:
+        result = asyncio.run(run(args))
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(args.output_dir, f"{args.name}-{timestamp}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    if args.command == "run":
+        print_summary(result)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
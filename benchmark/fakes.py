@@ -0,0 +1,150 @@
+"""Local stand-ins for the external services the app talks to.
+
+`FakeOpenAI` answers `POST /v1/embeddings` like the OpenAI API with
+deterministic feature-hashing vectors, so similar texts still score high.
+`FakeMediaWiki` answers the `api.php` calls of `WikiClient` with synthetic
+search hits and extracts. Both add a configurable latency and count calls.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Dict, Optional, Text
+
+from aiohttp import web
+
+from app.embedding.local import HashingEmbeddingProvider
+
+
+class _FakeService:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.port: Optional[int] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def sleep(self) -> None:
+        delay = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def app(self) -> web.Application:
+        raise NotImplementedError
+
+    async def start(self, host: Text = "127.0.0.1", port: int = 0) -> int:
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self.port
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def stats(self) -> Dict[Text, Any]:
+        return dict(requests=self.requests)
+
+
+class FakeOpenAI(_FakeService):
+    def __init__(self, dimension: int = 1536, rate_limit: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.encoder = HashingEmbeddingProvider(dimension=dimension)
+        self.texts = 0
+        # Requests per second before answering 429, 0 is unlimited
+        self.rate_limit = rate_limit
+        self.rate_limited = 0
+        self._window = (0, 0)
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/embeddings", self.embeddings)
+        return app
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        texts = body["input"]
+        texts = [texts] if isinstance(texts, str) else texts
+        self.requests += 1
+        if self.rate_limit:
+            now = time.monotonic()
+            second, count = self._window
+            if int(now) != second:
+                second, count = int(now), 0
+            self._window = (second, count + 1)
+            if count >= self.rate_limit:
+                self.rate_limited += 1
+                reset_ms = max(int((second + 1 - now) * 1000), 1)
+                return web.json_response(
+                    dict(
+                        error=dict(
+                            message="Rate limit reached for requests",
+                            type="requests",
+                            code="rate_limit_exceeded",
+                        )
+                    ),
+                    status=429,
+                    headers={"x-ratelimit-reset-requests": f"{reset_ms}ms"},
+                )
+        self.texts += len(texts)
+        await self.sleep()
+        vectors = self.encoder.encode(texts)
+        return web.json_response(
+            dict(
+                object="list",
+                model=body.get("model"),
+                data=[
+                    dict(object="embedding", index=i, embedding=vector.tolist())
+                    for i, vector in enumerate(vectors)
+                ],
+                usage=dict(
+                    prompt_tokens=sum(len(t.split()) for t in texts),
+                    total_tokens=sum(len(t.split()) for t in texts),
+                ),
+            )
+        )
+
+    def stats(self) -> Dict[Text, Any]:
+        return dict(
+            requests=self.requests, texts=self.texts, rate_limited=self.rate_limited
+        )
+
+
+class FakeMediaWiki(_FakeService):
+    languages = ("en", "de", "es", "fr", "it", "ja", "nl", "pl", "pt", "ru", "sv", "zh")
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/{lang}/w/api.php", self.api)
+        return app
+
+    async def api(self, request: web.Request) -> web.Response:
+        params = request.query
+        self.requests += 1
+        await self.sleep()
+
+        if params.get("meta") == "siteinfo":
+            languages = [dict(code=code) for code in self.languages]
+            return web.json_response(dict(query=dict(languages=languages)))
+
+        if params.get("list") == "search":
+            query = params["srsearch"]
+            limit = int(params.get("srlimit", 5))
+            hits = [dict(title=f"{query} ({i})") for i in range(limit)]
+            return web.json_response(dict(query=dict(search=hits)))
+
+        if params.get("prop") == "extracts":
+            pages = [
+                dict(
+                    title=title,
+                    extract=f"{title} is a synthetic article. "
+                    + f"It is about {title.rsplit(' (', 1)[0]} and nothing else.",
+                )
+                for title in params["titles"].split("|")
+            ]
+            return web.json_response(dict(query=dict(normalized=[], pages=pages)))
+
+        return web.json_response(dict(error=dict(code="badvalue")))
@@ -0,0 +1,181 @@
+"""Closed-loop load generator and synthetic corpus for the benchmark."""
+
+import asyncio
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple
+
+import aiohttp
+import numpy as np
+
+WORDS = (
+    "river mountain galaxy protein violin empire harbor glacier algorithm "
+    + "cathedral volcano orchestra desert satellite bacteria monsoon theorem "
+    + "railway pyramid coral comet parliament telescope enzyme tundra sonata "
+    + "dynasty lighthouse reactor savanna manuscript canyon festival circuit"
+).split()
+
+
+def make_documents(n: int, seed: int = 0, words_per_doc: int = 60) -> List[Dict]:
+    rng = random.Random(seed)
+    return [
+        dict(
+            # Qdrant only takes unsigned integers and UUIDs as point ids
+            id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"bench:{seed}:{i}")),
+            text=" ".join(rng.choice(WORDS) for _ in range(words_per_doc)),
+            metadata=dict(title=f"Bench {i}", source="benchmark"),
+        )
+        for i in range(n)
+    ]
+
+
+def make_queries(n: int, seed: int = 0) -> List[Text]:
+    rng = random.Random(seed + 1)
+    return [" ".join(rng.sample(WORDS, rng.randint(1, 4))) for _ in range(n)]
+
+
+@dataclass
+class Sample:
+    op: Text
+    latency: float
+    status: int
+    started_at: float
+
+
+@dataclass
+class Workload:
+    name: Text
+    query_ratio: float = 1.0  # The rest are upserts
+    concurrency: int = 8
+    duration: float = 10.0
+    warmup: float = 1.0
+    queries_per_call: int = 1
+    top_k: int = 5
+    upsert_batch_size: int = 16
+    mode: Optional[Text] = None
+    extra_body: Dict[Text, Any] = field(default_factory=dict)
+
+
+def summarize(samples: Sequence[Sample], duration: float) -> Dict[Text, Any]:
+    output: Dict[Text, Any] = {}
+    for op in sorted({sample.op for sample in samples}):
+        _samples = [sample for sample in samples if sample.op == op]
+        latencies = np.asarray([sample.latency for sample in _samples]) * 1000
+        errors = sum(1 for sample in _samples if not 200 <= sample.status < 300)
+        status_counts: Dict[Text, int] = {}
+        for sample in _samples:
+            status_counts[str(sample.status)] = (
+                status_counts.get(str(sample.status), 0) + 1
+            )
+        output[op] = dict(
+            requests=len(_samples),
+            errors=errors,
+            throughput_rps=round(len(_samples) / duration, 2) if duration else 0.0,
+            latency_ms=dict(
+                mean=round(float(latencies.mean()), 3),
+                p50=round(float(np.percentile(latencies, 50)), 3),
+                p95=round(float(np.percentile(latencies, 95)), 3),
+                p99=round(float(np.percentile(latencies, 99)), 3),
+                max=round(float(latencies.max()), 3),
+            ),
+            status_counts=status_counts,
+        )
+    return output
+
+
+class LoadGenerator:
+    """Run a workload with a fixed number of concurrent closed-loop clients.
+
+    Each client sends its next request as soon as the previous one returns.
+    Samples from the warmup period are dropped.
+    """
+
+    def __init__(self, base_url: Text, seed: int = 0, timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self.seed = seed
+        self.timeout = timeout
+
+    async def run(
+        self, workload: Workload, queries: Sequence[Text], documents_seed: int
+    ) -> Tuple[List[Sample], float]:
+        connector = aiohttp.TCPConnector(limit=workload.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=timeout
+        ) as session:
+            started_at = time.monotonic()
+            measure_from = started_at + workload.warmup
+            deadline = measure_from + workload.duration
+            results = await asyncio.gather(
+                *[
+                    self._client(
+                        session,
+                        workload,
+                        queries,
+                        random.Random(self.seed * 1000 + i),
+                        deadline,
+                        documents_seed=documents_seed * 1000 + i,
+                    )
+                    for i in range(workload.concurrency)
+                ]
+            )
+        samples = [
+            sample
+            for _samples in results
+            for sample in _samples
+            if sample.started_at >= measure_from
+        ]
+        return samples, workload.duration
+
+    async def _client(
+        self,
+        session: aiohttp.ClientSession,
+        workload: Workload,
+        queries: Sequence[Text],
+        rng: random.Random,
+        deadline: float,
+        documents_seed: int,
+    ) -> List[Sample]:
+        samples: List[Sample] = []
+        n_upserts = 0
+        while time.monotonic() < deadline:
+            if rng.random() < workload.query_ratio:
+                op, path = "query", "/query"
+                body = dict(
+                    queries=[
+                        dict(query=rng.choice(queries), top_k=workload.top_k)
+                        for _ in range(workload.queries_per_call)
+                    ],
+                    **workload.extra_body,
+                )
+                if workload.mode:
+                    for query in body["queries"]:
+                        query["mode"] = workload.mode
+            else:
+                op, path = "upsert", "/upsert"
+                n_upserts += 1
+                body = dict(
+                    documents=make_documents(
+                        workload.upsert_batch_size,
+                        seed=documents_seed * 100000 + n_upserts,
+                    )
+                )
+
+            started_at = time.monotonic()
+            try:
+                async with session.post(self.base_url + path, json=body) as res:
+                    await res.read()
+                    status = res.status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = 0
+            samples.append(
+                Sample(
+                    op=op,
+                    latency=time.monotonic() - started_at,
+                    status=status,
+                    started_at=started_at,
+                )
+            )
+        return samples
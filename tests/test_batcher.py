@@ -0,0 +1,81 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app.embedding.batcher import EmbeddingBatcher
+
+
+class FakeEmbedder:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls: List[List[str]] = []
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_calls_share_a_batch():
+    embedder = FakeEmbedder()
+
+    async def main():
+        batcher = EmbeddingBatcher(embedder.embed, max_wait=0.01)
+        return batcher, await asyncio.gather(
+            batcher.embed(["a", "bb"]), batcher.embed(["ccc"]), batcher.embed(["a"])
+        )
+
+    batcher, results = asyncio.run(main())
+    assert results == [[[1.0], [2.0]], [[3.0]], [[1.0]]]
+    # Duplicated texts are embedded once
+    assert embedder.calls == [["a", "bb", "ccc"]]
+    assert batcher.stats()["batches"] == 1
+
+
+def test_full_batch_flushes_without_waiting():
+    embedder = FakeEmbedder()
+
+    async def main():
+        batcher = EmbeddingBatcher(embedder.embed, max_wait=60, max_batch_size=2)
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.embed(["a"]), batcher.embed(["b", "c", "d"])), 1
+        )
+
+    results = asyncio.run(main())
+    assert results == [[[1.0]], [[1.0], [1.0], [1.0]]]
+    assert embedder.calls == [["a", "b"], ["c", "d"]]
+
+
+def test_failure_reaches_every_caller():
+    embedder = FakeEmbedder(fail=True)
+
+    async def main():
+        batcher = EmbeddingBatcher(embedder.embed, max_wait=0.01)
+        results = await asyncio.gather(
+            batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True
+        )
+        return batcher, results
+
+    batcher, results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert batcher.failures == 1
+
+
+def test_wrong_number_of_embeddings():
+    async def embed(texts):
+        return [[0.0]]
+
+    async def main():
+        return await EmbeddingBatcher(embed, max_wait=0).embed(["a", "b"])
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+
+
+def test_empty_input():
+    embedder = FakeEmbedder()
+    assert asyncio.run(EmbeddingBatcher(embedder.embed).embed([])) == []
+    assert embedder.calls == []
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from app.document_store.numpy_store import NumpyDocumentStore
+from app.embedding.embedder import Embedder
+from app.embedding.local import HashingEmbeddingProvider
+from app.service.bulk import BulkUpsert, iter_lines
+from app.service.ingestion import IngestionService
+
+
+async def aiter(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def lines_of(chunks, max_line_bytes=None):
+    async def main():
+        return [line async for line in iter_lines(aiter(chunks), max_line_bytes)]
+
+    return asyncio.run(main())
+
+
+def test_lines_split_across_chunks():
+    assert lines_of([b'{"a"', b": 1}\n\n{", b'"b": 2}']) == [
+        (1, b'{"a": 1}'),
+        (2, b""),
+        (3, b'{"b": 2}'),
+    ]
+
+
+def test_oversized_lines_resync_at_next_newline():
+    chunks = [b"ok\n" + b"x" * 6, b"x" * 6, b"xx\nfine\n", b"y" * 20]
+    assert lines_of(chunks, max_line_bytes=8) == [
+        (1, b"ok"),
+        (2, None),
+        (3, b"fine"),
+        (4, None),
+    ]
+
+
+def doc_line(title):
+    return json.dumps(dict(text=f"Text of {title}.", metadata=dict(title=title)))
+
+
+def run_bulk(body, **kwargs):
+    async def main():
+        provider = HashingEmbeddingProvider()
+        store = NumpyDocumentStore(vector_size=provider.dimension)
+        bulk = BulkUpsert(
+            ingestion_service=IngestionService(
+                embedder=Embedder(provider=provider), document_store=store
+            ),
+            **kwargs,
+        )
+        acks = []
+
+        async def send(ack):
+            acks.append(ack)
+
+        summary = await bulk.run(aiter([body]), send=send)
+        return store, acks, summary
+
+    return asyncio.run(main())
+
+
+def test_acks_batches_in_order_with_invalid_lines():
+    body = "\n".join(
+        [doc_line("A"), "not json", doc_line("B"), "", doc_line("C"), "x" * 100]
+    ).encode("utf-8")
+    store, acks, summary = run_bulk(body, batch_size=2, max_line_bytes=64)
+
+    assert [(ack["batch"], ack["lines"], ack["documents"]) for ack in acks] == [
+        (1, [1, 2], 1),
+        (2, [3, 5], 2),
+        (3, [6, 6], 0),
+    ]
+    assert [error["line"] for error in acks[0]["invalid"]] == [2]
+    assert "exceeds 64 bytes" in acks[2]["invalid"][0]["error"]
+    assert len(acks[1]["ids"]) == 2
+    assert summary == dict(batches=3, documents=3, written=3, failed=0, invalid=2)
+    assert len(store) == 3
@@ -0,0 +1,92 @@
+from app.schema.models import Document, DocumentWithScore, QueryResult
+from app.service.chunker import (
+    DocumentChunker,
+    RegexTokenizer,
+    chunk_id,
+    collapse_results,
+    parent_id,
+)
+
+
+def make_chunker(**kwargs) -> DocumentChunker:
+    chunker = DocumentChunker(**kwargs)
+    # Keep the tests offline, tiktoken may need to download its encoding
+    chunker._tokenizer = RegexTokenizer()
+    return chunker
+
+
+def test_short_document_keeps_its_id():
+    chunker = make_chunker(chunk_token_size=10)
+    chunks = chunker.chunk([Document(id="doc", text="just a few words")])
+    assert len(chunks) == 1
+    assert chunks[0].id == "doc"
+    assert chunks[0].text == "just a few words"
+    assert chunks[0].metadata == dict(parent_id="doc", chunk_index=0)
+
+
+def test_long_document_overlapping_windows():
+    chunker = make_chunker(chunk_token_size=4, overlap=1)
+    text = " ".join(f"w{i}" for i in range(10))
+    doc = Document(id="doc", text=text, metadata=dict(source="wiki"))
+    chunks = chunker.chunk([doc])
+
+    assert [chunk.text for chunk in chunks] == [
+        "w0 w1 w2 w3",
+        "w3 w4 w5 w6",
+        "w6 w7 w8 w9",
+    ]
+    assert [chunk.id for chunk in chunks] == [
+        "doc",
+        chunk_id("doc", 1),
+        chunk_id("doc", 2),
+    ]
+    for i, chunk in enumerate(chunks):
+        assert chunk.metadata == dict(source="wiki", parent_id="doc", chunk_index=i)
+        assert parent_id(chunk) == "doc"
+
+
+def test_overlap_is_clamped():
+    assert make_chunker(chunk_token_size=4, overlap=10).overlap == 2
+    assert make_chunker(chunk_token_size=4, overlap=-1).overlap == 0
+
+
+def test_cjk_characters_count_as_tokens():
+    chunker = make_chunker(chunk_token_size=3, overlap=0)
+    assert chunker.split("維基百科全書") == ["維基百", "科全書"]
+
+
+def test_chunking_disabled():
+    chunker = make_chunker(chunk_token_size=0)
+    text = " ".join("word" for _ in range(1000))
+    assert chunker.split(text) == [text]
+    # Per call too, whatever the default
+    chunker = make_chunker(chunk_token_size=4)
+    assert chunker.split(text, chunk_token_size=0) == [text]
+    assert len(chunker.split(text, chunk_token_size=None)) > 1
+
+
+def test_chunk_ids_are_stable():
+    assert chunk_id("doc", 1) == chunk_id("doc", 1)
+    assert chunk_id("doc", 1) != chunk_id("doc", 2)
+
+
+def test_collapse_results():
+    def hit(_id, score, parent=None):
+        metadata = dict(parent_id=parent) if parent else {}
+        return DocumentWithScore(
+            id=_id, text=_id, metadata=metadata, embedding=None, score=score
+        )
+
+    result = QueryResult(
+        query="q",
+        results=[
+            hit("a1", 0.5, "a"),
+            hit("a", 0.9, "a"),
+            hit("b", 0.7),
+            hit("c1", 0.6, "c"),
+        ],
+    )
+    collapsed = collapse_results(result, top_k=2)
+    assert [doc.id for doc in collapsed.results] == ["a", "b"]
+    collapsed = collapse_results(result, top_k=10)
+    assert [doc.id for doc in collapsed.results] == ["a", "b", "c1"]
@@ -0,0 +1,100 @@
+import asyncio
+import bz2
+import json
+
+from app.document_store.numpy_store import NumpyDocumentStore
+from app.embedding.embedder import Embedder
+from app.embedding.local import HashingEmbeddingProvider
+from app.ingest.dump import clean_wikitext, iter_xml_dump, parse_page
+from app.ingest.pipeline import Checkpoint, DumpIngestor
+from app.schema.models import document_id
+
+XML_DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <page>
+    <title>Python</title><ns>0</ns><id>1</id>
+    <revision><id>10</id><text>'''Python''' is a [[programming language|language]].</text></revision>
+  </page>
+  <page>
+    <title>Py</title><ns>0</ns><id>2</id><redirect title="Python" />
+    <revision><id>20</id><text>#REDIRECT [[Python]]</text></revision>
+  </page>
+  <page>
+    <title>Talk:Python</title><ns>1</ns><id>3</id>
+    <revision><id>30</id><text>Discussion.</text></revision>
+  </page>
+</mediawiki>
+"""
+
+
+def test_clean_wikitext():
+    text = (
+        "{{Infobox|name={{nested}}}}'''Python''' is a [[language]]<ref>cite</ref> "
+        + "made by [[Guido van Rossum|Guido]].<!-- note -->\n"
+        + "[[File:Logo.png|thumb|A [[logo]]]]\n"
+        + "* See [https://python.org the site]\n"
+        + "== History ==\nStarted in 1989.\n"
+    )
+    assert clean_wikitext(text) == (
+        "Python is a language made by Guido.\n\nSee the site"
+    )
+    assert clean_wikitext(text, intro_only=False).endswith(
+        "See the site\n\nHistory\n\nStarted in 1989."
+    )
+
+
+def test_iter_xml_dump_skips_redirects_and_other_namespaces(tmp_path):
+    path = tmp_path / "dump.xml.bz2"
+    path.write_bytes(bz2.compress(XML_DUMP.encode("utf-8")))
+    pages = list(iter_xml_dump(str(path)))
+    assert [page["title"] for page in pages] == ["Python"]
+    assert pages[0]["id"] == "1"
+    assert parse_page(pages[0]) == dict(title="Python", text="Python is a language.")
+
+
+def test_parse_jsonl_page():
+    page = dict(title="A", text="Lead paragraph.\n\nMore text.")
+    assert parse_page(page, fmt="jsonl")["text"] == "Lead paragraph."
+    assert parse_page(page, fmt="jsonl", intro_only=False)["text"] == page["text"]
+    assert parse_page(dict(title="B", text="  "), fmt="jsonl") is None
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    Checkpoint(source="/dump.xml", offset=42, vectors=40).save(path)
+    checkpoint = Checkpoint.load(path, "/dump.xml")
+    assert (checkpoint.offset, checkpoint.vectors) == (42, 40)
+    # A checkpoint of another source is ignored
+    assert Checkpoint.load(path, "/other.xml").offset == 0
+
+
+def test_ingest_resumes_from_checkpoint(tmp_path):
+    path = tmp_path / "pages.jsonl"
+    path.write_text(
+        "\n".join(
+            json.dumps(dict(title=f"Page {i}", text=f"Text of page {i}."))
+            for i in range(10)
+        )
+    )
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    async def main():
+        provider = HashingEmbeddingProvider()
+        store = NumpyDocumentStore(vector_size=provider.dimension)
+        ingestor = DumpIngestor(
+            embedder=Embedder(provider=provider),
+            document_store=store,
+            fmt="jsonl",
+            batch_size=3,
+            parse_workers=1,
+            checkpoint_path=checkpoint_path,
+        )
+        first = await ingestor.run(str(path), max_pages=4)
+        offset = Checkpoint.load(checkpoint_path, str(path)).offset
+        second = await ingestor.run(str(path))
+        return store, first, offset, second
+
+    store, first, offset, second = asyncio.run(main())
+    assert (first.pages, offset) == (4, 4)
+    assert (second.pages, second.vectors) == (6, 6)
+    assert len(store) == 10
+    assert document_id(source="wiki", lang="en", title="Page 9") in store._id_to_row
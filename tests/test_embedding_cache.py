@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from app.embedding.cache import EmbeddingCache, embedding_key
+from app.utils.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache: LRUCache[int] = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert [cache.get("a"), cache.get("c")] == [1, 3]
+    assert cache.evictions == 1
+
+
+def test_lru_bounded_by_bytes():
+    cache: LRUCache[str] = LRUCache(max_bytes=10)
+    cache.put("a", "a", size=6)
+    cache.put("b", "b", size=6)
+    assert "a" not in cache
+    assert cache.bytes == 6
+    # Larger than the whole cache, never stored
+    cache.put("c", "c", size=11)
+    assert "c" not in cache
+    assert cache.bytes == 6
+
+
+def test_lru_expires_entries():
+    cache: LRUCache[int] = LRUCache(ttl=0.01)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=60)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.expirations == 1
+
+
+def test_key_normalizes_text_and_includes_model():
+    assert embedding_key("m", "hello") == embedding_key("m", "hello")
+    assert embedding_key("m", "hello") != embedding_key("other", "hello")
+    assert embedding_key("m", "hello") != embedding_key("m", "world")
+
+
+def test_memory_hits_and_misses():
+    async def main():
+        cache = EmbeddingCache()
+        await cache.put_many("m", ["a"], [[0.5, 1.0]])
+        return cache, await cache.get_many("m", ["a", "b"])
+
+    cache, vectors = asyncio.run(main())
+    assert vectors == [[0.5, 1.0], None]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_disk_survives_restart_and_is_shared(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+
+    async def main():
+        await EmbeddingCache(path=path).put_many("m", ["a", "b"], [[1.0], [2.0]])
+        # A fresh cache, as in another worker or after a restart
+        cache = EmbeddingCache(path=path)
+        first = await cache.get_many("m", ["b", "a", "c"])
+        second = await cache.get_many("m", ["a"])
+        return cache, first, second
+
+    cache, first, second = asyncio.run(main())
+    assert first == [[2.0], [1.0], None]
+    assert second == [[1.0]]
+    # Disk hits are promoted to memory, the second lookup stays in process
+    assert cache.disk_hits == 2
+    assert cache.disk.count() == 2
+
+
+def test_vectors_are_stored_as_float32(tmp_path):
+    async def main():
+        cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite3"))
+        await cache.put_many("m", ["a"], [[0.1]])
+        return await cache.get_many("m", ["a"])
+
+    assert asyncio.run(main())[0][0] == pytest.approx(0.1, rel=1e-6)
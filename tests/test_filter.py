@@ -0,0 +1,74 @@
+import pytest
+
+from app.document_store.filter import get_payload_values, match_filter
+
+PAYLOAD = {
+    "source": "wiki",
+    "lang": "en",
+    "views": 120,
+    "tags": ["python", "language"],
+    "author": {"name": "Guido", "links": [{"site": "github"}, {"site": "blog"}]},
+    "note": None,
+}
+
+
+def test_payload_values():
+    assert get_payload_values(PAYLOAD, "source") == ["wiki"]
+    assert get_payload_values(PAYLOAD, "tags") == ["python", "language"]
+    assert get_payload_values(PAYLOAD, "author.name") == ["Guido"]
+    assert get_payload_values(PAYLOAD, "author.links[].site") == ["github", "blog"]
+    assert get_payload_values(PAYLOAD, "author.missing") == []
+
+
+def test_empty_filter_matches():
+    assert match_filter(PAYLOAD, None)
+    assert match_filter(PAYLOAD, {})
+
+
+@pytest.mark.parametrize(
+    "condition, expected",
+    [
+        ({"key": "source", "match": {"value": "wiki"}}, True),
+        ({"key": "source", "match": {"value": "file"}}, False),
+        ({"key": "tags", "match": {"value": "python"}}, True),
+        ({"key": "lang", "match": {"any": ["de", "en"]}}, True),
+        ({"key": "lang", "match": {"any": ["de", "fr"]}}, False),
+        ({"key": "lang", "match": {"except": ["de", "fr"]}}, True),
+        ({"key": "missing", "match": {"except": ["de"]}}, False),
+        ({"key": "author.name", "match": {"text": "uid"}}, True),
+        ({"key": "author.links[].site", "match": {"value": "blog"}}, True),
+        ({"key": "views", "range": {"gte": 100, "lt": 200}}, True),
+        ({"key": "views", "range": {"gt": 120}}, False),
+        ({"key": "source", "range": {"gt": 0}}, False),
+        ({"key": "tags", "values_count": {"gte": 2}}, True),
+        ({"key": "tags", "values_count": {"gt": 2}}, False),
+        ({"is_empty": {"key": "note"}}, True),
+        ({"is_empty": {"key": "tags"}}, False),
+        ({"is_null": {"key": "note"}}, True),
+        ({"is_null": {"key": "lang"}}, False),
+        ({"has_id": ["a", "b"]}, True),
+        ({"has_id": ["c"]}, False),
+    ],
+)
+def test_conditions(condition, expected):
+    assert match_filter(PAYLOAD, {"must": [condition]}, point_id="a") is expected
+
+
+def test_boolean_clauses():
+    wiki = {"key": "source", "match": {"value": "wiki"}}
+    german = {"key": "lang", "match": {"value": "de"}}
+
+    assert match_filter(PAYLOAD, {"should": [german, wiki]})
+    assert not match_filter(PAYLOAD, {"should": [german]})
+    assert not match_filter(PAYLOAD, {"must": [wiki], "must_not": [wiki]})
+    assert match_filter(PAYLOAD, {"must": [wiki], "must_not": [german]})
+    # Nested filters, with or without the `filter` wrapper
+    assert match_filter(PAYLOAD, {"must": [{"should": [german, wiki]}]})
+    assert not match_filter(PAYLOAD, {"must": [{"filter": {"must": [german]}}]})
+
+
+def test_unsupported_condition():
+    with pytest.raises(ValueError):
+        match_filter(PAYLOAD, {"must": [{"key": "lang", "geo_radius": {}}]})
+    with pytest.raises(ValueError):
+        match_filter(PAYLOAD, {"must": [{"key": "lang", "match": {"regex": "e"}}]})
@@ -0,0 +1,39 @@
+import pytest
+
+from app.document_store.lexical import fuse_results
+from app.schema.models import DocumentWithScore, QueryResult
+
+
+def result(*ids) -> QueryResult:
+    return QueryResult(
+        query="q",
+        results=[
+            DocumentWithScore(
+                id=_id, text=_id, metadata=dict(), embedding=None, score=1.0
+            )
+            for _id in ids
+        ],
+    )
+
+
+def test_reciprocal_rank_fusion():
+    dense = result("a", "b", "c")
+    lexical = result("c", "a", "d")
+    fused = fuse_results([dense, lexical], top_k=10, k=60)
+
+    assert [doc.id for doc in fused] == ["a", "c", "b", "d"]
+    assert fused[0].score == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[1].score == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[2].score == pytest.approx(1 / 62)
+    assert fused[3].score == pytest.approx(1 / 63)
+
+
+def test_fusion_top_k_and_single_list():
+    fused = fuse_results([result("a", "b", "c")], top_k=2)
+    assert [doc.id for doc in fused] == ["a", "b"]
+    assert fused[0].text == "a"
+
+
+def test_fusion_of_nothing():
+    assert fuse_results([], top_k=5) == []
+    assert fuse_results([result(), result()], top_k=5) == []
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.document_store import QueryResultCache
+from app.document_store.numpy_store import NumpyDocumentStore
+from app.embedding.embedder import Embedder
+from app.embedding.local import HashingEmbeddingProvider
+from app.schema.models import Document
+from app.service.chunker import DocumentChunker, RegexTokenizer, chunk_id
+from app.service.ingestion import IngestionService
+
+
+def make_service(chunk_token_size=4):
+    provider = HashingEmbeddingProvider()
+    chunker = DocumentChunker(chunk_token_size=chunk_token_size, overlap=0)
+    chunker._tokenizer = RegexTokenizer()
+    return IngestionService(
+        embedder=Embedder(provider=provider),
+        document_store=NumpyDocumentStore(vector_size=provider.dimension),
+        query_cache=QueryResultCache(),
+        chunker=chunker,
+    )
+
+
+def words(count):
+    return " ".join(f"w{i}" for i in range(count))
+
+
+def test_unchanged_upsert_keeps_cached_results():
+    async def main():
+        service = make_service()
+        await service.upsert([Document(id="doc", text=words(10))])
+        generation = service.query_cache.generation
+        await service.upsert([Document(id="doc", text=words(10))])
+        return service, generation
+
+    service, generation = asyncio.run(main())
+    assert service.query_cache.generation == generation
+    assert (service.written, service.skipped) == (3, 3)
+
+
+def test_shorter_version_deletes_stale_chunks():
+    async def main():
+        service = make_service()
+        await service.upsert([Document(id="doc", text=words(10))])
+        generation = service.query_cache.generation
+        # The leading chunk is unchanged, only the tail goes away
+        await service.upsert([Document(id="doc", text=words(4))])
+        return service, generation
+
+    service, generation = asyncio.run(main())
+    assert service.query_cache.generation > generation
+    assert sorted(service.document_store._id_to_row) == ["doc"]
+    assert chunk_id("doc", 1) not in service.document_store._id_to_row
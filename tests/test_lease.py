@@ -0,0 +1,139 @@
+import asyncio
+import sqlite3
+import time
+
+from app.utils.lease import LeaseStore
+from app.utils.singleflight import SingleFlight
+
+
+def test_lease_in_process():
+    async def main():
+        store = LeaseStore()
+        first = await store.acquire_many(["a", "b", "a"], ttl=60)
+        second = await store.acquire("a", ttl=60)
+        await store.release_many(["a"])
+        third = await store.acquire("a", ttl=60)
+        return store, first, second, third
+
+    store, first, second, third = asyncio.run(main())
+    # A key repeated in one call is only granted once
+    assert first == [True, True, False]
+    assert second is False
+    assert third is True
+    assert store.stats()["granted"] == 3
+
+
+def test_lease_shared_between_stores(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+
+    async def main():
+        # Two stores on one file stand in for two workers
+        a, b = LeaseStore(path=path), LeaseStore(path=path)
+        results = [await a.acquire("key", ttl=60), await b.acquire("key", ttl=60)]
+        await a.release_many(["key"])
+        # b remembers the rejection only briefly, skip its local memory
+        b.local.pop("key")
+        results.append(await b.acquire("key", ttl=60))
+        return results
+
+    assert asyncio.run(main()) == [True, False, True]
+
+
+def test_lease_expires(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+
+    async def main():
+        a, b = LeaseStore(path=path), LeaseStore(path=path)
+        assert await a.acquire("key", ttl=0.05)
+        await asyncio.sleep(0.1)
+        return await b.acquire("key", ttl=60)
+
+    assert asyncio.run(main()) is True
+
+
+def test_lease_extend(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+
+    async def main():
+        a, b = LeaseStore(path=path), LeaseStore(path=path)
+        assert await a.acquire("key", ttl=0.05)
+        await a.extend_many(["key"], ttl=60)
+        await asyncio.sleep(0.1)
+        return await b.acquire("key", ttl=60)
+
+    assert asyncio.run(main()) is False
+
+
+def test_expired_leases_are_purged(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+
+    async def main():
+        store = LeaseStore(path=path, purge_interval=0)
+        await store.acquire_many([f"key-{i}" for i in range(100)], ttl=0.01)
+        await asyncio.sleep(0.05)
+        await store.acquire("other", ttl=60)
+
+    asyncio.run(main())
+    with sqlite3.connect(path) as conn:
+        keys = [row[0] for row in conn.execute("SELECT key FROM leases")]
+    assert keys == ["other"]
+
+
+def test_singleflight_shares_calls():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            flight.do("a", fetch, "a"),
+            flight.do("a", fetch, "a"),
+            flight.do("b", fetch, "b"),
+        )
+        assert "a" not in flight
+        # Finished calls are not shared with later ones
+        results.append(await flight.do("a", fetch, "a"))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["A", "A", "B", "A"]
+    assert calls == ["a", "b", "a"]
+    assert flight.stats() == dict(calls=3, shared=1, in_flight=0)
+
+
+def test_singleflight_shares_errors():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            flight.do("a", fail), flight.do("a", fail), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+
+def test_singleflight_survives_cancelled_caller():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return time.monotonic()
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("a", fetch))
+        second = asyncio.ensure_future(flight.do("a", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        # The shared call keeps running for the remaining caller
+        return await second, first.cancelled()
+
+    value, cancelled = asyncio.run(main())
+    assert cancelled
+    assert isinstance(value, float)
@@ -0,0 +1,69 @@
+import asyncio
+
+from app.document_store.lexical import LexicalIndex, match_expression
+from app.schema.models import Document, Query
+
+
+def doc(_id, text, title="", **metadata):
+    return Document(id=_id, text=text, metadata=dict(title=title, **metadata))
+
+
+def search(tmp_path, documents, *queries):
+    async def main():
+        index = LexicalIndex(path=str(tmp_path / "lexical.sqlite3"))
+        try:
+            await index.upsert(documents)
+            results = await index.query(queries)
+            return [[d.id for d in result.results] for result in results]
+        finally:
+            await index.close()
+
+    return asyncio.run(main())
+
+
+def test_match_expression():
+    assert match_expression('"Guido van" Rossum python') == (
+        '"guido van" OR "rossum" OR "python"'
+    )
+    assert match_expression("!?") is None
+
+
+def test_bm25_ordering(tmp_path):
+    (ids,) = search(
+        tmp_path,
+        [
+            doc("once", "a snake and python among many other reptiles of the world"),
+            doc("twice", "python python"),
+            doc("none", "a language about snakes"),
+            doc("title", "a language", title="Python"),
+        ],
+        Query(query="python"),
+    )
+    # A single mention in a long text ranks below repeats and title matches
+    assert ids == ["twice", "title", "once"]
+
+
+def test_title_indexed_on_first_chunk_only(tmp_path):
+    (ids,) = search(
+        tmp_path,
+        [
+            doc("a", "first part", title="Python", parent_id="a", chunk_index=0),
+            doc("a#1", "second part", title="Python", parent_id="a", chunk_index=1),
+        ],
+        Query(query="python"),
+    )
+    assert ids == ["a"]
+
+
+def test_filter(tmp_path):
+    ids, filtered = search(
+        tmp_path,
+        [doc("en", "python", lang="en"), doc("de", "python", lang="de")],
+        Query(query="python"),
+        Query(
+            query="python",
+            filter=dict(must=[dict(key="metadata.lang", match=dict(value="de"))]),
+        ),
+    )
+    assert sorted(ids) == ["de", "en"]
+    assert filtered == ["de"]
@@ -0,0 +1,126 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.document_store.numpy_store import NumpyDocumentStore
+from app.schema.models import Document, Query
+
+
+def doc(_id, embedding, **metadata):
+    return Document(id=_id, text=f"text of {_id}", metadata=metadata).with_embedding(
+        embedding
+    )
+
+
+def query(embedding, top_k=3, **kwargs):
+    return Query(query="q", top_k=top_k, **kwargs).with_embedding(embedding)
+
+
+DOCS = [
+    doc("x", [1.0, 0.0, 0.0], lang="en"),
+    doc("y", [0.0, 1.0, 0.0], lang="de"),
+    doc("xy", [1.0, 1.0, 0.0], lang="en"),
+    doc("z", [0.0, 0.0, 5.0], lang="en"),
+]
+
+
+def test_top_k_by_cosine_similarity():
+    async def main():
+        store = NumpyDocumentStore(vector_size=3)
+        await store.upsert(DOCS)
+        return await store.query(
+            [query([2.0, 0.0, 0.0], top_k=2), query([0.0, 0.0, 1.0], top_k=10)]
+        )
+
+    first, second = asyncio.run(main())
+    assert [d.id for d in first.results] == ["x", "xy"]
+    assert [d.score for d in first.results] == pytest.approx([1.0, 2**-0.5])
+    # Every document, best first, magnitudes do not matter
+    assert [d.id for d in second.results][0] == "z"
+    assert len(second.results) == 4
+    assert second.results[0].score == pytest.approx(1.0)
+
+
+def test_filter_and_upsert_overwrite():
+    async def main():
+        store = NumpyDocumentStore(vector_size=3)
+        await store.upsert(DOCS)
+        # Same id, moved away from the query
+        await store.upsert([doc("x", [0.0, 1.0, 0.0], lang="en")])
+        filtered = await store.query(
+            [
+                query(
+                    [1.0, 0.0, 0.0],
+                    filter=dict(
+                        must=[dict(key="metadata.lang", match=dict(value="en"))]
+                    ),
+                )
+            ]
+        )
+        return store, filtered[0]
+
+    store, result = asyncio.run(main())
+    assert len(store) == 4
+    assert [d.id for d in result.results] == ["xy", "x", "z"]
+
+
+def test_delete_by_ids_and_filter():
+    async def main():
+        store = NumpyDocumentStore(vector_size=3)
+        await store.upsert(DOCS)
+        await store.delete(ids=["x"])
+        await store.delete(
+            filter=dict(must=[dict(key="metadata.lang", match=dict(value="de"))])
+        )
+        return store, await store.query([query([1.0, 1.0, 1.0], top_k=10)])
+
+    store, results = asyncio.run(main())
+    assert len(store) == 2
+    assert sorted(d.id for d in results[0].results) == ["xy", "z"]
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "store")
+
+    async def main():
+        store = NumpyDocumentStore(vector_size=3, path=path, snapshot_interval=3600)
+        await store.touch()
+        await store.upsert(DOCS)
+        await store.delete(ids=["y"])
+        # Closing snapshots what the interval did not
+        await store.close()
+
+        loaded = NumpyDocumentStore(vector_size=3, path=path, mmap=True)
+        await loaded.touch()
+        results = await loaded.query([query([1.0, 0.0, 0.0], top_k=10)])
+        # Writes to a memory-mapped snapshot copy it first
+        await loaded.upsert([doc("w", [0.0, 1.0, 1.0])])
+        await loaded.close()
+        return loaded, results[0]
+
+    loaded, result = asyncio.run(main())
+    assert len(loaded) == 4
+    assert [d.id for d in result.results] == ["x", "xy", "z"]
+    assert result.results[0].text == "text of x"
+    assert result.results[0].metadata["lang"] == "en"
+    assert "created_at" in result.results[0].metadata
+    assert np.load(str(tmp_path / "store" / "documents.npy")).shape == (4, 3)
+
+
+def test_snapshot_is_locked(tmp_path):
+    path = str(tmp_path / "store")
+    store = NumpyDocumentStore(vector_size=3, path=path)
+    store.load()
+    with pytest.raises(RuntimeError):
+        NumpyDocumentStore(vector_size=3, path=path).load()
+    asyncio.run(store.close())
+    NumpyDocumentStore(vector_size=3, path=path).load()
+
+
+def test_wrong_dimension():
+    async def main():
+        await NumpyDocumentStore(vector_size=3).upsert([doc("a", [1.0, 0.0])])
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import openai
+import pytest
+from openai import error as openai_error
+
+from app.embedding.openai import OpenAIEmbeddingProvider, _parse_duration
+
+
+class WordTokenizer:
+    def encode(self, text, **kwargs):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def make_provider(tokenizer=None, **kwargs) -> OpenAIEmbeddingProvider:
+    provider = OpenAIEmbeddingProvider(api_key="sk-test", dimension=2, **kwargs)
+    # Keep the tests offline, False counts bytes as tokens
+    provider._tokenizer = tokenizer if tokenizer is not None else WordTokenizer()
+    return provider
+
+
+def test_split_by_size_and_tokens():
+    provider = make_provider(max_batch_size=3, max_batch_tokens=4, max_input_tokens=3)
+    texts = ["a", "b", "c", "d", "e f g h i", "j k", "l"]
+    assert provider.split(texts) == [
+        ["a", "b", "c"],
+        ["d", "e f g"],  # Truncated to max_input_tokens
+        ["j k", "l"],
+    ]
+
+
+def test_split_counts_bytes_without_tokenizer():
+    provider = make_provider(tokenizer=False, max_batch_tokens=8, max_input_tokens=4)
+    assert provider.split(["ab", "cd", "éé", "abcdef"]) == [
+        ["ab", "cd", "éé"],
+        ["abcd"],
+    ]
+
+
+def test_parse_duration():
+    assert _parse_duration(None) == 0.0
+    assert _parse_duration("2") == 2.0
+    assert _parse_duration("6m0s") == 360.0
+    assert _parse_duration("1s500ms") == pytest.approx(1.5)
+    assert _parse_duration("20ms") == pytest.approx(0.02)
+
+
+def test_retry_rate_limit_after_reset(monkeypatch):
+    calls = []
+
+    async def acreate(input, model):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise openai_error.RateLimitError(
+                "Rate limit reached",
+                headers={"x-ratelimit-reset-requests": "100ms"},
+            )
+        return openai.openai_object.OpenAIObject.construct_from(
+            dict(
+                data=[
+                    dict(index=i, embedding=[float(i), 1.0]) for i in range(len(input))
+                ]
+            )
+        )
+
+    monkeypatch.setattr(openai.Embedding, "acreate", acreate)
+    provider = make_provider(max_concurrency=4)
+    embeddings = asyncio.run(provider.embed(["a", "b"]))
+
+    assert embeddings.tolist() == [[0.0, 1.0], [1.0, 1.0]]
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.1
+    # The 429 halved the limit, the success raised it by one
+    assert provider.concurrency == 3
@@ -0,0 +1,70 @@
+import multiprocessing
+
+from app.document_store import QueryResultCache
+from app.schema.models import DocumentWithScore, Query, QueryResult
+
+
+def result(query: str, *ids: str) -> QueryResult:
+    return QueryResult(
+        query=query,
+        results=[
+            DocumentWithScore(id=_id, text=_id, metadata={}, embedding=None, score=1.0)
+            for _id in ids
+        ],
+    )
+
+
+def test_hit_until_invalidated():
+    cache = QueryResultCache()
+    query = Query(query="python")
+    cache.put(query, result("python", "a"), cache.generation)
+
+    hit = cache.get(Query(query="  python "))
+    assert [doc.id for doc in hit.results] == ["a"]
+    # The cached result answers with the query as asked
+    assert hit.query == "python"
+
+    cache.invalidate()
+    assert cache.get(query) is None
+    assert (cache.hits, cache.misses, cache.stale) == (1, 1, 1)
+
+
+def test_result_computed_before_a_write_is_stale():
+    cache = QueryResultCache()
+    query = Query(query="python")
+    generation = cache.generation
+    # A write lands while the search is running
+    cache.invalidate()
+    cache.put(query, result("python", "a"), generation)
+    assert cache.get(query) is None
+
+
+def test_key_covers_query_options():
+    cache = QueryResultCache()
+    cache.put(Query(query="python", top_k=5), result("python", "a"), 0)
+    assert cache.get(Query(query="python", top_k=3)) is None
+    assert cache.get(Query(query="python", top_k=5, mode="hybrid")) is None
+    assert (
+        cache.get(
+            Query(
+                query="python",
+                top_k=5,
+                filter=dict(must=[dict(key="lang", match=dict(value="en"))]),
+            )
+        )
+        is None
+    )
+    assert cache.get(Query(query="python", top_k=5)) is not None
+
+
+def test_generation_shared_between_caches():
+    # Workers share the counter, a write on one invalidates every cache
+    generation = multiprocessing.Value("Q", 0)
+    first = QueryResultCache(generation=generation)
+    second = QueryResultCache(generation=generation)
+    query = Query(query="python")
+    second.put(query, result("python", "a"), second.generation)
+
+    first.invalidate()
+    assert second.generation == 1
+    assert second.get(query) is None
@@ -0,0 +1,64 @@
+import asyncio
+
+from app.service.scheduler import RefreshScheduler
+
+
+def test_submit_merges_queued_and_running():
+    async def main():
+        started = asyncio.Event()
+        release = asyncio.Event()
+        calls = []
+
+        async def handler(**task):
+            calls.append(task["query"])
+            started.set()
+            await release.wait()
+
+        scheduler = RefreshScheduler(handler, concurrency=1)
+        scheduler.start()
+        results = [scheduler.submit("Python", top_k=5)]
+        await started.wait()
+        # Running, then queued behind the running one
+        results.append(scheduler.submit("python ", top_k=5))
+        results.append(scheduler.submit("Monty", top_k=5))
+        results.append(scheduler.submit("monty", top_k=5))
+        release.set()
+        while scheduler.depth or scheduler.running:
+            await asyncio.sleep(0.01)
+        await scheduler.close()
+        return scheduler, results, calls
+
+    scheduler, results, calls = asyncio.run(main())
+    assert results == [True, True, True, True]
+    assert calls == ["Python", "Monty"]
+    assert scheduler.stats()["merged"] == 2
+    assert scheduler.stats()["dropped"] == 0
+
+
+def test_full_queue_drops_lowest_priority():
+    async def handler(**task):
+        pass
+
+    # Not started, so everything stays queued
+    scheduler = RefreshScheduler(handler, max_queue=2)
+    assert scheduler.submit("a", top_k=5, best_score=0.5)
+    assert scheduler.submit("b", top_k=5, best_score=0.0)
+    # Less urgent than everything queued
+    assert not scheduler.submit("c", top_k=5, best_score=0.8)
+    # More urgent than "a", which makes room
+    assert scheduler.submit("d", top_k=5, best_score=0.0)
+    assert scheduler.depth == 2
+    assert scheduler.dropped == 2
+
+
+def test_merges_keep_the_heap_bounded():
+    async def handler(**task):
+        pass
+
+    scheduler = RefreshScheduler(handler, max_queue=10)
+    for i in range(1000):
+        scheduler.submit(f"query {i % 3}", top_k=5)
+    assert scheduler.depth == 3
+    assert len(scheduler._heap) <= 4 * 3 + 16
+    # The most asked query still comes first
+    assert scheduler._pop().query == "query 0"
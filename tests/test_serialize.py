@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from app.schema.api import QueryCall
+from app.schema.models import DocumentWithScore, Query, QueryResult
+from app.utils.serialize import dumps
+
+
+def make_result() -> QueryResult:
+    return QueryResult(
+        query="python",
+        results=[
+            DocumentWithScore(
+                id="a",
+                text="Python is a language.",
+                metadata=dict(title="Python", lang="en", url="https://example.org"),
+                embedding=[0.5, 0.25],
+                score=0.9,
+            )
+        ],
+    )
+
+
+def test_results_are_slotted():
+    doc = make_result().results[0]
+    assert not hasattr(doc, "__dict__")
+    with pytest.raises(AttributeError):
+        doc.extra = 1
+
+
+def test_default_projection_shares_values():
+    result = make_result()
+    projected = QueryCall(queries=[Query(query="python")]).project(result)
+    item = projected["results"][0]
+    assert projected["query"] == "python"
+    assert set(item) == {"id", "score", "text", "metadata"}
+    # Values are shared with the result, not copied
+    assert item["metadata"] is result.results[0].metadata
+
+
+def test_projection_of_requested_fields():
+    call = QueryCall(
+        queries=[Query(query="python")],
+        include_text=False,
+        include_embedding=True,
+        metadata_fields=["title", "missing"],
+    )
+    assert call.queries[0].include_embedding
+    item = call.project(make_result())["results"][0]
+    assert item == dict(
+        id="a", score=0.9, embedding=[0.5, 0.25], metadata=dict(title="Python")
+    )
+
+
+def test_dumps_returns_utf8_json():
+    payload = dict(query="größe", results=[dict(id="a", score=0.5, text="日本")])
+    encoded = dumps(payload)
+    assert isinstance(encoded, bytes)
+    assert "größe".encode("utf-8") in encoded
+    assert json.loads(encoded) == payload
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.schema.models import Query
+from app.service.warmup import QueryLog, read_warmup_queries
+
+
+def test_query_log_buffers_until_flushed(tmp_path):
+    path = tmp_path / "queries.ndjson"
+
+    async def main():
+        query_log = QueryLog(str(path), flush_interval=0.01)
+        task = asyncio.create_task(query_log.run())
+        query_log.record([Query(query="python"), Query(query="monty", lang="en")])
+        buffered = path.exists()
+        await asyncio.sleep(0.1)
+        flushed = path.read_text()
+        task.cancel()
+        query_log.record([Query(query="python")])
+        query_log.close()
+        return buffered, flushed
+
+    buffered, flushed = asyncio.run(main())
+    assert not buffered
+    assert flushed.count("\n") == 2
+    # Closing writes what is left, the most frequent query comes first
+    queries = read_warmup_queries(query_log_path=str(path), topics=["spam"])
+    assert [(q.query, q.lang) for q in queries] == [
+        ("spam", None),
+        ("python", None),
+        ("monty", "en"),
+    ]
@@ -0,0 +1,193 @@
+import asyncio
+import contextlib
+from typing import Any, Dict, List
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.resource.wiki import WikiClient
+from app.schema.models import document_id
+
+PAGES = {
+    "Python (programming language)": "Python is a programming language.",
+    "Monty Python": "Monty Python were a comedy troupe.",
+}
+REDIRECTS = {"Python language": "Python (programming language)"}
+NORMALIZED = {"monty Python": "Monty Python"}
+
+
+class WikiStub:
+    """Minimal MediaWiki API answering searches and intro extracts."""
+
+    def __init__(self, throttled: int = 0, retry_after: str = "0", broken=()):
+        self.throttled = throttled
+        self.retry_after = retry_after
+        # Extract requests including these titles fail
+        self.broken = set(broken)
+        self.requests: List[Dict[str, Any]] = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        params = dict(request.query)
+        self.requests.append(params)
+        if self.throttled > 0:
+            self.throttled -= 1
+            return web.Response(status=429, headers={"Retry-After": self.retry_after})
+
+        if params.get("list") == "search":
+            titles = [t for t in PAGES if params["srsearch"].lower() in t.lower()]
+            return web.json_response(
+                {"query": {"search": [{"title": title} for title in titles]}}
+            )
+
+        if self.broken & set(params["titles"].split("|")):
+            return web.Response(status=500)
+
+        normalized, redirects, pages = [], [], []
+        for title in params["titles"].split("|"):
+            if title in NORMALIZED:
+                normalized.append({"from": title, "to": NORMALIZED[title]})
+                title = NORMALIZED[title]
+            if title in REDIRECTS:
+                redirects.append({"from": title, "to": REDIRECTS[title]})
+                title = REDIRECTS[title]
+            if title in PAGES:
+                pages.append({"title": title, "extract": PAGES[title]})
+            else:
+                pages.append({"title": title, "missing": True})
+        return web.json_response(
+            {
+                "query": {
+                    "normalized": normalized,
+                    "redirects": redirects,
+                    "pages": pages,
+                }
+            }
+        )
+
+
+@contextlib.asynccontextmanager
+async def serve(stub: WikiStub, **kwargs):
+    app = web.Application()
+    app.router.add_get("/{lang}/w/api.php", stub.handle)
+    server = TestServer(app)
+    await server.start_server()
+    client = WikiClient(
+        api_url=f"http://{server.host}:{server.port}/" + "{lang}/w/api.php",
+        retry_backoff=0.01,
+        **kwargs,
+    )
+    try:
+        yield client
+    finally:
+        await client.close()
+        await server.close()
+
+
+def test_search():
+    async def main():
+        stub = WikiStub()
+        async with serve(stub) as client:
+            return await client.async_search("python", top_k=3)
+
+    assert asyncio.run(main()) == list(PAGES)
+
+
+def test_fetch_batches_extracts():
+    titles = list(PAGES) + [f"Missing {i}" for i in range(25)]
+
+    async def main():
+        stub = WikiStub()
+        async with serve(stub) as client:
+            docs = await client.async_fetch(titles)
+        return stub, docs
+
+    stub, docs = asyncio.run(main())
+    extract_requests = [r for r in stub.requests if r.get("prop") == "extracts"]
+    # 27 titles fit in two requests of at most 20 titles
+    assert [len(r["titles"].split("|")) for r in extract_requests] == [20, 7]
+    assert [doc.metadata["title"] for doc in docs] == list(PAGES)
+    assert docs[0].text == PAGES["Python (programming language)"]
+    assert docs[0].id == document_id(
+        source="wiki", lang="en", title="Python (programming language)"
+    )
+
+
+def test_fetch_follows_redirects_and_normalization():
+    async def main():
+        async with serve(WikiStub()) as client:
+            return await client.async_fetch(["Python language", "monty Python"])
+
+    docs = asyncio.run(main())
+    # Documents keep the requested titles, with the content of the targets
+    assert [doc.metadata["title"] for doc in docs] == [
+        "Python language",
+        "monty Python",
+    ]
+    assert [doc.text for doc in docs] == [
+        PAGES["Python (programming language)"],
+        PAGES["Monty Python"],
+    ]
+
+
+def test_fetch_skips_missing_pages():
+    async def main():
+        async with serve(WikiStub()) as client:
+            return await client.async_fetch(["Nothing here", "Monty Python"])
+
+    docs = asyncio.run(main())
+    assert [doc.metadata["title"] for doc in docs] == ["Monty Python"]
+
+
+def test_fetch_reports_failed_titles():
+    titles = ["Broken"] + [f"Missing {i}" for i in range(20)] + ["Monty Python"]
+
+    async def main():
+        async with serve(WikiStub(broken=["Broken"])) as client:
+            return await client.async_fetch_pages(titles)
+
+    docs, failed = asyncio.run(main())
+    # The first batch of 20 failed, the missing pages of the second did not
+    assert [doc.metadata["title"] for doc in docs] == ["Monty Python"]
+    assert failed == titles[:20]
+
+
+def test_retry_on_429():
+    async def main():
+        stub = WikiStub(throttled=2)
+        async with serve(stub, max_retries=3) as client:
+            titles = await client.async_search("monty")
+            return stub, client, titles
+
+    stub, client, titles = asyncio.run(main())
+    assert titles == ["Monty Python"]
+    assert len(stub.requests) == 3
+    assert client.retries == 2
+
+
+def test_retry_gives_up():
+    async def main():
+        stub = WikiStub(throttled=10)
+        async with serve(stub, max_retries=1) as client:
+            try:
+                await client.async_search("monty")
+            finally:
+                assert len(stub.requests) == 2
+
+    with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+        asyncio.run(main())
+    assert exc_info.value.status == 429
+
+
+def test_retry_delay_honours_retry_after():
+    client = WikiClient(retry_backoff=0.5)
+    error = aiohttp.ClientResponseError(
+        request_info=None, history=(), status=429, headers={"Retry-After": "2"}
+    )
+    assert client._retry_delay(error, attempt=0) == 2.0
+
+    error = aiohttp.ClientResponseError(
+        request_info=None, history=(), status=429, headers={}
+    )
+    assert 1.0 <= client._retry_delay(error, attempt=2) <= 2.0